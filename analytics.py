@@ -0,0 +1,188 @@
+"""
+Vectorized analytics over a user's transaction history.
+
+A user's transactions are loaded once into typed NumPy columns (amount in
+paise, day as days since 1970-01-01, category code, income flag) and every
+series below is computed with array operations over those columns instead
+of per-row Python loops:
+
+- daily income, expense and net on a continuous day axis
+- cumulative balance
+- trailing rolling average of daily spend
+- each category's share of monthly spend
+- percentiles of individual expenses
+
+Amounts are summed as integer paise and only converted to rupees for output.
+"""
+import numpy as np
+from database import get_connection
+from utils import to_day
+
+# Percentiles reported for individual expenses
+PERCENTILES = (50, 75, 90, 95, 99)
+
+# Default window (days) for the rolling average
+ROLLING_WINDOW = 30
+
+
+class TransactionFrame:
+    """Columnar arrays for one user's transactions, sorted by day"""
+
+    def __init__(self, ids, days, amounts, is_income, category_codes, categories):
+        self.ids = ids
+        self.days = days
+        self.amounts = amounts
+        self.is_income = is_income
+        self.category_codes = category_codes
+        self.categories = categories
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def signed_amounts(self):
+        """Income positive, expense negative (paise)"""
+        return np.where(self.is_income, self.amounts, -self.amounts)
+
+
+def epoch_days(days):
+    """Convert an array of YYYYMMDD integers to days since 1970-01-01"""
+    days = np.asarray(days, dtype=np.int64)
+    months = (days // 10000 - 1970) * 12 + (days // 100) % 100 - 1
+    return (months.astype("datetime64[M]").astype("datetime64[D]").astype(np.int64)
+            + days % 100 - 1)
+
+
+def load_frame(user_id, start_date=None, end_date=None):
+    """Load a user's transactions into a TransactionFrame with one query"""
+    conditions = ["user_id=?"]
+    params = [user_id]
+    if start_date:
+        conditions.append("day >= ?")
+        params.append(to_day(start_date))
+    if end_date:
+        conditions.append("day <= ?")
+        params.append(to_day(end_date))
+
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            SELECT id, day, amount_minor, type = 'income', COALESCE(category, '')
+            FROM transactions
+            WHERE {" AND ".join(conditions)}
+            ORDER BY day, id
+        """, params)
+        rows = cursor.fetchall()
+
+    if not rows:
+        empty = np.zeros(0, dtype=np.int64)
+        return TransactionFrame(empty, empty, empty, np.zeros(0, dtype=bool), empty, [])
+
+    ids, days, amounts, is_income, categories = zip(*rows)
+    # Code categories in first-seen order with a dict (much faster than
+    # np.unique on strings), then renumber them alphabetically
+    lookup = {}
+    codes = np.array([lookup.setdefault(c, len(lookup)) for c in categories], dtype=np.int64)
+    names = sorted(lookup)
+    renumber = np.empty(len(names), dtype=np.int64)
+    renumber[[lookup[name] for name in names]] = np.arange(len(names))
+    return TransactionFrame(
+        np.array(ids, dtype=np.int64),
+        epoch_days(days),
+        np.array(amounts, dtype=np.int64),
+        np.array(is_income, dtype=bool),
+        renumber[codes],
+        names,
+    )
+
+
+def daily_totals(frame):
+    """Return (first epoch day, income, expense) per day from the first to the last transaction"""
+    if not len(frame):
+        empty = np.zeros(0, dtype=np.int64)
+        return 0, empty, empty
+    first = int(frame.days[0])
+    offsets = frame.days - first
+    length = int(offsets[-1]) + 1
+    income = np.bincount(offsets, weights=np.where(frame.is_income, frame.amounts, 0),
+                         minlength=length)
+    expense = np.bincount(offsets, weights=np.where(frame.is_income, 0, frame.amounts),
+                          minlength=length)
+    return first, income.astype(np.int64), expense.astype(np.int64)
+
+
+def cumulative_balance(income, expense):
+    """Running balance after each day (paise)"""
+    return np.cumsum(income - expense)
+
+
+def rolling_average(values, window=ROLLING_WINDOW):
+    """Trailing mean over up to window values (shorter at the start)"""
+    values = np.asarray(values, dtype=np.float64)
+    if not len(values):
+        return values
+    sums = np.concatenate(([0.0], np.cumsum(values)))
+    index = np.arange(1, len(values) + 1)
+    start = np.maximum(index - window, 0)
+    return (sums[index] - sums[start]) / (index - start)
+
+
+def category_share_by_month(frame):
+    """Return (months as 'YYYY-MM', categories, share matrix) of expense per category per month"""
+    expense = ~frame.is_income
+    if not expense.any():
+        return [], [], np.zeros((0, 0))
+    dates = frame.days[expense].astype("datetime64[D]")
+    month_numbers = dates.astype("datetime64[M]").astype(np.int64)
+    first = int(month_numbers.min())
+    month_index = month_numbers - first
+    n_months = int(month_index.max()) + 1
+    n_categories = len(frame.categories)
+
+    cells = month_index * n_categories + frame.category_codes[expense]
+    totals = np.bincount(cells, weights=frame.amounts[expense],
+                         minlength=n_months * n_categories).reshape(n_months, n_categories)
+    month_totals = totals.sum(axis=1, keepdims=True)
+    shares = np.divide(totals, month_totals, out=np.zeros_like(totals),
+                       where=month_totals > 0)
+
+    months = [str(m) for m in np.arange(first, first + n_months).astype("datetime64[M]")]
+    return months, frame.categories, shares
+
+
+def expense_percentiles(frame, percentiles=PERCENTILES):
+    """Percentiles of individual expense amounts (paise)"""
+    expenses = frame.amounts[~frame.is_income]
+    if not len(expenses):
+        return {p: 0.0 for p in percentiles}
+    values = np.percentile(expenses, percentiles)
+    return {p: float(v) for p, v in zip(percentiles, values)}
+
+
+def get_analytics(user_id, start_date=None, end_date=None, window=ROLLING_WINDOW):
+    """All analytics series for a user, with amounts in rupees, for web display"""
+    return analyze(load_frame(user_id, start_date, end_date), window)
+
+
+def analyze(frame, window=ROLLING_WINDOW):
+    """All analytics series for a loaded frame, with amounts in rupees"""
+    first, income, expense = daily_totals(frame)
+    balance = cumulative_balance(income, expense)
+    rolling = rolling_average(expense, window)
+    months, categories, shares = category_share_by_month(frame)
+
+    dates = [str(d) for d in (np.arange(len(income)) + first).astype("datetime64[D]")]
+    return {
+        'count': len(frame),
+        'dates': dates,
+        'income': (income / 100).tolist(),
+        'expense': (expense / 100).tolist(),
+        'net': ((income - expense) / 100).tolist(),
+        'balance': (balance / 100).tolist(),
+        'rolling_expense': (rolling / 100).tolist(),
+        'window': window,
+        'months': months,
+        'categories': categories,
+        'category_share': shares.tolist(),
+        'percentiles': {p: v / 100 for p, v in expense_percentiles(frame).items()},
+    }
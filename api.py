@@ -0,0 +1,371 @@
+"""
+Versioned JSON API, mounted at /api/v1.
+
+Log in with POST /login {"email", "password"}; the session cookie then
+authenticates every other request.
+
+    GET    /transactions           a page of transactions (same filters and cursor as /transactions)
+    POST   /transactions           create one transaction, or {"transactions": [...]}
+    GET    /transactions/<id>
+    PATCH  /transactions/<id>      change some fields
+    DELETE /transactions/<id>
+    POST   /batch                  {"create": [...], "update": [{"id": ..}, ...], "delete": [ids]}
+    GET    /budgets?month=         budget status for a month
+    PUT    /budgets                set one budget, or {"budgets": [...]}
+    GET    /reports/monthly?month=
+    GET    /reports/yearly?year=
+    GET    /search?q=              full-text search (type, min, max, start, end, order, limit)
+
+A request with many items runs in one database transaction: it is
+applied completely or, if any item is invalid, not at all. Writes answer
+with ids and counts only, and ?fields=id,amount trims what reads return.
+"""
+from datetime import date, datetime
+from flask import Blueprint, jsonify, request, session
+from auth import hash_password
+from budget import upsert_budget, get_budget_status
+from cache import cached, invalidate_days, invalidate_budget
+from database import get_connection
+from reports import get_monthly_report_data, get_yearly_report_data
+from search import search_transactions, DEFAULT_LIMIT
+from transactions import (insert_transaction, apply_transaction_update,
+                          get_transaction_by_id, get_transactions_page)
+from utils import to_minor, to_day, from_minor, from_day
+
+bp = Blueprint("api", __name__, url_prefix="/api/v1")
+
+# Most items accepted in one request
+MAX_BATCH = 1000
+
+TRANSACTION_FIELDS = ("id", "type", "category", "amount", "date", "description")
+TYPES = ("income", "expense")
+
+
+class ApiError(Exception):
+    """Answered as {"error": message} with an HTTP status"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+@bp.errorhandler(ApiError)
+def api_error(e):
+    return jsonify({"error": str(e)}), e.status
+
+
+@bp.before_request
+def require_login():
+    if request.endpoint != "api.login" and "user_id" not in session:
+        return jsonify({"error": "Not logged in"}), 401
+
+
+def json_body():
+    payload = request.get_json(silent=True)
+    if payload is None:
+        raise ApiError("Expected a JSON body")
+    return payload
+
+
+def items_of(payload, key):
+    """The list under key, or the payload itself as a single item"""
+    items = payload.get(key, [payload]) if isinstance(payload, dict) else payload
+    if not isinstance(items, list):
+        raise ApiError(f"{key} must be a list")
+    if len(items) > MAX_BATCH:
+        raise ApiError(f"At most {MAX_BATCH} items per request", 413)
+    return items
+
+
+def select_fields(objects):
+    """Keep only the fields named in ?fields=a,b (everything without it)"""
+    fields = [name for name in request.args.get("fields", "").split(",") if name]
+    if not fields:
+        return objects
+    return [{name: obj[name] for name in fields if name in obj} for obj in objects]
+
+
+def transaction_json(row):
+    """(id, type, category, amount, date, description) tuple as a dict"""
+    return dict(zip(TRANSACTION_FIELDS, row))
+
+
+def transaction_values(item, current=None):
+    """Validated (type, category, amount, description, date) from a JSON object
+
+    Fields missing from item are taken from current, the stored transaction.
+    """
+    if not isinstance(item, dict):
+        raise ApiError("Each transaction must be an object")
+    values = dict(current or {}, **item)
+
+    t_type = values.get("type")
+    if t_type not in TYPES:
+        raise ApiError("type must be 'income' or 'expense'")
+    category = values.get("category")
+    if not isinstance(category, str) or not category.strip():
+        raise ApiError("category is required")
+    amount = values.get("amount")
+    try:
+        if isinstance(amount, bool) or to_minor(amount) <= 0:
+            raise ValueError
+    except (ValueError, TypeError):
+        raise ApiError("amount must be a positive number of at most 10^13")
+    description = values.get("description") or ""
+    if not isinstance(description, str):
+        raise ApiError("description must be a string")
+    t_date = values.get("date")
+    if t_date is not None:
+        try:
+            to_day(t_date)
+        except (ValueError, TypeError):
+            raise ApiError("date must be YYYY-MM-DD")
+    return t_type, category.strip(), amount, description, t_date
+
+
+def at(where, func, *args):
+    """Run func, prefixing any ApiError with the item's position"""
+    try:
+        return func(*args)
+    except ApiError as e:
+        raise ApiError(f"{where}: {e}", e.status)
+
+
+def create_transactions(cursor, user_id, items):
+    """Insert validated items; returns (ids, days touched)"""
+    ids, days = [], []
+    for t_type, category, amount, description, t_date in items:
+        ids.append(insert_transaction(cursor, user_id, t_type, category, amount,
+                                      description, t_date))
+        days.append(to_day(t_date or date.today()))
+    return ids, days
+
+
+def update_transaction_fields(cursor, user_id, item):
+    """Apply a partial update {"id": .., field: value}; returns the days touched"""
+    if not isinstance(item, dict) or not isinstance(item.get("id"), int):
+        raise ApiError("Each update needs an integer id")
+    cursor.execute("""
+        SELECT id, type, category, amount_minor, day, description
+        FROM transactions WHERE id=? AND user_id=?
+    """, (item["id"], user_id))
+    row = cursor.fetchone()
+    if row is None:
+        raise ApiError(f"Transaction {item['id']} not found", 404)
+
+    t_id, t_type, category, amount_minor, day, description = row
+    current = {"type": t_type, "category": category, "amount": from_minor(amount_minor),
+               "date": from_day(day), "description": description}
+    changes = {key: value for key, value in item.items() if key != "id"}
+    t_type, category, amount, description, t_date = transaction_values(changes, current)
+    apply_transaction_update(cursor, t_id, user_id, t_type, category, amount, description, t_date)
+    return [day, to_day(t_date) if t_date else day]
+
+
+def delete_transaction_by_id(cursor, user_id, t_id):
+    """Delete one transaction; returns the day it was on"""
+    if not isinstance(t_id, int):
+        raise ApiError("Transaction ids must be integers")
+    cursor.execute("DELETE FROM transactions WHERE id=? AND user_id=? RETURNING day",
+                   (t_id, user_id))
+    row = cursor.fetchone()
+    if row is None:
+        raise ApiError(f"Transaction {t_id} not found", 404)
+    return row[0]
+
+
+def page_args():
+    """(filters, page_size, cursor) of a transactions listing from the query string"""
+    filters = {
+        "type": request.args.get("type") or None,
+        "category": request.args.get("category") or None,
+        "start": request.args.get("start") or None,
+        "end": request.args.get("end") or None,
+    }
+    page_size = min(max(request.args.get("page_size", 50, type=int), 1), 500)
+    return filters, page_size, request.args.get("cursor") or None
+
+
+def fetch_page(user_id, filters, page_size, cursor):
+    """One page of a user's transactions and the cursor of the next; ValueError for a bad cursor or date"""
+    return get_transactions_page(user_id, page_size, cursor,
+                                 t_type=filters["type"], category=filters["category"],
+                                 start_date=filters["start"], end_date=filters["end"])
+
+
+def parse_month(value):
+    try:
+        return datetime.strptime(value, "%Y-%m").strftime("%Y-%m")
+    except (ValueError, TypeError):
+        raise ApiError("month must be YYYY-MM")
+
+
+@bp.route("/login", methods=["POST"])
+def login():
+    payload = json_body()
+    if not isinstance(payload, dict):
+        raise ApiError("Expected an object with email and password")
+    email = str(payload.get("email", "")).strip()
+    password = str(payload.get("password", "")).strip()
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT id, password FROM users WHERE email=?", (email,))
+        user = cursor.fetchone()
+    if not user or user[1] != hash_password(password):
+        raise ApiError("Invalid email or password", 401)
+    session["user_id"] = user[0]
+    return jsonify({"user_id": user[0]})
+
+
+@bp.route("/logout", methods=["POST"])
+def logout():
+    session.clear()
+    return "", 204
+
+
+@bp.route("/transactions", methods=["GET"])
+def list_transactions():
+    try:
+        transactions, next_cursor = fetch_page(session["user_id"], *page_args())
+    except ValueError as e:
+        raise ApiError(str(e))
+    return jsonify({"transactions": select_fields([transaction_json(t) for t in transactions]),
+                    "next_cursor": next_cursor})
+
+
+@bp.route("/transactions", methods=["POST"])
+def create():
+    user_id = session["user_id"]
+    items = items_of(json_body(), "transactions")
+    values = [at(f"transactions[{i}]", transaction_values, item) for i, item in enumerate(items)]
+    with get_connection() as conn:
+        ids, days = create_transactions(conn.cursor(), user_id, values)
+    invalidate_days(user_id, *days)
+    return jsonify({"ids": ids}), 201
+
+
+@bp.route("/transactions/<int:transaction_id>", methods=["GET"])
+def get_one(transaction_id):
+    transaction = get_transaction_by_id(transaction_id, session["user_id"])
+    if transaction is None:
+        raise ApiError(f"Transaction {transaction_id} not found", 404)
+    return jsonify(select_fields([transaction_json(transaction)])[0])
+
+
+@bp.route("/transactions/<int:transaction_id>", methods=["PATCH"])
+def update(transaction_id):
+    user_id = session["user_id"]
+    payload = json_body()
+    if not isinstance(payload, dict):
+        raise ApiError("Expected an object")
+    with get_connection() as conn:
+        days = update_transaction_fields(conn.cursor(), user_id,
+                                         dict(payload, id=transaction_id))
+    invalidate_days(user_id, *days)
+    return jsonify({"updated": 1})
+
+
+@bp.route("/transactions/<int:transaction_id>", methods=["DELETE"])
+def delete(transaction_id):
+    user_id = session["user_id"]
+    with get_connection() as conn:
+        day = delete_transaction_by_id(conn.cursor(), user_id, transaction_id)
+    invalidate_days(user_id, day)
+    return jsonify({"deleted": 1})
+
+
+@bp.route("/batch", methods=["POST"])
+def batch():
+    user_id = session["user_id"]
+    payload = json_body()
+    if not isinstance(payload, dict):
+        raise ApiError("Expected an object with create, update and delete lists")
+    creates, updates, deletes = (payload.get(key, []) for key in ("create", "update", "delete"))
+    if not all(isinstance(ops, list) for ops in (creates, updates, deletes)):
+        raise ApiError("create, update and delete must be lists")
+    if len(creates) + len(updates) + len(deletes) > MAX_BATCH:
+        raise ApiError(f"At most {MAX_BATCH} items per request", 413)
+
+    values = [at(f"create[{i}]", transaction_values, item) for i, item in enumerate(creates)]
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        ids, days = create_transactions(cursor, user_id, values)
+        for i, item in enumerate(updates):
+            days += at(f"update[{i}]", update_transaction_fields, cursor, user_id, item)
+        for i, t_id in enumerate(deletes):
+            days.append(at(f"delete[{i}]", delete_transaction_by_id, cursor, user_id, t_id))
+    invalidate_days(user_id, *days)
+    return jsonify({"created": ids, "updated": len(updates), "deleted": len(deletes)})
+
+
+@bp.route("/budgets", methods=["GET"])
+def budgets():
+    month = parse_month(request.args.get("month", date.today().strftime("%Y-%m")))
+    status = cached("budget", session["user_id"], month, get_budget_status)
+    return jsonify({"month": month, "budgets": select_fields(status)})
+
+
+def budget_values(item):
+    """Validated (category, limit, month) from a JSON object"""
+    if not isinstance(item, dict):
+        raise ApiError("Each budget must be an object")
+    category = item.get("category")
+    if not isinstance(category, str) or not category.strip():
+        raise ApiError("category is required")
+    limit = item.get("limit")
+    try:
+        if isinstance(limit, bool) or to_minor(limit) < 0:
+            raise ValueError
+    except (ValueError, TypeError):
+        raise ApiError("limit must be a number from 0 to 10^13")
+    return category.strip(), limit, parse_month(item.get("month"))
+
+
+@bp.route("/budgets", methods=["PUT"])
+def save_budgets():
+    user_id = session["user_id"]
+    values = [at(f"budgets[{i}]", budget_values, item)
+              for i, item in enumerate(items_of(json_body(), "budgets"))]
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        for category, limit, month in values:
+            upsert_budget(cursor, user_id, category, limit, month)
+    for month in {month for _, _, month in values}:
+        invalidate_budget(user_id, month)
+    return jsonify({"saved": len(values)})
+
+
+@bp.route("/reports/monthly")
+def monthly_report():
+    month = parse_month(request.args.get("month", date.today().strftime("%Y-%m")))
+    report = cached("monthly", session["user_id"], month, get_monthly_report_data)
+    return jsonify(select_fields([dict(report, month=month)])[0])
+
+
+@bp.route("/reports/yearly")
+def yearly_report():
+    year = request.args.get("year", date.today().strftime("%Y"))
+    if not (year.isdigit() and len(year) == 4):
+        raise ApiError("year must be YYYY")
+    report = cached("yearly", session["user_id"], year, get_yearly_report_data)
+    return jsonify(select_fields([dict(report, year=year)])[0])
+
+
+@bp.route("/search")
+def search():
+    query = request.args.get("q", "")
+    if not query.strip():
+        raise ApiError("q is required")
+    try:
+        results = search_transactions(
+            session["user_id"], query,
+            t_type=request.args.get("type") or None,
+            min_amount=request.args.get("min") or None,
+            max_amount=request.args.get("max") or None,
+            start_date=request.args.get("start") or None,
+            end_date=request.args.get("end") or None,
+            order=request.args.get("order", "rank"),
+            limit=request.args.get("limit", DEFAULT_LIMIT, type=int))
+    except ValueError as e:
+        raise ApiError(str(e))
+    return jsonify({"transactions": select_fields([transaction_json(t) for t in results])})
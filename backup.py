@@ -1,9 +1,293 @@
-import shutil
+"""
+Online backups using SQLite's backup API.
 
-def backup_db():
-    shutil.copy("finance.db", "finance_backup.db")
-    print("✅ Backup created")
+In WAL mode (the default storage profiles) a backup copies the live
+database in one step: it reads a consistent snapshot while writers carry
+on. With the rollback journal, reading would lock writers out, so the
+copy goes a few hundred pages at a time, sleeping briefly between steps.
+SQLite restarts a stepped copy whenever a write lands mid-backup; after
+MAX_RESTARTS restarts the rest is copied in one step, so a backup always
+finishes and every finished file is a consistent snapshot. Backups run on a background thread, are
+named by timestamp and only the newest KEEP_BACKUPS are kept. A lock
+file keeps worker processes of one server from backing up at the same
+time; the status of a backup running in another process shows as
+'running' without its progress.
 
-def restore_db():
-    shutil.copy("finance_backup.db", "finance.db")
-    print("✅ Database restored")
+Restore checks the chosen backup with PRAGMA integrity_check, saves a
+backup of the current data first, then copies the backup into the live
+database through a pooled connection, so other connections see the new
+data instead of a file swapped out from under them.
+
+Usage:
+    python backup.py backup [--db finance.db]
+    python backup.py list
+    python backup.py restore [BACKUP_FILE] [--db finance.db]
+"""
+import argparse
+import contextlib
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+import database
+from database import get_connection
+from cache import clear_cache
+
+# Directory holding timestamped backups; override with FINANCE_BACKUP_DIR
+BACKUP_DIR = os.environ.get("FINANCE_BACKUP_DIR", "backups")
+
+# Number of backups kept after rotation
+KEEP_BACKUPS = int(os.environ.get("FINANCE_BACKUP_KEEP", "7"))
+
+# Pages copied per step and pause between steps, without WAL
+PAGES_PER_STEP = 256
+STEP_PAUSE = 0.005
+
+# Restarts caused by writes before a stepped backup copies in one step
+MAX_RESTARTS = 10
+
+BACKUP_PREFIX = "finance-"
+BACKUP_SUFFIX = ".db"
+
+_status = {
+    'state': 'idle',
+    'pages_done': 0,
+    'pages_total': 0,
+    'path': None,
+    'error': None,
+    'started': None,
+    'finished': None,
+}
+_status_lock = threading.Lock()
+_worker = None
+
+
+def _update_status(**changes):
+    with _status_lock:
+        _status.update(changes)
+
+
+def _running_elsewhere():
+    with database.file_lock("backup", blocking=False) as acquired:
+        return not acquired
+
+
+def get_backup_status():
+    """Progress of the latest background backup"""
+    with _status_lock:
+        status = dict(_status)
+    if status['state'] != 'running' and _running_elsewhere():
+        # Started by another worker process, whose progress is not visible here
+        status.update(state='running', pages_done=0, pages_total=0, path=None, error=None,
+                      started=None, finished=None)
+    total = status['pages_total']
+    status['percent'] = (status['pages_done'] / total * 100) if total else 0.0
+    return status
+
+
+def check_integrity(path, quick=False):
+    """Return True if PRAGMA integrity_check (or the faster quick_check) passes"""
+    pragma = "quick_check" if quick else "integrity_check"
+    conn = sqlite3.connect(f"file:{os.path.abspath(path)}?mode=ro", uri=True)
+    try:
+        return conn.execute(f"PRAGMA {pragma}").fetchone()[0] == "ok"
+    except sqlite3.DatabaseError:
+        return False
+    finally:
+        conn.close()
+
+
+def list_backups():
+    """Return (path, size, modified datetime) for each backup, newest first"""
+    if not os.path.isdir(BACKUP_DIR):
+        return []
+    backups = []
+    for name in os.listdir(BACKUP_DIR):
+        if name.startswith(BACKUP_PREFIX) and name.endswith(BACKUP_SUFFIX):
+            path = os.path.join(BACKUP_DIR, name)
+            stat = os.stat(path)
+            backups.append((path, stat.st_size, datetime.fromtimestamp(stat.st_mtime)))
+    # Names embed the timestamp, so they sort chronologically
+    backups.sort(key=lambda b: os.path.basename(b[0]), reverse=True)
+    return backups
+
+
+def rotate_backups(keep=None, spare=None):
+    """Delete all but the newest backups (and spare) and return the removed paths"""
+    keep = KEEP_BACKUPS if keep is None else keep
+    spare = os.path.abspath(spare) if spare else None
+    removed = [path for path, _, _ in list_backups()[keep:] if os.path.abspath(path) != spare]
+    for path in removed:
+        os.remove(path)
+    return removed
+
+
+def _new_backup_path(label=""):
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    suffix = f"-{label}" if label else ""
+    return os.path.join(BACKUP_DIR, f"{BACKUP_PREFIX}{stamp}{suffix}{BACKUP_SUFFIX}")
+
+
+class _TooManyRestarts(Exception):
+    pass
+
+
+def backup_db(label="", pages=None, pause=STEP_PAUSE, rotate=True):
+    """Copy the live database to a new timestamped backup and return its path
+
+    pages is the number copied per step: by default all of them in WAL
+    mode, PAGES_PER_STEP otherwise.
+    """
+    os.makedirs(BACKUP_DIR, exist_ok=True)
+    path = _new_backup_path(label)
+    partial = path + ".partial"
+    restarts = 0
+    last_remaining = None
+
+    def progress(status, remaining, total):
+        nonlocal restarts, last_remaining
+        _update_status(pages_done=total - remaining, pages_total=total)
+        # The copy starts over when another connection writes
+        if last_remaining is not None and remaining > last_remaining:
+            restarts += 1
+            if restarts > MAX_RESTARTS:
+                raise _TooManyRestarts
+        last_remaining = remaining
+        if pause and remaining:
+            time.sleep(pause)
+
+    source = sqlite3.connect(database.DB_PATH, timeout=database.POOL_TIMEOUT)
+    target = sqlite3.connect(partial)
+    try:
+        if pages is None:
+            wal = source.execute("PRAGMA journal_mode").fetchone()[0].lower() == "wal"
+            pages = -1 if wal else PAGES_PER_STEP
+        try:
+            source.backup(target, pages=pages, progress=progress)
+        except _TooManyRestarts:
+            print(f"⚠️ Backup restarted {restarts} times by writes; copying in one step")
+            source.backup(target, pages=-1, progress=progress)
+    except BaseException:
+        target.close()
+        os.remove(partial)
+        raise
+    finally:
+        source.close()
+    target.close()
+
+    # A page-for-page copy only needs the quick check; restore runs the full one
+    if not check_integrity(partial, quick=True):
+        os.remove(partial)
+        raise sqlite3.DatabaseError(f"Backup {path} failed integrity check")
+
+    # Only complete, verified files get a backup name
+    os.replace(partial, path)
+    if rotate:
+        rotate_backups()
+    print(f"✅ Backup created: {path}")
+    return path
+
+
+def _run_backup(lock):
+    with lock:
+        try:
+            path = backup_db()
+        except Exception as e:
+            _update_status(state='failed', error=str(e), finished=datetime.now())
+            print(f"❌ Backup failed: {e}")
+        else:
+            _update_status(state='done', path=path, finished=datetime.now())
+
+
+def start_backup():
+    """Start a backup on a background thread; returns False if one is running (in any process)"""
+    global _worker
+    with _status_lock:
+        if _worker is not None and _worker.is_alive():
+            return False
+        # Held by the backup thread until it finishes
+        lock = contextlib.ExitStack()
+        if not lock.enter_context(database.file_lock("backup", blocking=False)):
+            lock.close()
+            return False
+        _status.update(state='running', pages_done=0, pages_total=0, path=None,
+                       error=None, started=datetime.now(), finished=None)
+        _worker = threading.Thread(target=_run_backup, args=(lock,), name="backup", daemon=True)
+        _worker.start()
+    return True
+
+
+def wait_for_backup(timeout=None):
+    """Block until the background backup finishes"""
+    worker = _worker
+    if worker is not None:
+        worker.join(timeout)
+    return get_backup_status()
+
+
+def _copy_into_live(path):
+    """Copy a backup over the live database; returns the integrity check result"""
+    source = sqlite3.connect(f"file:{os.path.abspath(path)}?mode=ro", uri=True)
+    try:
+        with get_connection() as conn:
+            source.backup(conn)
+            if conn.execute("PRAGMA integrity_check").fetchone()[0] != "ok":
+                return False
+            # Older backups may predate the current schema
+            database.migrate(conn)
+    finally:
+        source.close()
+    return True
+
+
+def restore_db(path=None):
+    """Replace the live data with a backup (newest by default); returns True on success"""
+    if path is None:
+        backups = list_backups()
+        if not backups:
+            print("❌ No backups to restore")
+            return False
+        path = backups[0][0]
+
+    if not os.path.exists(path) or not check_integrity(path):
+        print(f"❌ Backup {path} is missing or damaged; nothing restored")
+        return False
+
+    # Keep the current data so a mistaken restore can be undone. Rotating
+    # now could delete the backup being restored, so that waits until after
+    previous = backup_db(label="pre-restore", rotate=False)
+
+    if not _copy_into_live(path):
+        _copy_into_live(previous)
+        print("❌ Restored database failed integrity check; kept the current data")
+        return False
+
+    rotate_backups(spare=path)
+    clear_cache()
+    print(f"✅ Database restored from {path}")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Back up or restore the finance database")
+    parser.add_argument("command", choices=["backup", "list", "restore"])
+    parser.add_argument("file", nargs="?", help="backup to restore (defaults to the newest)")
+    parser.add_argument("--db", help="database file (defaults to FINANCE_DB or finance.db)")
+    args = parser.parse_args()
+
+    if args.db:
+        database.configure(args.db)
+
+    if args.command == "backup":
+        backup_db()
+        return 0
+    if args.command == "list":
+        for path, size, modified in list_backups():
+            print(f"{modified:%Y-%m-%d %H:%M:%S}  {size:>12,}  {path}")
+        return 0
+    return 0 if restore_db(args.file) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,378 @@
+"""
+Incremental, compressed backup chains.
+
+A chain starts with a full base snapshot (taken with the backup API, then
+compressed) and continues with small deltas. While a chain is active,
+triggers record the id of every changed row in transactions and budgets
+in change_log; a delta stores the current contents of just those rows
+(or that they were deleted) plus the small users table. Restore
+decompresses the base, replays the deltas in order and hands the result
+to backup.restore_db, which verifies it and swaps it in.
+
+Artifacts are gzip-compressed, or zstd when the zstandard package is
+installed and chosen. chain.json lists every chain with checksums.
+
+Usage:
+    python backup_chain.py backup [--full] [--compression gzip|zstd] [--db finance.db]
+    python backup_chain.py list
+    python backup_chain.py restore [--chain N] [--upto N] [--db finance.db]
+"""
+import argparse
+import base64
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import uuid
+from datetime import datetime
+import backup
+import database
+from database import get_connection
+
+# Compression for new artifacts; zstd needs the zstandard package
+COMPRESSION = os.environ.get("FINANCE_BACKUP_COMPRESSION", "gzip")
+
+# Deltas per chain before a new base is taken, and chains kept on disk
+MAX_DELTAS = 30
+KEEP_CHAINS = 3
+
+# Changed tables replayed row by row; users is small and copied whole
+LOGGED_TABLES = ("transactions", "budgets")
+
+EXTENSIONS = {"gzip": ".gz", "zstd": ".zst"}
+
+MANIFEST_NAME = "chain.json"
+
+
+def chain_dir():
+    """Directory holding chain artifacts and the manifest"""
+    return os.path.join(backup.BACKUP_DIR, "chains")
+
+
+def _open_compressed(path, mode):
+    if path.endswith(".zst"):
+        try:
+            import zstandard
+        except ImportError:
+            raise RuntimeError("zstd backups require zstandard (pip install zstandard)")
+        return zstandard.open(path, mode)
+    # Level 6 compresses nearly as well as the default 9 in a fraction of the time
+    return gzip.open(path, mode, compresslevel=6)
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_manifest():
+    """Return the chain manifest, empty if no chain exists yet"""
+    path = os.path.join(chain_dir(), MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {'chains': []}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save_manifest(manifest):
+    path = os.path.join(chain_dir(), MANIFEST_NAME)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def _artifact(name, extra):
+    """Manifest entry for a finished artifact file"""
+    path = os.path.join(chain_dir(), name)
+    entry = {'file': name, 'size': os.path.getsize(path), 'sha256': _sha256(path),
+             'created': datetime.now().isoformat(timespec="seconds")}
+    entry.update(extra)
+    return entry
+
+
+def _encode(value):
+    if isinstance(value, bytes):
+        return {'b64': base64.b64encode(value).decode()}
+    return value
+
+
+def _decode(value):
+    if isinstance(value, dict):
+        return base64.b64decode(value['b64'])
+    return value
+
+
+def _stamp():
+    return datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+
+
+def take_base(compression=None):
+    """Start a new chain with a compressed full snapshot and return its manifest entry"""
+    compression = compression or COMPRESSION
+    os.makedirs(chain_dir(), exist_ok=True)
+    chain_id = uuid.uuid4().hex
+
+    # Start logging before the snapshot so no change falls between the two
+    with get_connection() as conn:
+        start_seq = conn.execute(
+            "SELECT seq FROM sqlite_sequence WHERE name='change_log'").fetchone()
+        start_seq = start_seq[0] if start_seq else 0
+        conn.execute("UPDATE backup_chain SET chain_id=?, last_seq=?",
+                     (chain_id, start_seq))
+
+    name = f"base-{_stamp()}.db{EXTENSIONS[compression]}"
+    path = os.path.join(chain_dir(), name)
+    snapshot = path + ".partial"
+    source = sqlite3.connect(database.DB_PATH, timeout=database.POOL_TIMEOUT)
+    target = sqlite3.connect(snapshot)
+    try:
+        source.backup(target, pages=backup.PAGES_PER_STEP)
+        seq = target.execute("SELECT MAX(seq) FROM change_log").fetchone()[0] or start_seq
+        schema_version = database.get_schema_version(target)
+    finally:
+        source.close()
+        target.close()
+
+    with open(snapshot, "rb") as raw, _open_compressed(path, "wb") as packed:
+        shutil.copyfileobj(raw, packed, 1024 * 1024)
+    os.remove(snapshot)
+
+    # Changes already in the snapshot no longer need logging
+    with get_connection() as conn:
+        conn.execute("UPDATE backup_chain SET last_seq=? WHERE chain_id=?", (seq, chain_id))
+        conn.execute("DELETE FROM change_log WHERE seq <= ?", (seq,))
+
+    chain = {
+        'id': chain_id,
+        'schema_version': schema_version,
+        'compression': compression,
+        'base': _artifact(name, {'seq': seq}),
+        'deltas': [],
+    }
+    manifest = load_manifest()
+    manifest['chains'].append(chain)
+    for old in manifest['chains'][:-KEEP_CHAINS]:
+        for entry in [old['base']] + old['deltas']:
+            artifact = os.path.join(chain_dir(), entry['file'])
+            if os.path.exists(artifact):
+                os.remove(artifact)
+    manifest['chains'] = manifest['chains'][-KEEP_CHAINS:]
+    _save_manifest(manifest)
+
+    print(f"✅ Base backup created: {name}")
+    return chain['base']
+
+
+def _chain_position(chain):
+    """Sequence number the live database must be at for the chain to continue"""
+    if chain['deltas']:
+        return chain['deltas'][-1]['to_seq']
+    return chain['base']['seq']
+
+
+def take_delta():
+    """Write the rows changed since the chain's last artifact; None if nothing changed
+
+    Raises LookupError when the live database is not on the latest chain
+    (no chain yet, a restore happened or the schema changed).
+    """
+    manifest = load_manifest()
+    if not manifest['chains']:
+        raise LookupError("no backup chain")
+    chain = manifest['chains'][-1]
+    name = f"delta-{_stamp()}.jsonl{EXTENSIONS[chain['compression']]}"
+    path = os.path.join(chain_dir(), name)
+
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        # Block writers only while the changed rows are read
+        cursor.execute("BEGIN IMMEDIATE")
+        chain_id, last_seq = cursor.execute(
+            "SELECT chain_id, last_seq FROM backup_chain").fetchone()
+        if (chain_id != chain['id'] or last_seq != _chain_position(chain)
+                or database.get_schema_version(conn) != chain['schema_version']):
+            raise LookupError("database is not on the latest backup chain")
+
+        to_seq = cursor.execute("SELECT MAX(seq) FROM change_log").fetchone()[0]
+        if to_seq is None or to_seq <= last_seq:
+            return None
+
+        changed = {}
+        cursor.execute("""
+            SELECT DISTINCT tbl, row_id FROM change_log
+            WHERE seq > ? AND seq <= ?
+        """, (last_seq, to_seq))
+        for table, row_id in cursor.fetchall():
+            changed.setdefault(table, []).append(row_id)
+
+        rows = 0
+        # Keep the compression extension so the partial file opens the same way
+        partial = os.path.join(chain_dir(), f"partial-{name}")
+        with _open_compressed(partial, "wt") as out:
+            def write(record):
+                out.write(json.dumps(record) + "\n")
+
+            write({'from_seq': last_seq, 'to_seq': to_seq})
+            cursor.execute("SELECT * FROM users")
+            write({'table': 'users', 'columns': [c[0] for c in cursor.description],
+                   'replace_all': True,
+                   'rows': [[_encode(v) for v in row] for row in cursor.fetchall()]})
+
+            for table in LOGGED_TABLES:
+                ids = changed.get(table, [])
+                if not ids:
+                    continue
+                present = set()
+                for start in range(0, len(ids), 500):
+                    chunk = ids[start:start + 500]
+                    cursor.execute(f"""
+                        SELECT * FROM {table}
+                        WHERE id IN ({",".join("?" * len(chunk))})
+                    """, chunk)
+                    columns = [c[0] for c in cursor.description]
+                    for row in cursor.fetchall():
+                        present.add(row[0])
+                        write({'table': table, 'columns': columns,
+                               'row': [_encode(v) for v in row]})
+                for row_id in ids:
+                    if row_id not in present:
+                        write({'table': table, 'deleted': row_id})
+                rows += len(ids)
+
+        os.replace(partial, path)
+        cursor.execute("UPDATE backup_chain SET last_seq=?", (to_seq,))
+        cursor.execute("DELETE FROM change_log WHERE seq <= ?", (to_seq,))
+
+    entry = _artifact(name, {'from_seq': last_seq, 'to_seq': to_seq, 'rows': rows})
+    chain['deltas'].append(entry)
+    _save_manifest(manifest)
+    print(f"✅ Incremental backup created: {name} ({rows} changed rows)")
+    return entry
+
+
+def backup_incremental(full=False, compression=None):
+    """Add a delta to the current chain, starting a new chain when needed"""
+    manifest = load_manifest()
+    if (full or not manifest['chains']
+            or len(manifest['chains'][-1]['deltas']) >= MAX_DELTAS
+            or (compression and compression != manifest['chains'][-1]['compression'])):
+        return take_base(compression)
+    try:
+        return take_delta()
+    except LookupError:
+        return take_base(compression)
+
+
+def _apply_delta(conn, path):
+    """Replay one delta file into a database connection
+
+    Two passes: every deleted or changed row is removed first, then the
+    present rows are inserted, so a row that replaced a deleted one under
+    a unique key (a re-imported transaction, a re-created budget) does
+    not collide with it.
+    """
+    with _open_compressed(path, "rt") as f:
+        next(f)
+        for line in f:
+            record = json.loads(line)
+            table = record['table']
+            if table not in LOGGED_TABLES + ("users",):
+                raise ValueError(f"Unexpected table in delta: {table}")
+            if record.get('replace_all'):
+                columns = record['columns']
+                conn.execute(f"DELETE FROM {table}")
+                conn.executemany(
+                    f"INSERT INTO {table} ({','.join(columns)}) VALUES ({','.join('?' * len(columns))})",
+                    [[_decode(v) for v in row] for row in record['rows']])
+            elif 'deleted' in record:
+                conn.execute(f"DELETE FROM {table} WHERE id=?", (record['deleted'],))
+            else:
+                # Delete then insert so the rollup triggers see the change
+                conn.execute(f"DELETE FROM {table} WHERE id=?", (_decode(record['row'][0]),))
+
+    with _open_compressed(path, "rt") as f:
+        next(f)
+        for line in f:
+            record = json.loads(line)
+            if 'row' in record:
+                table, columns = record['table'], record['columns']
+                conn.execute(
+                    f"INSERT INTO {table} ({','.join(columns)}) VALUES ({','.join('?' * len(columns))})",
+                    [_decode(v) for v in record['row']])
+
+
+def build_restore(chain_index=-1, upto=None, target=None):
+    """Rebuild a database file from a chain's base and deltas and return its path"""
+    manifest = load_manifest()
+    if not manifest['chains']:
+        raise LookupError("no backup chain")
+    chain = manifest['chains'][chain_index]
+    deltas = chain['deltas'] if upto is None else chain['deltas'][:upto]
+
+    for entry in [chain['base']] + deltas:
+        if _sha256(os.path.join(chain_dir(), entry['file'])) != entry['sha256']:
+            raise ValueError(f"Checksum mismatch for {entry['file']}")
+
+    target = target or os.path.join(chain_dir(), f"restore-{_stamp()}.db")
+    with _open_compressed(os.path.join(chain_dir(), chain['base']['file']), "rb") as packed, \
+            open(target, "wb") as raw:
+        shutil.copyfileobj(packed, raw, 1024 * 1024)
+
+    conn = sqlite3.connect(target)
+    try:
+        for entry in deltas:
+            _apply_delta(conn, os.path.join(chain_dir(), entry['file']))
+        # The restored copy starts outside any chain; the next backup takes a new base
+        conn.execute("UPDATE backup_chain SET chain_id=NULL, last_seq=0")
+        conn.execute("DELETE FROM change_log")
+        conn.commit()
+    finally:
+        conn.close()
+    return target
+
+
+def restore_chain(chain_index=-1, upto=None):
+    """Restore the live database from a chain; returns True on success"""
+    path = build_restore(chain_index, upto)
+    try:
+        return backup.restore_db(path)
+    finally:
+        os.remove(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incremental backups of the finance database")
+    parser.add_argument("command", choices=["backup", "list", "restore"])
+    parser.add_argument("--full", action="store_true", help="start a new chain with a base snapshot")
+    parser.add_argument("--compression", choices=sorted(EXTENSIONS))
+    parser.add_argument("--chain", type=int, default=-1, help="chain to restore (default: latest)")
+    parser.add_argument("--upto", type=int, help="number of deltas to replay (default: all)")
+    parser.add_argument("--db", help="database file (defaults to FINANCE_DB or finance.db)")
+    args = parser.parse_args()
+
+    if args.db:
+        database.configure(args.db)
+    database.init_db()
+
+    if args.command == "backup":
+        entry = backup_incremental(args.full, args.compression)
+        if entry is None:
+            print("✅ No changes since the last backup")
+        return 0
+    if args.command == "list":
+        for index, chain in enumerate(load_manifest()['chains']):
+            base = chain['base']
+            print(f"chain {index}: base {base['file']} ({base['size']:,} bytes)")
+            for entry in chain['deltas']:
+                print(f"    delta {entry['file']} ({entry['rows']} rows, {entry['size']:,} bytes)")
+        return 0
+    return 0 if restore_chain(args.chain, args.upto) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
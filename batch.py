@@ -0,0 +1,226 @@
+"""
+Precompute every user's reports ahead of the month-end rush.
+
+The monthly report, yearly report and budget status of every user are
+computed by a pool of worker processes, each reading through its own
+single-connection pool, and stored as JSON in report_cache, which the
+web app reads before falling back to computing a report itself.
+
+Users are handed to workers in chunks; the parent process is the only
+writer and commits each chunk as it comes back, printing progress and
+throughput as it goes.
+
+At the start of a run every user gets a "claim" row in report_cache.
+The cache triggers delete a user's rows (claim included) whenever their
+transactions or budgets change, so:
+
+- a report is only stored while its claim is still there, so a report
+  read before a change can never overwrite the change;
+- claims left behind by an interrupted run are exactly the users still
+  to do, which --resume picks up.
+
+Usage:
+    python batch.py [--month YYYY-MM] [--year YYYY] [--workers N] [--resume] [--db finance.db]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime
+import database
+from database import get_connection
+from reports import get_monthly_report_data, get_yearly_report_data
+from budget import get_budget_status
+from utils import month_key, from_month_key
+
+# Worker processes, and users handed to a worker at a time
+WORKERS = os.cpu_count() or 1
+CHUNK_SIZE = 200
+
+CLAIM = "claim"
+
+
+def _init_worker(db_path, profile):
+    """Point a worker process at the database with a single connection"""
+    database.configure(db_path, pool_size=1, profile=profile)
+
+
+def compute_reports(user_ids, month, year):
+    """Report cache rows (user_id, kind, period, JSON) for a chunk of users"""
+    rows = []
+    for user_id in user_ids:
+        rows.append((user_id, "monthly", month,
+                     json.dumps(get_monthly_report_data(user_id, month))))
+        rows.append((user_id, "yearly", year,
+                     json.dumps(get_yearly_report_data(user_id, year))))
+        rows.append((user_id, "budget", month,
+                     json.dumps(get_budget_status(user_id, month))))
+    return user_ids, rows
+
+
+def get_cached_report(user_id, kind, period):
+    """Precomputed report data, or None if it is missing or was invalidated"""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT data FROM report_cache
+            WHERE user_id=? AND kind=? AND period=?
+        """, (user_id, kind, period))
+        row = cursor.fetchone()
+    return json.loads(row[0]) if row else None
+
+
+def _start_run(month, year, resume):
+    """Return (run id, user ids still to do), claiming them for a new run"""
+    now = datetime.now().isoformat(timespec="seconds")
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        if resume:
+            cursor.execute("""
+                SELECT id FROM report_runs
+                WHERE month=? AND year=? AND finished_at IS NULL
+                ORDER BY id DESC LIMIT 1
+            """, (month, year))
+            row = cursor.fetchone()
+            if row:
+                cursor.execute("""
+                    SELECT user_id FROM report_cache
+                    WHERE kind=? AND period=?
+                    ORDER BY user_id
+                """, (CLAIM, str(row[0])))
+                return row[0], [user_id for user_id, in cursor.fetchall()]
+
+        cursor.execute("SELECT COUNT(*) FROM users")
+        total = cursor.fetchone()[0]
+        cursor.execute("""
+            INSERT INTO report_runs (month, year, users_total, started_at)
+            VALUES (?, ?, ?, ?)
+        """, (month, year, total, now))
+        run_id = cursor.lastrowid
+        cursor.execute("""
+            INSERT OR REPLACE INTO report_cache (user_id, kind, period, data, run_id, computed_at)
+            SELECT id, ?, ?, '', ?, ? FROM users
+        """, (CLAIM, str(run_id), run_id, now))
+        cursor.execute("SELECT id FROM users ORDER BY id")
+        users = [user_id for user_id, in cursor.fetchall()]
+    return run_id, users
+
+
+def _store_chunk(run_id, user_ids, rows):
+    """Save a chunk's reports for users whose claim survived; returns how many were saved"""
+    now = datetime.now().isoformat(timespec="seconds")
+    by_user = {}
+    for row in rows:
+        by_user.setdefault(row[0], []).append(row)
+
+    stored = 0
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        for user_id in user_ids:
+            cursor.execute("""
+                DELETE FROM report_cache WHERE user_id=? AND kind=? AND period=?
+            """, (user_id, CLAIM, str(run_id)))
+            if not cursor.rowcount:
+                # Their data changed after the claim; this report may be stale
+                continue
+            cursor.executemany("""
+                INSERT INTO report_cache (user_id, kind, period, data, run_id, computed_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (user_id, kind, period)
+                DO UPDATE SET data=excluded.data, run_id=excluded.run_id,
+                              computed_at=excluded.computed_at
+            """, [row + (run_id, now) for row in by_user.get(user_id, [])])
+            stored += 1
+        cursor.execute("UPDATE report_runs SET users_done = users_done + ? WHERE id=?",
+                       (len(user_ids), run_id))
+    return stored
+
+
+def _finish_run(run_id):
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM report_cache WHERE kind=? AND period=?", (CLAIM, str(run_id)))
+        cursor.execute("UPDATE report_runs SET finished_at=? WHERE id=?",
+                       (datetime.now().isoformat(timespec="seconds"), run_id))
+
+
+def precompute_reports(month=None, year=None, workers=WORKERS, chunk_size=CHUNK_SIZE,
+                       resume=False, quiet=False):
+    """Precompute reports for every user; workers=0 runs in this process"""
+    # Store under the periods the app reads, e.g. '2024-03' and not '2024-3'
+    month = from_month_key(month_key(month)) if month else date.today().strftime("%Y-%m")
+    year = f"{int(year or month[:4]):04d}"
+    start = time.perf_counter()
+    run_id, users = _start_run(month, year, resume)
+    chunks = [users[i:i + chunk_size] for i in range(0, len(users), chunk_size)]
+
+    done = stored = 0
+
+    def record(user_ids, rows):
+        nonlocal done, stored
+        stored += _store_chunk(run_id, user_ids, rows)
+        done += len(user_ids)
+        if not quiet:
+            elapsed = time.perf_counter() - start
+            print(f"  {done}/{len(users)} users ({done / len(users) * 100:.0f}%), "
+                  f"{done / elapsed:,.0f} users/s", flush=True)
+
+    if workers and len(chunks) > 1:
+        # Spawned workers start clean instead of inheriting the parent's open connections
+        with ProcessPoolExecutor(max_workers=workers,
+                                 mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=_init_worker,
+                                 initargs=(database.DB_PATH, database.STORAGE_PROFILE)) as pool:
+            futures = [pool.submit(compute_reports, chunk, month, year) for chunk in chunks]
+            for future in as_completed(futures):
+                record(*future.result())
+    else:
+        for chunk in chunks:
+            record(*compute_reports(chunk, month, year))
+
+    _finish_run(run_id)
+    seconds = time.perf_counter() - start
+    rate = done / seconds if seconds else 0.0
+    if not quiet:
+        print(f"✅ Precomputed reports for {stored} users in {seconds:.2f}s "
+              f"({rate:,.0f} users/s, run {run_id})")
+        if done > stored:
+            print(f"⚠️ {done - stored} users changed their data during the run and were skipped")
+    return {'run_id': run_id, 'users': done, 'stored': stored,
+            'skipped': done - stored, 'seconds': seconds, 'users_per_second': rate}
+
+
+def month_arg(value):
+    """argparse type for --month: a 'YYYY-MM' month, normalized"""
+    try:
+        month = from_month_key(month_key(value))
+        datetime.strptime(month, "%Y-%m")
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"not a month: {value!r} (expected YYYY-MM)")
+    return month
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute reports for every user")
+    parser.add_argument("--month", type=month_arg, help="month of the monthly report and budget status (YYYY-MM, default: current)")
+    parser.add_argument("--year", type=int, help="year of the yearly report (default: the month's year)")
+    parser.add_argument("--workers", type=int, default=WORKERS,
+                        help="worker processes (0 computes in this process)")
+    parser.add_argument("--chunk", type=int, default=CHUNK_SIZE, help="users per work item")
+    parser.add_argument("--resume", action="store_true",
+                        help="finish the last interrupted run for the same month and year")
+    parser.add_argument("--db", help="database file (defaults to FINANCE_DB or finance.db)")
+    args = parser.parse_args()
+
+    if args.db:
+        database.configure(args.db)
+    database.init_db()
+
+    precompute_reports(args.month, args.year, args.workers, args.chunk, args.resume)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
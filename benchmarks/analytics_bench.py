@@ -0,0 +1,152 @@
+"""
+Vectorized analytics against the same series computed with per-row loops.
+
+Seeds --rows transactions for one user, then times analytics.analyze on
+the loaded arrays against a plain-Python version that walks the rows one
+at a time, and checks both give the same answers.
+
+Usage:
+    python benchmarks/analytics_bench.py [--rows 200000] [--repeat 3]
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import analytics
+import database
+from database import get_connection
+from utils import day_to_date
+
+CATEGORIES = ["Food", "Rent", "Travel", "Shopping", "Bills", "Health"]
+
+
+def seed(rows):
+    rng = random.Random(42)
+    data = []
+    for _ in range(rows):
+        day = rng.randint(2015, 2024) * 10000 + rng.randint(1, 12) * 100 + rng.randint(1, 28)
+        if rng.random() < 0.1:
+            data.append((1, "income", "Salary", rng.randint(100000, 10000000), day, ""))
+        else:
+            data.append((1, "expense", rng.choice(CATEGORIES), rng.randint(100, 500000), day, ""))
+    with get_connection() as conn:
+        conn.executemany("""
+            INSERT INTO transactions (user_id, type, category, amount_minor, day, description)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, data)
+
+
+def fetch_rows(user_id):
+    with get_connection() as conn:
+        return conn.execute("""
+            SELECT day, amount_minor, type, COALESCE(category, '')
+            FROM transactions WHERE user_id=? ORDER BY day, id
+        """, (user_id,)).fetchall()
+
+
+def loop_analytics(rows, window=analytics.ROLLING_WINDOW):
+    """The same series as analytics.analyze, one row at a time"""
+    income_by_day = defaultdict(int)
+    expense_by_day = defaultdict(int)
+    month_category = defaultdict(lambda: defaultdict(int))
+    expenses = []
+    for day, amount, t_type, category in rows:
+        when = day_to_date(day)
+        if t_type == "income":
+            income_by_day[when] += amount
+        else:
+            expense_by_day[when] += amount
+            month_category[when.strftime("%Y-%m")][category] += amount
+            expenses.append(amount)
+
+    first, last = day_to_date(rows[0][0]), day_to_date(rows[-1][0])
+    dates, balance, rolling, window_values = [], [], [], []
+    running = 0
+    current = first
+    while current <= last:
+        running += income_by_day[current] - expense_by_day[current]
+        window_values.append(expense_by_day[current])
+        if len(window_values) > window:
+            window_values.pop(0)
+        dates.append(current.isoformat())
+        balance.append(running / 100)
+        rolling.append(sum(window_values) / len(window_values) / 100)
+        current += timedelta(days=1)
+
+    shares = {}
+    for month, totals in month_category.items():
+        month_total = sum(totals.values())
+        shares[month] = {c: v / month_total for c, v in totals.items()}
+
+    expenses.sort()
+    percentiles = {}
+    for p in analytics.PERCENTILES:
+        # Linear interpolation, as numpy.percentile does by default
+        position = (len(expenses) - 1) * p / 100
+        low = int(position)
+        high = min(low + 1, len(expenses) - 1)
+        percentiles[p] = (expenses[low] + (expenses[high] - expenses[low]) * (position - low)) / 100
+    return {'dates': dates, 'balance': balance, 'rolling_expense': rolling,
+            'shares': shares, 'percentiles': percentiles}
+
+
+def best_of(func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark vectorized analytics")
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    work = tempfile.mkdtemp(prefix="finance-bench-")
+    try:
+        database.configure(os.path.join(work, "bench.db"))
+        database.init_db()
+        seed(args.rows)
+
+        # Loading is shared work; the comparison is the computation itself
+        load_seconds, frame = best_of(lambda: analytics.load_frame(1), args.repeat)
+        fetch_seconds, rows = best_of(lambda: fetch_rows(1), args.repeat)
+        vector_seconds, vector = best_of(lambda: analytics.analyze(frame), args.repeat)
+        loop_seconds, loop = best_of(lambda: loop_analytics(rows), args.repeat)
+
+        assert vector['dates'] == loop['dates']
+        assert all(abs(a - b) < 1e-6 for a, b in zip(vector['balance'], loop['balance']))
+        assert all(abs(a - b) < 1e-6 for a, b in zip(vector['rolling_expense'], loop['rolling_expense']))
+        for p, value in loop['percentiles'].items():
+            assert abs(vector['percentiles'][p] - value) < 1e-6
+        for i, month in enumerate(vector['months']):
+            for j, category in enumerate(vector['categories']):
+                expected = loop['shares'].get(month, {}).get(category, 0.0)
+                assert abs(vector['category_share'][i][j] - expected) < 1e-9
+
+        print(f"{args.rows:,} transactions, {len(vector['dates']):,} days")
+        print(f"query into arrays     {load_seconds:8.3f}s")
+        print(f"query into tuples     {fetch_seconds:8.3f}s")
+        print(f"vectorized series     {vector_seconds:8.3f}s")
+        print(f"per-row loop series   {loop_seconds:8.3f}s")
+        print(f"speedup               {loop_seconds / vector_seconds:8.1f}x")
+    finally:
+        database.close_pool()
+        shutil.rmtree(work)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
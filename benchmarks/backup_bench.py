@@ -0,0 +1,118 @@
+"""
+Compare full-file copies with online and incremental backups.
+
+Builds a database of --rows transactions, then times shutil.copy, the
+backup API (backup.backup_db), an incremental chain base, a delta after
+--changes edits, and a chain restore. Use --rows 20000000 or more for a
+multi-GB database.
+
+Usage:
+    python benchmarks/backup_bench.py [--rows 1000000] [--changes 1000] [--dir /tmp/bench]
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import backup
+import backup_chain
+import database
+from database import get_connection
+
+CATEGORIES = ["Food", "Rent", "Travel", "Shopping", "Bills", "Health", "Salary"]
+
+
+def seed(rows, batch=50000):
+    """Fill the configured database with random transactions for one user"""
+    rng = random.Random(42)
+    with get_connection() as conn:
+        conn.execute("INSERT INTO users (id, username, password) VALUES (1, 'bench', 'x')")
+    for start in range(0, rows, batch):
+        count = min(batch, rows - start)
+        data = []
+        for _ in range(count):
+            year = rng.randint(2015, 2024)
+            day = year * 10000 + rng.randint(1, 12) * 100 + rng.randint(1, 28)
+            category = rng.choice(CATEGORIES)
+            t_type = "income" if category == "Salary" else "expense"
+            data.append((1, t_type, category, rng.randint(100, 500000), day,
+                         f"Purchase {rng.randint(1, 10**6)}"))
+        with get_connection() as conn:
+            conn.executemany("""
+                INSERT INTO transactions (user_id, type, category, amount_minor, day, description)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, data)
+
+
+def change_rows(changes):
+    """Update, insert and delete a mix of rows"""
+    rng = random.Random(7)
+    with get_connection() as conn:
+        max_id = conn.execute("SELECT MAX(id) FROM transactions").fetchone()[0]
+        for i in range(changes):
+            t_id = rng.randint(1, max_id)
+            if i % 3 == 0:
+                conn.execute("UPDATE transactions SET amount_minor = amount_minor + 1 WHERE id=?", (t_id,))
+            elif i % 3 == 1:
+                conn.execute("""
+                    INSERT INTO transactions (user_id, type, category, amount_minor, day, description)
+                    VALUES (1, 'expense', 'Food', 1234, 20240101, 'Bench')
+                """)
+            else:
+                conn.execute("DELETE FROM transactions WHERE id=?", (t_id,))
+
+
+def timed(label, func, results):
+    start = time.perf_counter()
+    value = func()
+    seconds = time.perf_counter() - start
+    results.append((label, seconds, value))
+    return value
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark backup strategies")
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--changes", type=int, default=1000)
+    parser.add_argument("--dir", help="working directory (default: a temporary directory)")
+    parser.add_argument("--compression", choices=sorted(backup_chain.EXTENSIONS), default="gzip")
+    args = parser.parse_args()
+
+    work = args.dir or tempfile.mkdtemp(prefix="finance-bench-")
+    os.makedirs(work, exist_ok=True)
+    db_path = os.path.join(work, "bench.db")
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    database.configure(db_path)
+    backup.BACKUP_DIR = os.path.join(work, "backups")
+    database.init_db()
+
+    print(f"Seeding {args.rows:,} transactions into {db_path} ...")
+    seed(args.rows)
+    db_size = os.path.getsize(db_path)
+
+    results = []
+    copy_path = os.path.join(work, "copy.db")
+    timed("shutil.copy", lambda: shutil.copy(db_path, copy_path) and os.path.getsize(copy_path), results)
+    timed("backup API", lambda: os.path.getsize(backup.backup_db(pause=0)), results)
+    timed("chain base", lambda: backup_chain.take_base(args.compression)['size'], results)
+    change_rows(args.changes)
+    timed(f"chain delta ({args.changes} changes)", lambda: backup_chain.take_delta()['size'], results)
+    timed("chain rebuild", lambda: os.path.getsize(backup_chain.build_restore()), results)
+
+    print(f"\nDatabase size: {db_size:,} bytes")
+    print(f"{'method':<28} {'seconds':>10} {'bytes':>16}")
+    for label, seconds, size in results:
+        print(f"{label:<28} {seconds:>10.3f} {size:>16,}")
+    if not args.dir:
+        shutil.rmtree(work)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,69 @@
+"""
+Time the report precompute batch with different numbers of workers.
+
+Fills users, monthly_rollups and budgets directly for --users users
+(--categories categories x 12 months each), then runs
+batch.precompute_reports once per worker count.
+
+Usage:
+    python benchmarks/batch_bench.py [--users 10000] [--categories 8] [--workers 0 1 2 4]
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import database
+import batch
+from database import get_connection
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark report precomputation")
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--categories", type=int, default=8)
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, 1, 2, 4])
+    args = parser.parse_args()
+
+    work = tempfile.mkdtemp(prefix="finance-bench-")
+    try:
+        database.configure(os.path.join(work, "bench.db"))
+        database.init_db()
+
+        rng = random.Random(42)
+        users, rollups, budgets = [], [], []
+        for user in range(1, args.users + 1):
+            users.append((user, f"user{user}@example.com", "x"))
+            for c in range(args.categories):
+                for month in range(202401, 202413):
+                    rollups.append((user, month, "expense", f"Category {c}",
+                                    rng.randint(1000, 50000) * 100, 1))
+                budgets.append((user, f"Category {c}", rng.randint(1000, 50000) * 100, "2024-06"))
+            rollups.append((user, 202406, "income", "Salary", 10000000, 1))
+        with get_connection() as conn:
+            conn.executemany("INSERT INTO users (id, username, password) VALUES (?, ?, ?)", users)
+            conn.executemany("""
+                INSERT INTO monthly_rollups (user_id, month, type, category, total, count)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, rollups)
+            conn.executemany("""
+                INSERT INTO budgets (user_id, category, limit_minor, month) VALUES (?, ?, ?, ?)
+            """, budgets)
+
+        print(f"{'workers':>8} {'seconds':>9} {'users/s':>9}")
+        for workers in args.workers:
+            result = batch.precompute_reports("2024-06", workers=workers, quiet=True)
+            print(f"{workers:>8} {result['seconds']:>9.2f} {result['users_per_second']:>9,.0f}")
+        print(f"({os.cpu_count()} CPUs; 0 workers computes in the parent process)")
+    finally:
+        database.close_pool()
+        shutil.rmtree(work)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,145 @@
+"""
+Read/write concurrency of the /dashboard and /add paths per storage profile.
+
+For each profile a fresh database is seeded, then reader threads load
+/dashboard while writer threads POST /add for a fixed time. Reported are
+requests per second, latency percentiles and errors (such as "database
+is locked") for each path.
+
+--write-mode group sends /add through the group-commit writer.
+
+Usage:
+    python benchmarks/concurrency_bench.py [--profiles journal durable fast] [--readers 8] [--writers 2]
+                                           [--seconds 5] [--write-mode direct|group|async]
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import database
+import writer
+from database import get_connection
+from main import create_app
+
+EMAIL = "bench@example.com"
+PASSWORD = "benchpass"
+
+
+def seed_history(user_id, rows):
+    """Give the user some history so the dashboard does real work"""
+    rng = random.Random(42)
+    data = []
+    for _ in range(rows):
+        day = rng.randint(2020, 2024) * 10000 + rng.randint(1, 12) * 100 + rng.randint(1, 28)
+        data.append((user_id, "expense", rng.choice(["Food", "Rent", "Travel"]),
+                     rng.randint(100, 100000), day, "Seed"))
+    with get_connection() as conn:
+        conn.executemany("""
+            INSERT INTO transactions (user_id, type, category, amount_minor, day, description)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, data)
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def run_profile(profile, args, work):
+    db_path = os.path.join(work, f"{profile}.db")
+    database.configure(db_path, pool_size=args.readers + args.writers, profile=profile)
+    app = create_app(debug=True)
+
+    client = app.test_client()
+    client.post("/register", data={"email": EMAIL, "password": PASSWORD,
+                                   "confirm_password": PASSWORD})
+    with get_connection() as conn:
+        user_id = conn.execute("SELECT id FROM users WHERE email=?", (EMAIL,)).fetchone()[0]
+    seed_history(user_id, args.rows)
+
+    results = {"dashboard": [], "add": []}
+    errors = {"dashboard": 0, "add": 0}
+    lock = threading.Lock()
+    stop = time.perf_counter() + args.seconds
+
+    def worker(path):
+        client = app.test_client()
+        client.post("/", data={"email": EMAIL, "password": PASSWORD})
+        latencies = []
+        failed = 0
+        while time.perf_counter() < stop:
+            start = time.perf_counter()
+            try:
+                if path == "add":
+                    response = client.post("/add", data={"type": "expense", "category": "Food",
+                                                         "amount": "12.50", "description": "Bench"})
+                    ok = response.status_code == 302
+                else:
+                    response = client.get("/dashboard")
+                    ok = response.status_code == 200
+            except Exception:
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - start)
+            else:
+                failed += 1
+        with lock:
+            results[path].extend(latencies)
+            errors[path] += failed
+
+    threads = ([threading.Thread(target=worker, args=("dashboard",)) for _ in range(args.readers)]
+               + [threading.Thread(target=worker, args=("add",)) for _ in range(args.writers)])
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    writer.stop_writer()
+    database.close_pool()
+
+    rows = []
+    for path in ("dashboard", "add"):
+        latencies = results[path]
+        rows.append((profile, path, len(latencies) / args.seconds,
+                     percentile(latencies, 50) * 1000, percentile(latencies, 95) * 1000,
+                     percentile(latencies, 99) * 1000, errors[path]))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark storage profiles under concurrent load")
+    parser.add_argument("--profiles", nargs="+", default=["journal", "durable", "fast"],
+                        choices=sorted(database.STORAGE_PROFILES))
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--rows", type=int, default=20000, help="seeded history per profile")
+    parser.add_argument("--write-mode", choices=writer.WRITE_MODES, default="direct")
+    args = parser.parse_args()
+    writer.WRITE_MODE = args.write_mode
+
+    work = tempfile.mkdtemp(prefix="finance-bench-")
+    rows = []
+    try:
+        for profile in args.profiles:
+            rows.extend(run_profile(profile, args, work))
+    finally:
+        database.close_pool()
+        shutil.rmtree(work)
+
+    print(f"\n{'profile':<9} {'path':<10} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for profile, path, rate, p50, p95, p99, failed in rows:
+        print(f"{profile:<9} {path:<10} {rate:>8.1f} {p50:>8.1f} {p95:>8.1f} {p99:>8.1f} {failed:>7}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,66 @@
+"""
+Time the nightly forecast batch over many users.
+
+Fills monthly_rollups and budgets directly with --users users x
+--categories categories x 13 months of spending, then runs
+forecast.run_nightly for all of them.
+
+Usage:
+    python benchmarks/forecast_bench.py [--users 10000] [--categories 8]
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+from datetime import date
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import database
+import forecast
+from database import get_connection
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the nightly forecast")
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--categories", type=int, default=8)
+    args = parser.parse_args()
+
+    work = tempfile.mkdtemp(prefix="finance-bench-")
+    try:
+        database.configure(os.path.join(work, "bench.db"))
+        database.init_db()
+
+        rng = random.Random(42)
+        as_of = date(2024, 6, 15)
+        months = [202305 + i for i in range(8)] + [202401 + i for i in range(6)]
+        rollups, budgets = [], []
+        for user in range(1, args.users + 1):
+            for c in range(args.categories):
+                base = rng.randint(1000, 50000) * 100
+                for month in months:
+                    total = int(base * rng.uniform(0.5, 1.5) * (0.5 if month == 202406 else 1))
+                    rollups.append((user, month, "expense", f"Category {c}", total, 1))
+                budgets.append((user, f"Category {c}", int(base * rng.uniform(0.8, 1.2)), "2024-06"))
+        with get_connection() as conn:
+            conn.executemany("""
+                INSERT INTO monthly_rollups (user_id, month, type, category, total, count)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, rollups)
+            conn.executemany("""
+                INSERT INTO budgets (user_id, category, limit_minor, month) VALUES (?, ?, ?, ?)
+            """, budgets)
+
+        result = forecast.run_nightly("2024-06", as_of)
+        print(f"{result['categories'] / result['seconds']:,.0f} series/sec")
+    finally:
+        database.close_pool()
+        shutil.rmtree(work)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,357 @@
+"""
+Load test: simulated users browsing and editing, at rising concurrency.
+
+Each virtual user is a thread that logs in through / with its own
+cookies, loads its transaction ids, then repeatedly picks an action by
+the --mix weights:
+
+    dashboard  GET /dashboard
+    add        POST /add
+    edit       POST /edit/<id> (one of the user's transactions)
+    reports    GET /reports
+    budget     GET /budget
+
+waiting --think milliseconds on average (exponentially distributed)
+between actions. Every level of --users runs for --duration seconds, and
+for each level the test reports throughput, latency percentiles, a
+latency histogram and the error rate. A 503 means the database stayed
+locked or the connection pool ran dry, and is counted as "busy"
+separately from other errors.
+
+Without --url the app runs in this process (Flask test client) on a
+temporary database seeded by benchmarks/seed.py. With --url it talks
+HTTP to a running server, e.g. the dev server or a WSGI server started
+on a seeded database:
+
+    python benchmarks/seed.py bench.db --users 100
+    FINANCE_DB=bench.db python main.py
+    FINANCE_DB=bench.db FINANCE_SECRET_KEY=bench gunicorn -w $(nproc) -b 127.0.0.1:5000 wsgi:app
+    python benchmarks/loadtest.py --url http://127.0.0.1:5000 --users 1 4 16
+
+Virtual user N logs in as userN@example.com with the seed's password
+(--register creates the accounts first, for a server without seeded
+data). Each HTTP request opens a new connection.
+
+Usage:
+    python benchmarks/loadtest.py [--url URL] [--users 1 2 4 8] [--duration 10]
+                                  [--mix dashboard=50,add=15,edit=10,reports=15,budget=10]
+                                  [--think 0] [--json out.json]
+"""
+import argparse
+import contextlib
+import http.cookiejar
+import json
+import math
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import seed as seeder
+
+ACTIONS = ("dashboard", "add", "edit", "reports", "budget")
+DEFAULT_MIX = "dashboard=50,add=15,edit=10,reports=15,budget=10"
+
+# Upper bounds (milliseconds) of the latency histogram buckets
+HISTOGRAM_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+CATEGORIES = ["Food", "Transport", "Shopping", "Bills", "Health", "Entertainment"]
+
+
+class HttpClient:
+    """One user's cookies and requests against a running server"""
+
+    class _NoRedirect(urllib.request.HTTPRedirectHandler):
+        def redirect_request(self, *args, **kwargs):
+            return None
+
+    def __init__(self, base_url, timeout):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), self._NoRedirect)
+
+    def request(self, path, data=None):
+        """(status, body) of a GET, or a form POST when data is given"""
+        body = urllib.parse.urlencode(data).encode() if data is not None else None
+        try:
+            with self.opener.open(self.base_url + path, body, timeout=self.timeout) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            with e:
+                return e.code, e.read()
+
+
+class AppClient:
+    """One user's session against the app in this process"""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, path, data=None):
+        if data is None:
+            response = self.client.get(path)
+        else:
+            response = self.client.post(path, data=data)
+        return response.status_code, response.get_data()
+
+
+def parse_mix(text):
+    """'dashboard=50,add=15' -> {'dashboard': 50.0, 'add': 15.0}"""
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ACTIONS:
+            raise argparse.ArgumentTypeError(f"unknown action {name!r}; choose from {', '.join(ACTIONS)}")
+        try:
+            mix[name] = float(weight)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"weight of {name} must be a number")
+    if sum(mix.values()) <= 0:
+        raise argparse.ArgumentTypeError("the mix needs a positive weight")
+    return mix
+
+
+class Stats:
+    """Latencies and outcomes per action, shared by the virtual users"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {action: [] for action in ACTIONS}
+        self.errors = {action: 0 for action in ACTIONS}
+        self.busy = {action: 0 for action in ACTIONS}
+        self.login_failures = 0
+        self.samples = []
+
+    def record(self, action, seconds, outcome, detail=None):
+        with self.lock:
+            self.latencies[action].append(seconds)
+            if outcome == "busy":
+                self.busy[action] += 1
+            elif outcome == "error":
+                self.errors[action] += 1
+                self._sample(f"{action}: {detail}")
+
+    def login_failed(self, detail):
+        with self.lock:
+            self.login_failures += 1
+            self._sample(f"login: {detail}")
+
+    def _sample(self, text):
+        # A few examples are enough to see what went wrong
+        if len(self.samples) < 5:
+            self.samples.append(text)
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(0, math.ceil(p / 100 * len(sorted_values)) - 1)]
+
+
+def histogram(latencies):
+    """Request counts per HISTOGRAM_MS bucket, plus one for anything slower"""
+    counts = [0] * (len(HISTOGRAM_MS) + 1)
+    for seconds in latencies:
+        ms = seconds * 1000
+        counts[next((i for i, bound in enumerate(HISTOGRAM_MS) if ms <= bound), len(HISTOGRAM_MS))] += 1
+    return counts
+
+
+def summarize(latencies, errors, busy, seconds):
+    latencies = sorted(latencies)
+    count = len(latencies)
+    return {
+        "requests": count,
+        "requests_per_sec": round(count / seconds, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "max_ms": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+        "errors": errors,
+        "busy": busy,
+        "error_rate": round(errors / count, 4) if count else 0.0,
+        "busy_rate": round(busy / count, 4) if count else 0.0,
+        "histogram": histogram(latencies),
+    }
+
+
+def login(client, user, password):
+    status, _ = client.request("/", {"email": seeder.email(user), "password": password})
+    if status != 302:
+        raise RuntimeError(f"login failed for {seeder.email(user)} (status {status}); "
+                           "seed the server's database or pass --register")
+    status, body = client.request("/api/v1/transactions?page_size=200")
+    transactions = json.loads(body)["transactions"] if status == 200 else []
+    return [(t["id"], t["type"], t["category"]) for t in transactions]
+
+
+def act(client, action, rng, transactions):
+    """Run one action; returns (status, expected status)"""
+    if action == "add":
+        return client.request("/add", {
+            "type": "expense", "category": rng.choice(CATEGORIES),
+            "amount": f"{rng.randint(100, 50000) / 100:.2f}", "description": "Load test",
+        })[0], 302
+    if action == "edit" and transactions:
+        t_id, t_type, category = rng.choice(transactions)
+        return client.request(f"/edit/{t_id}", {
+            "type": t_type, "category": category,
+            "amount": f"{rng.randint(100, 50000) / 100:.2f}", "description": "Edited in load test",
+        })[0], 302
+    if action == "edit":
+        return client.request("/dashboard")[0], 200
+    return client.request(f"/{action}")[0], 200
+
+
+def virtual_user(make_client, user, args, stats, start_at, stop_at):
+    rng = random.Random(f"{args.seed}:{user}")
+    actions = list(args.mix)
+    weights = [args.mix[action] for action in actions]
+    client = make_client()
+    try:
+        transactions = login(client, user, args.password)
+    except Exception as e:
+        stats.login_failed(e)
+        return
+
+    time.sleep(max(0.0, start_at - time.perf_counter()))
+    while time.perf_counter() < stop_at:
+        action = rng.choices(actions, weights)[0]
+        start = time.perf_counter()
+        try:
+            status, expected = act(client, action, rng, transactions)
+            outcome = "ok" if status == expected else "busy" if status == 503 else "error"
+            detail = f"status {status}"
+        except Exception as e:
+            outcome, detail = "error", f"{type(e).__name__}: {e}"
+        stats.record(action, time.perf_counter() - start, outcome, detail)
+        if args.think:
+            time.sleep(rng.expovariate(1000 / args.think))
+
+
+def run_level(make_client, users, args):
+    """Run `users` virtual users for args.duration seconds"""
+    stats = Stats()
+    # Logins happen before the clock starts, with the first users logging in first
+    start_at = time.perf_counter() + 0.5 + users * 0.01
+    stop_at = start_at + args.duration
+    threads = [threading.Thread(target=virtual_user,
+                                args=(make_client, (i % args.accounts) + 1, args, stats, start_at, stop_at))
+               for i in range(users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    all_latencies = [s for action in ACTIONS for s in stats.latencies[action]]
+    level = summarize(all_latencies, sum(stats.errors.values()), sum(stats.busy.values()), args.duration)
+    level["users"] = users
+    level["login_failures"] = stats.login_failures
+    level["actions"] = {action: summarize(stats.latencies[action], stats.errors[action],
+                                          stats.busy[action], args.duration)
+                        for action in ACTIONS if stats.latencies[action]}
+    level["error_samples"] = stats.samples
+    return level
+
+
+def print_level(level, show_histogram):
+    print(f"{level['users']:>5} users {level['requests_per_sec']:>9,.1f} req/s "
+          f"{level['p50_ms']:>8.1f} {level['p95_ms']:>8.1f} {level['p99_ms']:>8.1f} ms "
+          f"errors {level['error_rate']:>6.1%} busy {level['busy_rate']:>6.1%}")
+    for action, result in level["actions"].items():
+        print(f"      {action:<10} {result['requests_per_sec']:>9,.1f} req/s "
+              f"{result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} {result['p99_ms']:>8.1f} ms "
+              f"errors {result['errors']:>5} busy {result['busy']:>5}")
+    for sample in level["error_samples"]:
+        print(f"      ❌ {sample}")
+    if show_histogram:
+        bounds = [f"<={ms}ms" for ms in HISTOGRAM_MS] + [f">{HISTOGRAM_MS[-1]}ms"]
+        widest = max(level["histogram"]) or 1
+        for bound, count in zip(bounds, level["histogram"]):
+            if count:
+                print(f"      {bound:>9} {count:>7} {'#' * max(1, round(40 * count / widest))}")
+
+
+def register(make_client, accounts, password):
+    client = make_client()
+    for user in range(1, accounts + 1):
+        client.request("/register", {"email": seeder.email(user), "password": password,
+                                     "confirm_password": password})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the app with simulated user sessions")
+    parser.add_argument("--url", help="server to test, e.g. http://127.0.0.1:5000 (default: in-process)")
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 2, 4, 8],
+                        help="concurrent users, one run per value")
+    parser.add_argument("--duration", type=float, default=10, help="seconds per run")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f"action weights (default {DEFAULT_MIX})")
+    parser.add_argument("--think", type=float, default=0, help="mean pause between actions, ms")
+    parser.add_argument("--accounts", type=int, help="distinct logins (default: the most users)")
+    parser.add_argument("--password", default=seeder.PASSWORD)
+    parser.add_argument("--register", action="store_true", help="create the accounts first")
+    parser.add_argument("--history", type=int, default=200,
+                        help="transactions per seeded user (in-process only)")
+    parser.add_argument("--timeout", type=float, default=30, help="HTTP timeout, seconds")
+    parser.add_argument("--seed", type=int, default=seeder.SEED)
+    parser.add_argument("--histogram", action="store_true", help="print latency histograms")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+    args.accounts = args.accounts or max(args.users)
+
+    work = None
+    try:
+        if args.url:
+            def make_client():
+                return HttpClient(args.url, args.timeout)
+        else:
+            import database
+            from main import create_app
+            work = tempfile.mkdtemp(prefix="finance-load-")
+            database.configure(os.path.join(work, "load.db"), pool_size=max(args.users) + 1)
+            with contextlib.redirect_stdout(sys.stderr):
+                seeder.seed(args.accounts, args.history, 12)
+                app = create_app(debug=True)
+
+            def make_client():
+                return AppClient(app)
+
+        if args.register:
+            register(make_client, args.accounts, args.password)
+
+        levels = []
+        print(f"{'':>11} {'throughput':>15} {'p50':>8} {'p95':>8} {'p99':>8}")
+        for users in args.users:
+            with contextlib.redirect_stdout(sys.stderr):
+                level = run_level(make_client, users, args)
+            print_level(level, args.histogram)
+            levels.append(level)
+    finally:
+        if work:
+            import database
+            database.close_pool()
+            shutil.rmtree(work)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"target": args.url or "in-process", "duration": args.duration,
+                       "mix": args.mix, "think_ms": args.think,
+                       "histogram_ms": list(HISTOGRAM_MS), "levels": levels}, f, indent=2)
+        print(f"✅ Results written to {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
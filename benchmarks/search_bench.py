@@ -0,0 +1,110 @@
+"""
+Compare full-text search with LIKE '%term%' on a large seeded database.
+
+Seeds --users users with --rows transactions each (descriptions drawn
+from a merchant list plus random reference numbers), then times each
+query for one user with search.search_transactions and with the LIKE
+scan it replaces, reporting median and p95 latency.
+
+Usage:
+    python benchmarks/search_bench.py [--users 10] [--rows 50000] [--repeat 20]
+"""
+import argparse
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import database
+import search
+from database import get_connection
+
+MERCHANTS = ["Starbucks coffee", "Uber ride", "Amazon order", "Swiggy dinner", "Zomato lunch",
+             "Big Bazaar groceries", "Indian Oil fuel", "Airtel recharge", "Netflix subscription",
+             "Apollo pharmacy", "Railway ticket", "Electricity bill", "Rent transfer",
+             "Salary credit", "Flipkart order", "Movie tickets", "Gym membership", "Bakery"]
+CATEGORIES = ["Food", "Transport", "Shopping", "Bills", "Health", "Entertainment", "Salary"]
+
+# (query, description of what it exercises)
+QUERIES = [
+    ("coffee", "common word"),
+    ("pharm", "prefix"),
+    ("amazon order", "two words"),
+    ("zzzz", "no match"),
+]
+
+
+def like_search(user_id, query, limit=search.DEFAULT_LIMIT):
+    """The naive alternative: every word as LIKE '%word%' over the user's rows"""
+    words = query.split()
+    conditions = " AND ".join("(description LIKE ? OR category LIKE ?)" for _ in words)
+    params = [p for word in words for p in (f"%{word}%", f"%{word}%")]
+    with get_connection() as conn:
+        return conn.execute(f"""
+            SELECT id, type, category, amount_minor, day, description
+            FROM transactions
+            WHERE user_id = ? AND {conditions}
+            ORDER BY day DESC, id DESC
+            LIMIT ?
+        """, [user_id] + params + [limit]).fetchall()
+
+
+def timed(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - start) * 1000)
+    times.sort()
+    return statistics.median(times), times[int(len(times) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark full-text search against LIKE")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--rows", type=int, default=50000, help="transactions per user")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    work = tempfile.mkdtemp(prefix="finance-bench-")
+    try:
+        database.configure(os.path.join(work, "bench.db"), profile="fast")
+        database.init_db()
+
+        rng = random.Random(42)
+        start = time.perf_counter()
+        with get_connection() as conn:
+            for user in range(1, args.users + 1):
+                days = sorted(20200101 + rng.randrange(4) * 10000 + rng.randrange(12) * 100
+                              + rng.randrange(28) for _ in range(args.rows))
+                conn.executemany("""
+                    INSERT INTO transactions (user_id, type, category, amount_minor, day, description)
+                    VALUES (?, 'expense', ?, ?, ?, ?)
+                """, [(user, rng.choice(CATEGORIES), rng.randint(100, 500000), day,
+                       f"{rng.choice(MERCHANTS)} ref {rng.randint(10000, 99999)}")
+                      for day in days])
+        total = args.users * args.rows
+        print(f"Seeded {total:,} transactions in {time.perf_counter() - start:.1f}s")
+        search.rebuild_index()
+
+        print(f"{'query':<14} {'kind':<12} {'matches':>8} {'fts p50':>9} {'p95':>7} "
+              f"{'like p50':>9} {'p95':>7}  (ms, user with {args.rows:,} rows)")
+        for query, kind in QUERIES:
+            matches = len(search.search_transactions(1, query, limit=search.MAX_LIMIT))
+            fts = timed(lambda: search.search_transactions(1, query), args.repeat)
+            like = timed(lambda: like_search(1, query), args.repeat)
+            print(f"{query:<14} {kind:<12} {matches:>8} {fts[0]:>9.2f} {fts[1]:>7.2f} "
+                  f"{like[0]:>9.2f} {like[1]:>7.2f}")
+    finally:
+        database.close_pool()
+        shutil.rmtree(work)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,210 @@
+"""
+Deterministic test data for benchmarks.
+
+Fills a database with --users users (user1@example.com, user2@... with
+password "password"), each with --transactions transactions spread over
+the --months months ending at --end, plus a budget for every expense
+category in every month. The same arguments always produce the same
+rows, and a user's rows do not depend on how many users are seeded, so
+runs can be compared across commits and scales.
+
+Rows are bulk-inserted with the triggers on transactions and budgets
+dropped; the tables those triggers maintain (monthly rollups, daily cash
+flow, search index) are then rebuilt in one pass and the triggers put
+back, all in one database transaction. Firing the triggers for every
+row would make large seeds many times slower.
+
+Usage:
+    python benchmarks/seed.py bench.db [--users 1000] [--transactions 500] [--months 24]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import database
+from auth import hash_password
+from database import get_connection
+from rollups import ROLLUP_QUERY, CASHFLOW_QUERY
+
+SEED = 42
+PASSWORD = "password"
+
+# Rows handed to executemany at a time
+CHUNK_SIZE = 20000
+
+EXPENSES = {
+    "Food": ["Swiggy dinner", "Zomato lunch", "Big Bazaar groceries", "Bakery", "Starbucks coffee"],
+    "Transport": ["Uber ride", "Indian Oil fuel", "Railway ticket", "Metro card"],
+    "Shopping": ["Amazon order", "Flipkart order", "Clothes"],
+    "Bills": ["Electricity bill", "Airtel recharge", "Water bill", "Rent transfer"],
+    "Health": ["Apollo pharmacy", "Doctor visit", "Gym membership"],
+    "Entertainment": ["Netflix subscription", "Movie tickets", "Concert"],
+}
+INCOME = {
+    "Salary": ["Salary credit"],
+    "Freelance": ["Freelance payment"],
+    "Interest": ["Savings interest"],
+}
+
+# Share of transactions that are income
+INCOME_SHARE = 0.1
+
+
+def email(user):
+    return f"user{user}@example.com"
+
+
+def month_range(end, months):
+    """The months (year, month) ending at end 'YYYY-MM', oldest first"""
+    year, month = map(int, end.split("-"))
+    index = year * 12 + month - 1
+    return [divmod(i, 12) for i in range(index - months + 1, index + 1)]
+
+
+def user_rows(rng, user, year, month, count):
+    """count generated transactions of one user in one month, in date order"""
+    rows = []
+    for day in sorted(rng.randint(1, 28) for _ in range(count)):
+        if rng.random() < INCOME_SHARE:
+            t_type, category = "income", rng.choice(list(INCOME))
+            amount = rng.randint(5000, 150000) * 100
+            merchant = rng.choice(INCOME[category])
+        else:
+            t_type, category = "expense", rng.choice(list(EXPENSES))
+            amount = rng.randint(1000, 500000)
+            merchant = rng.choice(EXPENSES[category])
+        rows.append((user, t_type, category, amount, (year * 100 + month + 1) * 100 + day,
+                     f"{merchant} ref {rng.randint(10000, 99999)}"))
+    return rows
+
+
+def _generated_transactions(users, transactions, months, seed):
+    """Every user's rows, month by month, so users' histories interleave as in real use"""
+    rngs = {user: random.Random(f"{seed}:{user}") for user in range(1, users + 1)}
+    for index, (year, month) in enumerate(months):
+        for user, rng in rngs.items():
+            # Spread the user's transactions evenly, the remainder going to the first months
+            count = transactions // len(months) + (index < transactions % len(months))
+            yield from user_rows(rng, user, year, month, count)
+
+
+def _generated_budgets(users, months, seed):
+    for user in range(1, users + 1):
+        rng = random.Random(f"{seed}:{user}:budgets")
+        for year, month in months:
+            for category in EXPENSES:
+                yield (user, category, rng.randint(50, 2000) * 1000, f"{year}-{month + 1:02d}")
+
+
+def _insert_chunks(cursor, sql, rows):
+    chunk = []
+    count = 0
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == CHUNK_SIZE:
+            cursor.executemany(sql, chunk)
+            count += len(chunk)
+            chunk = []
+    if chunk:
+        cursor.executemany(sql, chunk)
+        count += len(chunk)
+    return count
+
+
+def seed(users=1000, transactions=500, months=24, end=None, seed=SEED):
+    """Fill the configured (empty) database with generated users, transactions and budgets
+
+    Returns a dict with the row counts, the last month and the seconds taken.
+    """
+    end = end or date.today().strftime("%Y-%m")
+    month_list = month_range(end, months)
+    start = time.perf_counter()
+
+    with get_connection() as conn:
+        # The web app's users table, keyed by email
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS users (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                email TEXT UNIQUE,
+                password TEXT
+            )
+        """)
+    database.init_db()
+
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        if cursor.execute("SELECT EXISTS (SELECT 1 FROM transactions)").fetchone()[0]:
+            raise ValueError("database already has transactions")
+
+        cursor.execute("""
+            SELECT name, sql FROM sqlite_master
+            WHERE type = 'trigger' AND tbl_name IN ('transactions', 'budgets')
+        """)
+        triggers = cursor.fetchall()
+        for name, _ in triggers:
+            cursor.execute(f"DROP TRIGGER {name}")
+
+        password = hash_password(PASSWORD)
+        cursor.executemany("INSERT INTO users (id, email, password) VALUES (?, ?, ?)",
+                           ((user, email(user), password) for user in range(1, users + 1)))
+        transaction_count = _insert_chunks(cursor, """
+            INSERT INTO transactions (user_id, type, category, amount_minor, day, description)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, _generated_transactions(users, transactions, month_list, seed))
+        budget_count = _insert_chunks(cursor, """
+            INSERT INTO budgets (user_id, category, limit_minor, month) VALUES (?, ?, ?, ?)
+        """, _generated_budgets(users, month_list, seed))
+
+        # What the triggers would have kept up to date
+        cursor.execute(f"""
+            INSERT INTO monthly_rollups (user_id, month, type, category, total, count)
+            {ROLLUP_QUERY}
+        """)
+        cursor.execute(f"""
+            INSERT INTO daily_cashflow (user_id, day, income, expense, count, balance)
+            {CASHFLOW_QUERY}
+        """)
+        cursor.execute("INSERT INTO transactions_fts (transactions_fts) VALUES ('rebuild')")
+
+        for _, sql in triggers:
+            cursor.execute(sql)
+
+    return {
+        "users": users,
+        "transactions": transaction_count,
+        "budgets": budget_count,
+        "end": end,
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fill a new database with generated benchmark data")
+    parser.add_argument("db", help="database file to create")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--transactions", type=int, default=500, help="transactions per user")
+    parser.add_argument("--months", type=int, default=24, help="months of history per user")
+    parser.add_argument("--end", help="last month of history, YYYY-MM (default: this month)")
+    parser.add_argument("--seed", type=int, default=SEED)
+    args = parser.parse_args()
+
+    if os.path.exists(args.db):
+        print(f"❌ {args.db} already exists")
+        return 1
+    database.configure(args.db, profile="fast")
+    try:
+        result = seed(args.users, args.transactions, args.months, args.end, args.seed)
+    finally:
+        database.close_pool()
+    print(f"✅ Seeded {result['users']:,} users, {result['transactions']:,} transactions and "
+          f"{result['budgets']:,} budgets up to {result['end']} in {result['seconds']:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,248 @@
+"""
+Benchmark suite for the data modules and the web routes.
+
+Seeds a throwaway database with benchmarks/seed.py (or reuses --db),
+then calls every benchmarked function and route (through the Flask test
+client) --repeat times, each call for a different user so per-user
+caches stay cold, and reports p50/p95/p99 latency, calls/sec and, for
+functions, rows returned per second.
+
+--json writes the results with the commit, scale and SQLite version so
+runs can be kept, and --compare prints the change in p50 against such a
+file from an earlier commit.
+
+Usage:
+    python benchmarks/suite.py [--users 1000] [--transactions 500] [--repeat 200]
+                               [--db bench.db] [--only report] [--json out.json]
+                               [--compare before.json]
+"""
+import argparse
+import contextlib
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import database
+import seed as seeder
+from database import get_connection
+from transactions import get_user_summary, get_all_user_transactions, get_transactions_page
+from reports import get_monthly_report_data, get_yearly_report_data
+from budget import get_budget_status
+from cashflow import get_month_cashflow
+from search import search_transactions
+from analytics import get_analytics
+from main import create_app
+
+PERCENTILES = (50, 95, 99)
+
+
+def function_benchmarks(month, year):
+    """(name, call(user_id), rows in the result) for the data-access functions"""
+    return [
+        ("get_user_summary", get_user_summary, lambda r: 1),
+        ("get_monthly_report_data", lambda u: get_monthly_report_data(u, month), lambda r: 1),
+        ("get_yearly_report_data", lambda u: get_yearly_report_data(u, year), lambda r: 1),
+        ("get_budget_status", lambda u: get_budget_status(u, month), len),
+        ("get_all_user_transactions", get_all_user_transactions, len),
+        ("get_transactions_page", lambda u: get_transactions_page(u, 50)[0], len),
+        ("get_month_cashflow", lambda u: get_month_cashflow(u, month), lambda r: len(r["days"])),
+        ("search_transactions", lambda u: search_transactions(u, "coffee"), len),
+        ("get_analytics", get_analytics, lambda r: len(r["dates"])),
+    ]
+
+
+def route_benchmarks(month, year):
+    """Paths requested through the test client"""
+    return [
+        "/dashboard",
+        "/transactions",
+        "/search?q=coffee",
+        f"/reports?month={month}&year={year}",
+        "/reports/analytics.json",
+        f"/budget?month={month}",
+        "/api/v1/transactions",
+        f"/api/v1/reports/monthly?month={month}",
+        f"/api/v1/budgets?month={month}",
+    ]
+
+
+def percentile(sorted_times, p):
+    """Nearest-rank percentile of an ascending list"""
+    return sorted_times[max(0, math.ceil(p / 100 * len(sorted_times)) - 1)]
+
+
+def summarize(name, kind, times, rows=None):
+    times = sorted(times)
+    total = sum(times)
+    result = {"name": name, "kind": kind, "calls": len(times)}
+    for p in PERCENTILES:
+        result[f"p{p}_ms"] = round(percentile(times, p) * 1000, 3)
+    result["mean_ms"] = round(total / len(times) * 1000, 3)
+    result["calls_per_sec"] = round(len(times) / total, 1)
+    result["rows_per_sec"] = round(rows / total, 1) if rows is not None else None
+    return result
+
+
+def run_function(name, call, count_rows, users):
+    call(users[0])  # warm up
+    times = []
+    rows = 0
+    for user in users:
+        start = time.perf_counter()
+        result = call(user)
+        times.append(time.perf_counter() - start)
+        rows += count_rows(result)
+    return summarize(name, "function", times, rows)
+
+
+def run_route(client, path, users):
+    def get(user):
+        with client.session_transaction() as session:
+            session["user_id"] = user
+        start = time.perf_counter()
+        response = client.get(path)
+        elapsed = time.perf_counter() - start
+        if response.status_code != 200:
+            raise RuntimeError(f"{path} answered {response.status_code} for user {user}")
+        return elapsed
+
+    get(users[0])  # warm up (templates, first queries)
+    return summarize(path, "route", [get(user) for user in users])
+
+
+def git_commit():
+    """Current commit, with '-dirty' when the tree has changes, or None outside git"""
+    root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=root,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=root,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + ("-dirty" if dirty else "")
+
+
+def dataset():
+    """(users, transactions, last month) of the configured database"""
+    with get_connection() as conn:
+        users = conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+        count, last_day = conn.execute("SELECT COUNT(*), MAX(day) FROM transactions").fetchone()
+    if not count:
+        raise SystemExit("❌ The database has no transactions; seed it with benchmarks/seed.py")
+    return users, count, f"{last_day // 10000}-{last_day // 100 % 100:02d}"
+
+
+def print_results(results, previous=None):
+    before = {r["name"]: r for r in (previous or {}).get("results", [])}
+    print(f"{'benchmark':<42} {'p50':>8} {'p95':>8} {'p99':>8} {'calls/s':>9} {'rows/s':>11}"
+          + ("  p50 change" if previous else ""))
+    for r in results:
+        rows = f"{r['rows_per_sec']:>11,.0f}" if r["rows_per_sec"] is not None else f"{'':>11}"
+        line = (f"{r['name']:<42} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} {r['p99_ms']:>8.2f} "
+                f"{r['calls_per_sec']:>9,.1f} {rows}")
+        old = before.get(r["name"])
+        if old:
+            line += f"  {(r['p50_ms'] / old['p50_ms'] - 1) * 100:+10.1f}%"
+        print(line)
+    print("(latencies in ms)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark data functions and routes on seeded data")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--transactions", type=int, default=500, help="transactions per user")
+    parser.add_argument("--months", type=int, default=24)
+    parser.add_argument("--end", default="2024-12", help="last month of seeded history")
+    parser.add_argument("--seed", type=int, default=seeder.SEED)
+    parser.add_argument("--repeat", type=int, default=200, help="calls per benchmark")
+    parser.add_argument("--db", help="seeded database to reuse (seeded here if it does not exist)")
+    parser.add_argument("--only", help="run only benchmarks whose name contains this text")
+    parser.add_argument("--json", help="write results to this file ('-' for stdout)")
+    parser.add_argument("--compare", help="results file from an earlier run to compare with")
+    args = parser.parse_args()
+
+    work = None
+    if args.db:
+        db_path = args.db
+    else:
+        work = tempfile.mkdtemp(prefix="finance-bench-")
+        db_path = os.path.join(work, "bench.db")
+
+    # Progress and migration messages go to stderr, keeping stdout for the results
+    with contextlib.redirect_stdout(sys.stderr):
+        try:
+            seeded = not os.path.exists(db_path)
+            database.configure(db_path, profile="fast")
+            if seeded:
+                result = seeder.seed(args.users, args.transactions, args.months, args.end, args.seed)
+                print(f"Seeded {result['transactions']:,} transactions for {result['users']:,} users "
+                      f"in {result['seconds']:.1f}s")
+            database.init_db()
+            # Reports cached by an earlier run on the same database would hide the work
+            with get_connection() as conn:
+                conn.execute("DELETE FROM report_cache")
+            users, transactions, month = dataset()
+            year = month[:4]
+
+            client = create_app(debug=True).test_client()
+
+            # A different user for each call (cycling if there are fewer users)
+            rng = random.Random(args.seed)
+            sample = rng.sample(range(1, users + 1), min(args.repeat, users))
+            sample = [sample[i % len(sample)] for i in range(args.repeat)]
+
+            results = []
+            for name, call, count_rows in function_benchmarks(month, year):
+                if not args.only or args.only in name:
+                    results.append(run_function(name, call, count_rows, sample))
+            for path in route_benchmarks(month, year):
+                if not args.only or args.only in path:
+                    results.append(run_route(client, path, sample))
+        finally:
+            database.close_pool()
+            if work:
+                shutil.rmtree(work)
+
+    report = {
+        "commit": git_commit(),
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "users": users,
+        "transactions": transactions,
+        "month": month,
+        "repeat": args.repeat,
+        "seed": args.seed,
+        "results": results,
+    }
+
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+    if args.json == "-":
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        print_results(results, previous)
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(report, f, indent=2)
+            print(f"✅ Results written to {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
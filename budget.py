@@ -1,122 +1,123 @@
-import sqlite3
 from datetime import date
+from database import get_connection
+from cache import invalidate_budget
+from utils import month_key, to_minor, from_minor
+
+def upsert_budget(cursor, user_id, category, limit, month):
+    """Set or update a budget using an open cursor"""
+    # Insert new budget or update the existing one in a single statement
+    cursor.execute("""
+        INSERT INTO budgets (user_id, category, limit_minor, month)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT (user_id, category, month)
+        DO UPDATE SET limit_minor=excluded.limit_minor
+    """, (user_id, category, to_minor(limit), month))
 
 def set_budget(user_id, category, limit, month):
     """Set or update budget for a category in a month"""
-    conn = sqlite3.connect("finance.db")
-    cursor = conn.cursor()
-    
-    # Check if budget already exists
-    cursor.execute("""
-        SELECT id FROM budgets
-        WHERE user_id=? AND category=? AND month=?
-    """, (user_id, category, month))
-    
-    existing = cursor.fetchone()
-    
-    if existing:
-        # Update existing budget
-        cursor.execute("""
-            UPDATE budgets
-            SET monthly_limit=?
-            WHERE user_id=? AND category=? AND month=?
-        """, (limit, user_id, category, month))
-    else:
-        # Insert new budget
-        cursor.execute("""
-            INSERT INTO budgets (user_id, category, monthly_limit, month)
-            VALUES (?, ?, ?, ?)
-        """, (user_id, category, limit, month))
-    
-    conn.commit()
-    conn.close()
+    with get_connection() as conn:
+        upsert_budget(conn.cursor(), user_id, category, limit, month)
+        conn.commit()
+    invalidate_budget(user_id, month)
     return True
 
 def check_budget(user_id, category, month):
     """Check if budget is exceeded (console output)"""
-    conn = sqlite3.connect("finance.db")
-    cursor = conn.cursor()
-
-    cursor.execute("""
-        SELECT monthly_limit FROM budgets
-        WHERE user_id=? AND category=? AND month=?
-    """, (user_id, category, month))
-    budget = cursor.fetchone()
+    with get_connection() as conn:
+        cursor = conn.cursor()
 
-    cursor.execute("""
-        SELECT SUM(amount) FROM transactions
-        WHERE user_id=? AND category=? AND type='expense' AND date LIKE ?
-    """, (user_id, category, f"{month}%"))
-
-    spent = cursor.fetchone()[0] or 0
-    conn.close()
+        cursor.execute("""
+            SELECT b.limit_minor, COALESCE(r.total, 0)
+            FROM budgets b
+            LEFT JOIN monthly_rollups r
+                ON r.user_id = b.user_id AND r.month = ?
+                AND r.type = 'expense' AND r.category = b.category
+            WHERE b.user_id=? AND b.category=? AND b.month=?
+        """, (month_key(month), user_id, category, month))
+        budget = cursor.fetchone()
 
-    if budget and spent > budget[0]:
+    if budget and budget[1] > budget[0]:
         print(f"⚠️ Budget exceeded for {category}")
 
 def get_user_budgets(user_id, month=None):
     """Get all budgets for a user, optionally filtered by month"""
-    conn = sqlite3.connect("finance.db")
-    cursor = conn.cursor()
-    
-    if month:
-        cursor.execute("""
-            SELECT id, category, monthly_limit, month
-            FROM budgets
-            WHERE user_id=? AND month=?
-            ORDER BY category
-        """, (user_id, month))
-    else:
-        cursor.execute("""
-            SELECT id, category, monthly_limit, month
-            FROM budgets
-            WHERE user_id=?
-            ORDER BY month DESC, category
-        """, (user_id,))
-    
-    budgets = cursor.fetchall()
-    conn.close()
+    with get_connection() as conn:
+        cursor = conn.cursor()
+
+        if month:
+            cursor.execute("""
+                SELECT id, category, limit_minor, month
+                FROM budgets
+                WHERE user_id=? AND month=?
+                ORDER BY category
+            """, (user_id, month))
+        else:
+            cursor.execute("""
+                SELECT id, category, limit_minor, month
+                FROM budgets
+                WHERE user_id=?
+                ORDER BY month DESC, category
+            """, (user_id,))
+
+        budgets = [(b_id, category, from_minor(limit), b_month)
+                   for b_id, category, limit, b_month in cursor.fetchall()]
     return budgets
 
+def _status_entry(category, limit, spent):
+    """Build one budget status dict from paise amounts"""
+    return {
+        'category': category,
+        'limit': from_minor(limit),
+        'spent': from_minor(spent),
+        'remaining': from_minor(limit - spent),
+        'percentage': (spent / limit * 100) if limit > 0 else 0,
+        'exceeded': spent > limit
+    }
+
 def get_budget_status(user_id, month=None):
     """Get budget status with spent amounts and warnings"""
     if month is None:
         month = date.today().strftime("%Y-%m")
-    
-    conn = sqlite3.connect("finance.db")
-    cursor = conn.cursor()
-    
-    # Get all budgets for the month
-    cursor.execute("""
-        SELECT category, monthly_limit
-        FROM budgets
-        WHERE user_id=? AND month=?
-    """, (user_id, month))
-    
-    budgets = cursor.fetchall()
-    
-    budget_status = []
-    for category, limit in budgets:
-        # Get spent amount
+
+    with get_connection() as conn:
+        cursor = conn.cursor()
+
+        # Budgets joined to the month's expense rollups in one query
         cursor.execute("""
-            SELECT COALESCE(SUM(amount), 0)
-            FROM transactions
-            WHERE user_id=? AND category=? AND type='expense' AND date LIKE ?
-        """, (user_id, category, f"{month}%"))
-        
-        spent = cursor.fetchone()[0] or 0
-        remaining = limit - spent
-        percentage = (spent / limit * 100) if limit > 0 else 0
-        exceeded = spent > limit
-        
-        budget_status.append({
-            'category': category,
-            'limit': limit,
-            'spent': spent,
-            'remaining': remaining,
-            'percentage': percentage,
-            'exceeded': exceeded
-        })
-    
-    conn.close()
-    return budget_status
+            SELECT b.category, b.limit_minor, COALESCE(r.total, 0)
+            FROM budgets b
+            LEFT JOIN monthly_rollups r
+                ON r.user_id = b.user_id AND r.month = ?
+                AND r.type = 'expense' AND r.category = b.category
+            WHERE b.user_id=? AND b.month=?
+            ORDER BY b.category
+        """, (month_key(month), user_id, month))
+
+        rows = cursor.fetchall()
+
+    return [_status_entry(category, limit, spent) for category, limit, spent in rows]
+
+def get_yearly_budget_status(user_id, year):
+    """Get budget status for every month of a year, keyed by 'YYYY-MM'"""
+    year = int(year)
+
+    with get_connection() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute("""
+            SELECT b.month, b.category, b.limit_minor, COALESCE(r.total, 0)
+            FROM budgets b
+            LEFT JOIN monthly_rollups r
+                ON r.user_id = b.user_id
+                AND r.month = CAST(REPLACE(b.month, '-', '') AS INTEGER)
+                AND r.type = 'expense' AND r.category = b.category
+            WHERE b.user_id=? AND b.month >= ? AND b.month < ?
+            ORDER BY b.month, b.category
+        """, (user_id, f"{year:04d}-", f"{year + 1:04d}-"))
+
+        rows = cursor.fetchall()
+
+    status_by_month = {}
+    for month, category, limit, spent in rows:
+        status_by_month.setdefault(month, []).append(_status_entry(category, limit, spent))
+    return status_by_month
@@ -0,0 +1,252 @@
+"""
+Cache for report results, keyed by (user_id, report kind, period).
+
+Two levels:
+
+1. An in-process LRU of CACHE_SIZE entries, each kept at most CACHE_TTL
+   seconds. Every entry remembers the user's data version it was computed
+   at and is only served while that is still the current version.
+2. When FINANCE_CACHE_SHARED is on (the default), the report_cache table,
+   shared by every worker process and filled ahead of time by batch.py.
+   Reports computed on a miss are written through to it.
+
+Invalidation is by period: a transaction on 2024-03-05 drops that user's
+2024-03 monthly report and budget status and their 2024 yearly report,
+and a budget change drops that month's budget status. The writes in
+transactions.py, budget.py, writer.py and importer.py clear this process's
+entries after they commit; triggers clear the table for every process
+and bump the user's data version, which retires the entries in other
+processes' memory (one primary-key lookup per hit). A report is written
+to the table only if the version it was computed at is still current.
+
+A miss that raced with an invalidation is not stored, so a report read
+just before a write cannot outlive it. Cached values are shared; treat
+them as read-only.
+
+get_data_version() returns a per-user counter that triggers bump on every
+transaction or budget change, for validating whole pages (ETags).
+"""
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+import database
+from database import get_connection
+from utils import month_key, from_month_key
+
+# Entries kept in memory, and seconds before an entry is recomputed
+CACHE_SIZE = int(os.environ.get("FINANCE_CACHE_SIZE", "1024"))
+CACHE_TTL = float(os.environ.get("FINANCE_CACHE_TTL", "300"))
+
+# Share reports between processes through the report_cache table
+CACHE_SHARED = os.environ.get("FINANCE_CACHE_SHARED", "1") == "1"
+
+_MISSING = object()
+
+
+def _periods(day):
+    """Cache periods a YYYYMMDD day falls in: (month 'YYYY-MM', year 'YYYY')"""
+    return f"{day // 10000:04d}-{day // 100 % 100:02d}", f"{day // 10000:04d}"
+
+
+class ReportCache:
+    """Thread-safe LRU of report results with a TTL and hit/miss counters"""
+
+    def __init__(self, maxsize=CACHE_SIZE, ttl=CACHE_TTL, shared=CACHE_SHARED):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.shared = shared
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._pool = None
+        # Bumped by every invalidation so racing misses are not stored
+        self._generation = 0
+        self._hits = 0
+        self._shared_hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    def _check_database(self):
+        """Forget everything when the data layer is pointed at another database"""
+        pool = database.get_pool()
+        if pool is not self._pool:
+            self.clear()
+            self._pool = pool
+
+    def get(self, key, version=None):
+        """Return the cached value for key, or _MISSING
+
+        version is the user's current data version (read here if not given).
+        """
+        self._check_database()
+        if version is None:
+            version = get_data_version(key[0])
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, entry_version, value = entry
+                if expires > now and entry_version == version:
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return value
+                del self._entries[key]
+
+        if self.shared:
+            generation = self._generation
+            value = self._get_shared(key)
+            if value is not _MISSING:
+                with self._lock:
+                    self._shared_hits += 1
+                if self._generation == generation:
+                    self._store(key, version, value)
+                return value
+
+        with self._lock:
+            self._misses += 1
+        return _MISSING
+
+    def _get_shared(self, key):
+        user_id, kind, period = key
+        # Precomputed batch rows (run_id > 0) are protected by claims; rows
+        # written on a miss are trusted for the TTL like memory entries
+        cutoff = (datetime.now() - timedelta(seconds=self.ttl)).isoformat(timespec="seconds")
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT data FROM report_cache
+                WHERE user_id=? AND kind=? AND period=?
+                  AND (run_id > 0 OR computed_at >= ?)
+            """, (user_id, kind, period, cutoff))
+            row = cursor.fetchone()
+        return json.loads(row[0]) if row else _MISSING
+
+    def _store(self, key, version, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, version, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def get_or_compute(self, key, compute):
+        """Cached value for key, computing and storing it on a miss"""
+        # Read before computing: a write landing meanwhile makes the entry outdated
+        version = get_data_version(key[0])
+        value = self.get(key, version)
+        if value is not _MISSING:
+            return value
+
+        generation = self._generation
+        value = compute()
+        if self._generation != generation:
+            # Something was invalidated while computing; don't cache a possibly stale value
+            return value
+
+        self._store(key, version, value)
+        if self.shared:
+            user_id, kind, period = key
+            # Only if no process changed the user's data since the version was
+            # read: a write that committed meanwhile already cleared this row
+            with get_connection() as conn:
+                conn.execute("""
+                    INSERT INTO report_cache (user_id, kind, period, data, run_id, computed_at)
+                    SELECT ?, ?, ?, ?, 0, ?
+                    WHERE COALESCE((SELECT version FROM data_versions WHERE user_id=?), 0) = ?
+                    ON CONFLICT (user_id, kind, period)
+                    DO UPDATE SET data=excluded.data, run_id=0, computed_at=excluded.computed_at
+                """, (user_id, kind, period, json.dumps(value),
+                      datetime.now().isoformat(timespec="seconds"), user_id, version[0]))
+        return value
+
+    def invalidate(self, keys):
+        """Drop the given keys from memory"""
+        with self._lock:
+            self._generation += 1
+            for key in keys:
+                if self._entries.pop(key, None) is not None:
+                    self._invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def stats(self):
+        """Counters for monitoring"""
+        with self._lock:
+            lookups = self._hits + self._shared_hits + self._misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl_seconds': self.ttl,
+                'shared': self.shared,
+                'hits': self._hits,
+                'shared_hits': self._shared_hits,
+                'misses': self._misses,
+                'hit_rate': (self._hits + self._shared_hits) / lookups if lookups else 0.0,
+                'evictions': self._evictions,
+                'invalidations': self._invalidations,
+            }
+
+
+_cache = ReportCache()
+
+
+def _period_key(kind, period):
+    """A period as invalidation names it: 'YYYY' for yearly reports, else 'YYYY-MM'
+
+    Raises ValueError for a period that is not a month or year.
+    """
+    if kind == "yearly":
+        return f"{int(period):04d}"
+    return from_month_key(month_key(str(period)))
+
+
+def cached(kind, user_id, period, compute):
+    """Report of a kind ('monthly', 'yearly' or 'budget') for a period, via the cache
+
+    compute(user_id, period) produces the report on a miss, with period
+    normalized ('2024-3' and '2024-03-15' become '2024-03').
+    """
+    period = _period_key(kind, period)
+    return _cache.get_or_compute((user_id, kind, period),
+                                 lambda: compute(user_id, period))
+
+
+def invalidate_days(user_id, *days):
+    """Drop a user's reports covering the given YYYYMMDD days"""
+    keys = []
+    for day in days:
+        month, year = _periods(day)
+        keys += [(user_id, "monthly", month), (user_id, "budget", month),
+                 (user_id, "yearly", year)]
+    _cache.invalidate(keys)
+
+
+def invalidate_budget(user_id, month):
+    """Drop a user's budget status for a 'YYYY-MM' month"""
+    _cache.invalidate([(user_id, "budget", month)])
+
+
+def get_data_version(user_id):
+    """(version, updated_at Unix seconds) of a user's data; (0, None) before any change"""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT version, updated_at FROM data_versions WHERE user_id=?",
+                       (user_id,))
+        row = cursor.fetchone()
+    return row if row else (0, None)
+
+
+def clear_cache():
+    """Drop every in-memory report (e.g. after a restore)"""
+    _cache.clear()
+
+
+def get_cache_stats():
+    """Cache statistics (hits, misses, evictions)"""
+    return _cache.stats()
@@ -0,0 +1,126 @@
+from contextlib import contextmanager
+from database import get_connection
+from utils import from_minor, from_day, month_range, to_day
+
+# Per-day totals and the running balance are kept in daily_cashflow by
+# triggers, which only touch the changed day and the days after it.
+
+def _to_entry(row):
+    """Convert a stored row to (date, income, expense, net, balance)"""
+    day, income, expense, balance = row
+    return (from_day(day), from_minor(income), from_minor(expense),
+            from_minor(income - expense), from_minor(balance))
+
+def get_cashflow(user_id, start_date=None, end_date=None):
+    """Get (date, income, expense, net, balance) for each day with transactions"""
+    conditions = ["user_id=?"]
+    params = [user_id]
+    if start_date:
+        conditions.append("day >= ?")
+        params.append(to_day(start_date))
+    if end_date:
+        conditions.append("day <= ?")
+        params.append(to_day(end_date))
+
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            SELECT day, income, expense, balance
+            FROM daily_cashflow
+            WHERE {" AND ".join(conditions)}
+            ORDER BY day
+        """, params)
+        rows = cursor.fetchall()
+    return [_to_entry(row) for row in rows]
+
+def get_recent_cashflow(user_id, days=30):
+    """Get the latest days with transactions, newest first"""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT day, income, expense, balance
+            FROM daily_cashflow
+            WHERE user_id=?
+            ORDER BY day DESC
+            LIMIT ?
+        """, (user_id, days))
+        rows = cursor.fetchall()
+    return [_to_entry(row) for row in rows]
+
+def get_balance(user_id, as_of=None):
+    """Get the running balance at the end of a day (default: latest)"""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT balance FROM daily_cashflow
+            WHERE user_id=? AND day <= ?
+            ORDER BY day DESC
+            LIMIT 1
+        """, (user_id, to_day(as_of) if as_of else 99991231))
+        row = cursor.fetchone()
+    return from_minor(row[0]) if row else 0.0
+
+def get_month_cashflow(user_id, month):
+    """Get opening and closing balance and the daily timeline for a month"""
+    start, end = month_range(month)
+
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT balance FROM daily_cashflow
+            WHERE user_id=? AND day < ?
+            ORDER BY day DESC
+            LIMIT 1
+        """, (user_id, start))
+        opening = cursor.fetchone()
+        cursor.execute("""
+            SELECT day, income, expense, balance
+            FROM daily_cashflow
+            WHERE user_id=? AND day >= ? AND day < ?
+            ORDER BY day
+        """, (user_id, start, end))
+        rows = cursor.fetchall()
+
+    opening = opening[0] if opening else 0
+    closing = rows[-1][3] if rows else opening
+    return {
+        'opening': from_minor(opening),
+        'closing': from_minor(closing),
+        'days': [_to_entry(row) for row in rows]
+    }
+
+def recompute_cashflow(cursor, user_id, from_day_value):
+    """Rebuild a user's timeline from a day (YYYYMMDD) forward"""
+    cursor.execute("DELETE FROM daily_cashflow WHERE user_id=? AND day >= ?",
+                   (user_id, from_day_value))
+    cursor.execute("""
+        INSERT INTO daily_cashflow (user_id, day, income, expense, count, balance)
+        SELECT user_id, day, income, expense, count,
+               COALESCE((SELECT balance FROM daily_cashflow
+                         WHERE user_id = ? AND day < ?
+                         ORDER BY day DESC LIMIT 1), 0)
+               + SUM(income - expense) OVER (ORDER BY day)
+        FROM (
+            SELECT user_id, day,
+                   SUM(CASE WHEN type = 'income' THEN amount_minor ELSE 0 END) AS income,
+                   SUM(CASE WHEN type = 'expense' THEN amount_minor ELSE 0 END) AS expense,
+                   COUNT(*) AS count
+            FROM transactions
+            WHERE user_id = ? AND day >= ?
+            GROUP BY day
+        )
+    """, (user_id, from_day_value, user_id, from_day_value))
+
+@contextmanager
+def deferred_cashflow(cursor, user_id):
+    """Pause per-row timeline upkeep for a bulk write, then recompute once
+
+    Must run inside the write transaction, so other connections never see
+    the pause. Yields a list; append the day (YYYYMMDD) of every row written.
+    """
+    cursor.execute("INSERT INTO cashflow_deferred (user_id) VALUES (?)", (user_id,))
+    days = []
+    yield days
+    cursor.execute("DELETE FROM cashflow_deferred WHERE user_id=?", (user_id,))
+    if days:
+        recompute_cashflow(cursor, user_id, min(days))
@@ -1,38 +1,854 @@
+import hashlib
+import os
+import queue
 import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Database file used by every module; override with FINANCE_DB or configure()
+DB_PATH = os.environ.get("FINANCE_DB", "finance.db")
+
+# Maximum number of open connections kept by the pool
+POOL_SIZE = int(os.environ.get("FINANCE_DB_POOL_SIZE", "5"))
+
+# Seconds to wait for a free connection before giving up
+POOL_TIMEOUT = 30
+
+# PRAGMAs applied to every new connection, by storage profile.
+# "durable": WAL so readers never wait for writers, fsync on every commit.
+# "fast": WAL with synchronous=NORMAL; a commit is atomic but the last few
+#   may be lost on power failure (not on an app crash). Larger cache and mmap.
+# "journal": the old rollback journal, where a writer blocks all readers.
+STORAGE_PROFILES = {
+    "durable": {
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "cache_size": -16000,
+        "mmap_size": 0,
+        "temp_store": "MEMORY",
+        "busy_timeout": 30000,
+    },
+    "fast": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -64000,
+        "mmap_size": 268435456,
+        "temp_store": "MEMORY",
+        "busy_timeout": 30000,
+    },
+    "journal": {
+        "journal_mode": "DELETE",
+        "synchronous": "FULL",
+        "cache_size": -2000,
+        "mmap_size": 0,
+        "temp_store": "DEFAULT",
+        "busy_timeout": 30000,
+    },
+}
+
+# Storage profile used by the pool; override with FINANCE_DB_PROFILE or configure()
+STORAGE_PROFILE = os.environ.get("FINANCE_DB_PROFILE", "durable")
+
+# Class of every pooled connection; metrics.enable() swaps in a tracing subclass
+CONNECTION_FACTORY = sqlite3.Connection
+
+
+def apply_profile(conn, profile):
+    """Apply a storage profile's PRAGMAs to a connection"""
+    if profile not in STORAGE_PROFILES:
+        raise ValueError(f"Unknown storage profile: {profile}")
+    for pragma, value in STORAGE_PROFILES[profile].items():
+        conn.execute(f"PRAGMA {pragma} = {value}")
+
+
+class ConnectionPool:
+    """Bounded, thread-safe pool of SQLite connections"""
+
+    def __init__(self, db_path, size=POOL_SIZE, timeout=POOL_TIMEOUT, profile=None):
+        self.db_path = db_path
+        self.size = size
+        self.timeout = timeout
+        self.profile = profile or STORAGE_PROFILE
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._open = 0
+        self._in_use = 0
+        self._checkouts = 0
+        self._wait_time = 0.0
+        self._max_wait = 0.0
+
+    def _connect(self):
+        # Connections move between threads, so the same-thread check is off;
+        # the pool guarantees only one thread uses a connection at a time.
+        conn = sqlite3.connect(self.db_path, timeout=self.timeout,
+                               check_same_thread=False, factory=CONNECTION_FACTORY)
+        try:
+            apply_profile(conn, self.profile)
+        except Exception:
+            conn.close()
+            raise
+        return conn
+
+    def acquire(self):
+        """Borrow a connection, opening a new one while under the size limit"""
+        start = time.perf_counter()
+        conn = None
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_open = self._open < self.size
+                if can_open:
+                    self._open += 1
+            if can_open:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._lock:
+                        self._open -= 1
+                    raise
+            else:
+                try:
+                    conn = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    raise TimeoutError(
+                        f"No database connection free after {self.timeout}s")
+
+        waited = time.perf_counter() - start
+        with self._lock:
+            self._in_use += 1
+            self._checkouts += 1
+            self._wait_time += waited
+            self._max_wait = max(self._max_wait, waited)
+        return conn
+
+    def release(self, conn):
+        """Return a borrowed connection to the pool"""
+        with self._lock:
+            self._in_use -= 1
+        self._idle.put(conn)
+
+    def discard(self, conn):
+        """Drop a connection that should not be reused"""
+        with self._lock:
+            self._in_use -= 1
+            self._open -= 1
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    def close_all(self):
+        """Close every idle connection"""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            with self._lock:
+                self._open -= 1
+            conn.close()
+
+    def stats(self):
+        """Counters for monitoring"""
+        with self._lock:
+            return {
+                'db_path': self.db_path,
+                'profile': self.profile,
+                'size': self.size,
+                'open_connections': self._open,
+                'in_use': self._in_use,
+                'idle': self._open - self._in_use,
+                'checkouts': self._checkouts,
+                'total_wait_seconds': self._wait_time,
+                'avg_wait_seconds': self._wait_time / self._checkouts if self._checkouts else 0.0,
+                'max_wait_seconds': self._max_wait,
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+# Pools inherited from the parent of a forked process (see _reset_after_fork)
+_inherited_pools = []
+
+
+def _reset_after_fork():
+    """In a forked child (e.g. a gunicorn worker), start over with a new pool
+
+    SQLite connections must not cross a fork. The parent's are kept
+    referenced rather than closed: closing the last connection to a WAL
+    database checkpoints and may delete the WAL file, which the parent
+    is still using.
+    """
+    global _pool, _pool_lock
+    _pool_lock = threading.Lock()
+    if _pool is not None:
+        _inherited_pools.append(_pool)
+    _pool = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def get_pool():
+    """Return the process-wide pool, creating it on first use"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(DB_PATH, POOL_SIZE, profile=STORAGE_PROFILE)
+    return _pool
+
+
+def configure(db_path=None, pool_size=None, profile=None):
+    """Point the data layer at another database file and reset the pool"""
+    global DB_PATH, POOL_SIZE, STORAGE_PROFILE, _pool
+    if profile is not None and profile not in STORAGE_PROFILES:
+        raise ValueError(f"Unknown storage profile: {profile}")
+    with _pool_lock:
+        if db_path is not None:
+            DB_PATH = db_path
+        if pool_size is not None:
+            POOL_SIZE = pool_size
+        if profile is not None:
+            STORAGE_PROFILE = profile
+        if _pool is not None:
+            _pool.close_all()
+        _pool = None
+
+
+def set_connection_factory(factory):
+    """Open future connections as factory (a sqlite3.Connection subclass) and reset the pool"""
+    global CONNECTION_FACTORY, _pool
+    with _pool_lock:
+        CONNECTION_FACTORY = factory
+        if _pool is not None:
+            _pool.close_all()
+        _pool = None
+
+
+def close_pool():
+    """Close all idle pooled connections"""
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close_all()
+
+
+def get_pool_stats():
+    """Pool statistics (checkouts, wait time, open connections)"""
+    return get_pool().stats()
+
+
+def _lock_path(name):
+    # Beside the other temporary files rather than the database, so tests
+    # and backups leave nothing behind; one file per database and purpose
+    digest = hashlib.sha1(os.path.abspath(DB_PATH).encode()).hexdigest()[:16]
+    return os.path.join(tempfile.gettempdir(), f"finance-{digest}-{name}.lock")
 
-def init_db():
-    conn = sqlite3.connect("finance.db")
-    cursor = conn.cursor()
 
+@contextmanager
+def file_lock(name, blocking=True):
+    """Hold the database's exclusive lock called name, across processes and threads
+
+    Yields True once the lock is held. With blocking=False it yields False
+    straight away if another holder has it. Not re-entrant.
+    """
+    with open(_lock_path(name), "a+b") as f:
+        if fcntl:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    # LK_LOCK gives up after about 10 seconds; keep waiting
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+                    break
+                except OSError:
+                    if not blocking:
+                        yield False
+                        return
+        try:
+            yield True
+        finally:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+@contextmanager
+def schema_lock():
+    """Hold an exclusive lock, across processes and threads, while changing the schema
+
+    Workers that start together wait here one at a time; the first applies
+    the migrations and the rest find nothing left to do. Not re-entrant.
+    """
+    with file_lock("schema"):
+        yield
+
+
+@contextmanager
+def get_connection():
+    """Borrow a pooled connection; commits on success, rolls back on error"""
+    pool = get_pool()
+    conn = pool.acquire()
+    try:
+        yield conn
+        conn.commit()
+    except BaseException:
+        try:
+            conn.rollback()
+        except sqlite3.Error:
+            pool.discard(conn)
+            raise
+        pool.release(conn)
+        raise
+    else:
+        pool.release(conn)
+
+
+def _add_query_indexes(cursor):
+    """Migration 1: indexes for the per-user period queries"""
     cursor.execute("""
-    CREATE TABLE IF NOT EXISTS users (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        username TEXT UNIQUE,
-        password TEXT
+    CREATE INDEX IF NOT EXISTS idx_transactions_user_date
+    ON transactions (user_id, date)
+    """)
+    cursor.execute("""
+    CREATE INDEX IF NOT EXISTS idx_transactions_user_type_date
+    ON transactions (user_id, type, date)
+    """)
+    cursor.execute("""
+    CREATE INDEX IF NOT EXISTS idx_transactions_user_category_type_date
+    ON transactions (user_id, category, type, date)
+    """)
+
+    # Keep the newest budget when older duplicates exist
+    cursor.execute("""
+    DELETE FROM budgets
+    WHERE id NOT IN (
+        SELECT MAX(id) FROM budgets GROUP BY user_id, category, month
     )
     """)
+    cursor.execute("""
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_budgets_user_category_month
+    ON budgets (user_id, category, month)
+    """)
+
 
+def _store_integer_amounts_and_days(cursor):
+    """Migration 2: amounts as integer paise, dates as YYYYMMDD integers"""
     cursor.execute("""
-    CREATE TABLE IF NOT EXISTS transactions (
+    CREATE TABLE transactions_new (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         user_id INTEGER,
         type TEXT,
         category TEXT,
-        amount REAL,
-        date TEXT,
+        amount_minor INTEGER NOT NULL,
+        day INTEGER NOT NULL,
         description TEXT
     )
     """)
+    cursor.execute("""
+    INSERT INTO transactions_new (id, user_id, type, category, amount_minor, day, description)
+    SELECT id, user_id, type, category,
+           CAST(ROUND(COALESCE(amount, 0) * 100) AS INTEGER),
+           CAST(REPLACE(SUBSTR(date, 1, 10), '-', '') AS INTEGER),
+           description
+    FROM transactions
+    """)
+    cursor.execute("DROP TABLE transactions")
+    cursor.execute("ALTER TABLE transactions_new RENAME TO transactions")
+    cursor.execute("""
+    CREATE INDEX idx_transactions_user_day
+    ON transactions (user_id, day)
+    """)
+    cursor.execute("""
+    CREATE INDEX idx_transactions_user_type_day
+    ON transactions (user_id, type, day)
+    """)
+    cursor.execute("""
+    CREATE INDEX idx_transactions_user_category_type_day
+    ON transactions (user_id, category, type, day)
+    """)
 
     cursor.execute("""
-    CREATE TABLE IF NOT EXISTS budgets (
+    CREATE TABLE budgets_new (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         user_id INTEGER,
         category TEXT,
-        monthly_limit REAL,
+        limit_minor INTEGER NOT NULL,
         month TEXT
     )
     """)
+    cursor.execute("""
+    INSERT INTO budgets_new (id, user_id, category, limit_minor, month)
+    SELECT id, user_id, category,
+           CAST(ROUND(COALESCE(monthly_limit, 0) * 100) AS INTEGER), month
+    FROM budgets
+    """)
+    cursor.execute("DROP TABLE budgets")
+    cursor.execute("ALTER TABLE budgets_new RENAME TO budgets")
+    cursor.execute("""
+    CREATE UNIQUE INDEX idx_budgets_user_category_month
+    ON budgets (user_id, category, month)
+    """)
+
+
+def _add_monthly_rollups(cursor):
+    """Migration 3: per user/month/type/category totals kept in sync by triggers"""
+    cursor.execute("""
+    CREATE TABLE monthly_rollups (
+        user_id INTEGER NOT NULL,
+        month INTEGER NOT NULL,
+        type TEXT NOT NULL,
+        category TEXT NOT NULL,
+        total INTEGER NOT NULL,
+        count INTEGER NOT NULL,
+        PRIMARY KEY (user_id, month, type, category)
+    ) WITHOUT ROWID
+    """)
+    cursor.execute("""
+    INSERT INTO monthly_rollups (user_id, month, type, category, total, count)
+    SELECT user_id, day / 100, COALESCE(type, ''), COALESCE(category, ''),
+           SUM(amount_minor), COUNT(*)
+    FROM transactions
+    GROUP BY user_id, day / 100, COALESCE(type, ''), COALESCE(category, '')
+    """)
+
+    add_new = """
+        INSERT INTO monthly_rollups (user_id, month, type, category, total, count)
+        VALUES (NEW.user_id, NEW.day / 100, COALESCE(NEW.type, ''),
+                COALESCE(NEW.category, ''), NEW.amount_minor, 1)
+        ON CONFLICT (user_id, month, type, category)
+        DO UPDATE SET total = total + excluded.total, count = count + 1;
+    """
+    remove_old = """
+        UPDATE monthly_rollups
+        SET total = total - OLD.amount_minor, count = count - 1
+        WHERE user_id = OLD.user_id AND month = OLD.day / 100
+          AND type = COALESCE(OLD.type, '') AND category = COALESCE(OLD.category, '');
+        DELETE FROM monthly_rollups
+        WHERE user_id = OLD.user_id AND month = OLD.day / 100
+          AND type = COALESCE(OLD.type, '') AND category = COALESCE(OLD.category, '')
+          AND count <= 0;
+    """
+    cursor.execute(f"""
+    CREATE TRIGGER trg_rollups_insert AFTER INSERT ON transactions
+    BEGIN {add_new} END
+    """)
+    cursor.execute(f"""
+    CREATE TRIGGER trg_rollups_delete AFTER DELETE ON transactions
+    BEGIN {remove_old} END
+    """)
+    cursor.execute(f"""
+    CREATE TRIGGER trg_rollups_update
+    AFTER UPDATE OF user_id, type, category, amount_minor, day ON transactions
+    BEGIN {remove_old} {add_new} END
+    """)
+
+
+def _add_category_day_index(cursor):
+    """Migration 4: index for category-filtered transaction listings"""
+    cursor.execute("""
+    CREATE INDEX IF NOT EXISTS idx_transactions_user_category_day
+    ON transactions (user_id, category, day)
+    """)
+
+
+def _add_transaction_fingerprints(cursor):
+    """Migration 5: content fingerprint so re-imported rows are skipped"""
+    cursor.execute("ALTER TABLE transactions ADD COLUMN fingerprint BLOB")
+    cursor.execute("""
+    CREATE UNIQUE INDEX idx_transactions_user_fingerprint
+    ON transactions (user_id, fingerprint) WHERE fingerprint IS NOT NULL
+    """)
+
+
+def _add_change_log(cursor):
+    """Migration 6: log of changed rows for incremental backups"""
+    cursor.execute("""
+    CREATE TABLE backup_chain (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        chain_id TEXT,
+        last_seq INTEGER NOT NULL DEFAULT 0
+    )
+    """)
+    cursor.execute("INSERT INTO backup_chain (id) VALUES (1)")
+    cursor.execute("""
+    CREATE TABLE change_log (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        tbl TEXT NOT NULL,
+        row_id INTEGER NOT NULL
+    )
+    """)
+
+    # Changes are only logged while an incremental backup chain is active
+    active = "EXISTS (SELECT 1 FROM backup_chain WHERE chain_id IS NOT NULL)"
+    for table in ("transactions", "budgets"):
+        for event, ref in (("INSERT", "NEW"), ("UPDATE", "NEW"), ("DELETE", "OLD")):
+            extra = ""
+            if event == "UPDATE":
+                # A changed id leaves the old row behind too
+                extra = f"""
+                INSERT INTO change_log (tbl, row_id)
+                SELECT '{table}', OLD.id WHERE OLD.id IS NOT NEW.id;"""
+            cursor.execute(f"""
+            CREATE TRIGGER trg_change_log_{table}_{event.lower()}
+            AFTER {event} ON {table} WHEN {active}
+            BEGIN
+                INSERT INTO change_log (tbl, row_id) VALUES ('{table}', {ref}.id);{extra}
+            END
+            """)
+
+
+def _add_daily_cashflow(cursor):
+    """Migration 7: per user/day income, expense and running balance kept by triggers"""
+    cursor.execute("""
+    CREATE TABLE daily_cashflow (
+        user_id INTEGER NOT NULL,
+        day INTEGER NOT NULL,
+        income INTEGER NOT NULL,
+        expense INTEGER NOT NULL,
+        count INTEGER NOT NULL,
+        balance INTEGER NOT NULL,
+        PRIMARY KEY (user_id, day)
+    ) WITHOUT ROWID
+    """)
+    # A row here pauses the triggers inside a bulk write, which then
+    # recomputes the timeline once (see cashflow.deferred_cashflow)
+    cursor.execute("""
+    CREATE TABLE cashflow_deferred (
+        user_id INTEGER PRIMARY KEY
+    )
+    """)
+    cursor.execute("""
+    INSERT INTO daily_cashflow (user_id, day, income, expense, count, balance)
+    SELECT user_id, day, income, expense, count,
+           SUM(income - expense) OVER (PARTITION BY user_id ORDER BY day)
+    FROM (
+        SELECT user_id, day,
+               SUM(CASE WHEN type = 'income' THEN amount_minor ELSE 0 END) AS income,
+               SUM(CASE WHEN type = 'expense' THEN amount_minor ELSE 0 END) AS expense,
+               COUNT(*) AS count
+        FROM transactions
+        GROUP BY user_id, day
+    )
+    """)
+
+    # Only the changed day's totals and the balances from that day forward move
+    add_new = """
+        INSERT INTO daily_cashflow (user_id, day, income, expense, count, balance)
+        VALUES (NEW.user_id, NEW.day, 0, 0, 0, COALESCE((
+            SELECT balance FROM daily_cashflow
+            WHERE user_id = NEW.user_id AND day < NEW.day
+            ORDER BY day DESC LIMIT 1), 0))
+        ON CONFLICT (user_id, day) DO NOTHING;
+        UPDATE daily_cashflow
+        SET income = income + CASE WHEN NEW.type = 'income' THEN NEW.amount_minor ELSE 0 END,
+            expense = expense + CASE WHEN NEW.type = 'expense' THEN NEW.amount_minor ELSE 0 END,
+            count = count + 1
+        WHERE user_id = NEW.user_id AND day = NEW.day;
+        UPDATE daily_cashflow
+        SET balance = balance + CASE NEW.type WHEN 'income' THEN NEW.amount_minor
+                                              WHEN 'expense' THEN -NEW.amount_minor ELSE 0 END
+        WHERE user_id = NEW.user_id AND day >= NEW.day;
+    """
+    remove_old = """
+        UPDATE daily_cashflow
+        SET income = income - CASE WHEN OLD.type = 'income' THEN OLD.amount_minor ELSE 0 END,
+            expense = expense - CASE WHEN OLD.type = 'expense' THEN OLD.amount_minor ELSE 0 END,
+            count = count - 1
+        WHERE user_id = OLD.user_id AND day = OLD.day;
+        UPDATE daily_cashflow
+        SET balance = balance - CASE OLD.type WHEN 'income' THEN OLD.amount_minor
+                                              WHEN 'expense' THEN -OLD.amount_minor ELSE 0 END
+        WHERE user_id = OLD.user_id AND day >= OLD.day;
+        DELETE FROM daily_cashflow
+        WHERE user_id = OLD.user_id AND day = OLD.day AND count <= 0;
+    """
+    new_active = "NOT EXISTS (SELECT 1 FROM cashflow_deferred WHERE user_id = NEW.user_id)"
+    old_active = "NOT EXISTS (SELECT 1 FROM cashflow_deferred WHERE user_id = OLD.user_id)"
+    cursor.execute(f"""
+    CREATE TRIGGER trg_cashflow_insert AFTER INSERT ON transactions
+    WHEN {new_active}
+    BEGIN {add_new} END
+    """)
+    cursor.execute(f"""
+    CREATE TRIGGER trg_cashflow_delete AFTER DELETE ON transactions
+    WHEN {old_active}
+    BEGIN {remove_old} END
+    """)
+    cursor.execute(f"""
+    CREATE TRIGGER trg_cashflow_update
+    AFTER UPDATE OF user_id, type, amount_minor, day ON transactions
+    WHEN {old_active} AND {new_active}
+    BEGIN {remove_old} {add_new} END
+    """)
+
+
+def _add_budget_forecasts(cursor):
+    """Migration 8: nightly end-of-month spending projections per category"""
+    cursor.execute("""
+    CREATE TABLE budget_forecasts (
+        user_id INTEGER NOT NULL,
+        month TEXT NOT NULL,
+        category TEXT NOT NULL,
+        spent_minor INTEGER NOT NULL,
+        projected_minor INTEGER NOT NULL,
+        limit_minor INTEGER,
+        projected_exceeded INTEGER NOT NULL,
+        computed_at TEXT NOT NULL,
+        PRIMARY KEY (user_id, month, category)
+    ) WITHOUT ROWID
+    """)
+
+
+def _add_report_cache(cursor):
+    """Migration 9: reports precomputed by the batch job, dropped when their data changes"""
+    cursor.execute("""
+    CREATE TABLE report_runs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        month TEXT NOT NULL,
+        year TEXT NOT NULL,
+        users_total INTEGER NOT NULL,
+        users_done INTEGER NOT NULL DEFAULT 0,
+        started_at TEXT NOT NULL,
+        finished_at TEXT
+    )
+    """)
+    cursor.execute("""
+    CREATE TABLE report_cache (
+        user_id INTEGER NOT NULL,
+        kind TEXT NOT NULL,
+        period TEXT NOT NULL,
+        data TEXT NOT NULL,
+        run_id INTEGER NOT NULL,
+        computed_at TEXT NOT NULL,
+        PRIMARY KEY (user_id, kind, period)
+    ) WITHOUT ROWID
+    """)
+
+    # Any change to a user's transactions invalidates their cached reports;
+    # a budget change only their budget status and batch claim (see batch.py)
+    for table, kinds in (("transactions", ""),
+                         ("budgets", " AND kind IN ('budget', 'claim')")):
+        for event, refs in (("INSERT", ("NEW",)), ("UPDATE", ("OLD", "NEW")), ("DELETE", ("OLD",))):
+            body = "".join(f"""
+                DELETE FROM report_cache WHERE user_id = {ref}.user_id{kinds};"""
+                for ref in refs)
+            cursor.execute(f"""
+            CREATE TRIGGER trg_report_cache_{table}_{event.lower()}
+            AFTER {event} ON {table}
+            BEGIN{body}
+            END
+            """)
+
+
+def _narrow_report_cache_invalidation(cursor):
+    """Migration 10: a change only drops the cached reports for its own month and year"""
+    for table in ("transactions", "budgets"):
+        for event in ("insert", "update", "delete"):
+            cursor.execute(f"DROP TRIGGER trg_report_cache_{table}_{event}")
+
+    # Claims are still dropped by any change (see batch.py)
+    def transaction_periods(ref):
+        month = f"printf('%04d-%02d', {ref}.day / 10000, {ref}.day / 100 % 100)"
+        year = f"printf('%04d', {ref}.day / 10000)"
+        return f"""
+            DELETE FROM report_cache WHERE user_id = {ref}.user_id
+              AND (kind = 'claim'
+                   OR (kind IN ('monthly', 'budget') AND period = {month})
+                   OR (kind = 'yearly' AND period = {year}));"""
+
+    def budget_periods(ref):
+        return f"""
+            DELETE FROM report_cache WHERE user_id = {ref}.user_id
+              AND (kind = 'claim' OR (kind = 'budget' AND period = {ref}.month));"""
+
+    for table, periods in (("transactions", transaction_periods), ("budgets", budget_periods)):
+        for event, refs in (("INSERT", ("NEW",)), ("UPDATE", ("OLD", "NEW")), ("DELETE", ("OLD",))):
+            cursor.execute(f"""
+            CREATE TRIGGER trg_report_cache_{table}_{event.lower()}
+            AFTER {event} ON {table}
+            BEGIN{"".join(periods(ref) for ref in refs)}
+            END
+            """)
+
+
+def _add_data_versions(cursor):
+    """Migration 11: per-user counter bumped by every transaction or budget change"""
+    cursor.execute("""
+    CREATE TABLE data_versions (
+        user_id INTEGER PRIMARY KEY,
+        version INTEGER NOT NULL,
+        updated_at REAL NOT NULL
+    )
+    """)
+
+    # updated_at (Unix seconds) keeps a (version, updated_at) pair unique
+    # even when a restore winds the counter back
+    def bump(user_id, condition="1"):
+        return f"""
+            INSERT INTO data_versions (user_id, version, updated_at)
+            SELECT {user_id}, 1, (julianday('now') - 2440587.5) * 86400.0 WHERE {condition}
+            ON CONFLICT (user_id) DO UPDATE
+            SET version = version + 1, updated_at = excluded.updated_at;"""
+
+    for table in ("transactions", "budgets"):
+        cursor.execute(f"""
+        CREATE TRIGGER trg_data_versions_{table}_insert AFTER INSERT ON {table}
+        BEGIN {bump("NEW.user_id")} END
+        """)
+        cursor.execute(f"""
+        CREATE TRIGGER trg_data_versions_{table}_update AFTER UPDATE ON {table}
+        BEGIN {bump("NEW.user_id")} {bump("OLD.user_id", "OLD.user_id IS NOT NEW.user_id")} END
+        """)
+        cursor.execute(f"""
+        CREATE TRIGGER trg_data_versions_{table}_delete AFTER DELETE ON {table}
+        BEGIN {bump("OLD.user_id")} END
+        """)
+
+
+def _add_transaction_search(cursor):
+    """Migration 12: FTS5 index over transaction descriptions and categories"""
+    # The owner column holds a "u<user_id>" token, so the index itself
+    # narrows a search to one user instead of matching everyone's rows
+    cursor.execute("""
+    CREATE VIEW transactions_search_source AS
+    SELECT id, 'u' || user_id AS owner, COALESCE(description, '') AS description,
+           COALESCE(category, '') AS category
+    FROM transactions
+    """)
+    cursor.execute("""
+    CREATE VIRTUAL TABLE transactions_fts USING fts5(
+        owner, description, category,
+        content='transactions_search_source', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """)
+    cursor.execute("INSERT INTO transactions_fts (transactions_fts) VALUES ('rebuild')")
+    # Rank by BM25 with description matches counting double; owner never scores
+    cursor.execute("""
+    INSERT INTO transactions_fts (transactions_fts, rank) VALUES ('rank', 'bm25(0.0, 2.0, 1.0)')
+    """)
+
+    # External content: the index is told the old values to remove
+    add_new = """
+        INSERT INTO transactions_fts (rowid, owner, description, category)
+        VALUES (NEW.id, 'u' || NEW.user_id, COALESCE(NEW.description, ''),
+                COALESCE(NEW.category, ''));
+    """
+    remove_old = """
+        INSERT INTO transactions_fts (transactions_fts, rowid, owner, description, category)
+        VALUES ('delete', OLD.id, 'u' || OLD.user_id, COALESCE(OLD.description, ''),
+                COALESCE(OLD.category, ''));
+    """
+    cursor.execute(f"""
+    CREATE TRIGGER trg_search_insert AFTER INSERT ON transactions
+    BEGIN {add_new} END
+    """)
+    cursor.execute(f"""
+    CREATE TRIGGER trg_search_delete AFTER DELETE ON transactions
+    BEGIN {remove_old} END
+    """)
+    cursor.execute(f"""
+    CREATE TRIGGER trg_search_update
+    AFTER UPDATE OF id, user_id, description, category ON transactions
+    BEGIN {remove_old} {add_new} END
+    """)
+
+
+# Schema migrations in order; PRAGMA user_version records the last one applied
+MIGRATIONS = [
+    (1, _add_query_indexes),
+    (2, _store_integer_amounts_and_days),
+    (3, _add_monthly_rollups),
+    (4, _add_category_day_index),
+    (5, _add_transaction_fingerprints),
+    (6, _add_change_log),
+    (7, _add_daily_cashflow),
+    (8, _add_budget_forecasts),
+    (9, _add_report_cache),
+    (10, _narrow_report_cache_invalidation),
+    (11, _add_data_versions),
+    (12, _add_transaction_search),
+]
+
+
+def get_schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn):
+    """Apply pending migrations, each in its own transaction"""
+    version = get_schema_version(conn)
+    for target, migration in MIGRATIONS:
+        if target <= version:
+            continue
+        conn.commit()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("BEGIN")
+            migration(cursor)
+            cursor.execute(f"PRAGMA user_version = {target}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        print(f"✅ Database migrated to version {target}")
+        version = target
+    return version
+
+
+def init_db():
+    """Create the base tables and apply pending migrations, one process at a time"""
+    with schema_lock(), get_connection() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE,
+            password TEXT
+        )
+        """)
+
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS transactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            type TEXT,
+            category TEXT,
+            amount REAL,
+            date TEXT,
+            description TEXT
+        )
+        """)
+
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS budgets (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            category TEXT,
+            monthly_limit REAL,
+            month TEXT
+        )
+        """)
 
-    conn.commit()
-    conn.close()
+        migrate(conn)
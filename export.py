@@ -0,0 +1,188 @@
+"""
+Streaming export of transactions and monthly report totals.
+
+Rows are read in keyset-paged chunks and written out as they arrive, so
+memory stays flat no matter how long the history is. Each chunk is one
+query on a connection returned to the pool before the chunk is sent, so
+a slow download does not hold a connection; an export is therefore not
+a single snapshot of data changed while it runs.
+CSV and JSONL need only the standard library; Parquet needs pyarrow.
+
+Usage:
+    python export.py USER_ID [--what transactions|reports] [--format csv|jsonl|parquet] [-o FILE]
+"""
+import argparse
+import contextlib
+import csv
+import io
+import json
+import sys
+from decimal import Decimal
+import database
+from database import get_connection
+from utils import to_day, from_day, from_month_key
+
+CHUNK_SIZE = 1000
+
+TRANSACTION_COLUMNS = ["id", "date", "type", "category", "amount", "description"]
+REPORT_COLUMNS = ["month", "type", "category", "total", "count"]
+
+def format_minor(minor):
+    """Exact decimal text for an amount in paise, e.g. -1050 -> '-10.50'"""
+    sign = "-" if minor < 0 else ""
+    return f"{sign}{abs(minor) // 100}.{abs(minor) % 100:02d}"
+
+def _iter_pages(select, conditions, params, key, key_of, chunk_size):
+    """Yield lists of rows ordered by the key columns, one query per chunk"""
+    after = None
+    while True:
+        where = list(conditions)
+        page_params = list(params)
+        if after is not None:
+            where.append(f"({', '.join(key)}) > ({', '.join('?' * len(key))})")
+            page_params.extend(after)
+        with get_connection() as conn:
+            rows = conn.execute(f"""
+                {select}
+                WHERE {" AND ".join(where)}
+                ORDER BY {", ".join(key)}
+                LIMIT ?
+            """, page_params + [chunk_size]).fetchall()
+        if not rows:
+            break
+        yield rows
+        if len(rows) < chunk_size:
+            break
+        after = key_of(rows[-1])
+
+def iter_transactions(user_id, start_date=None, end_date=None, chunk_size=CHUNK_SIZE):
+    """Yield lists of transaction rows (id, day, type, category, amount_minor, description)"""
+    conditions = ["user_id=?"]
+    params = [user_id]
+    if start_date:
+        conditions.append("day >= ?")
+        params.append(to_day(start_date))
+    if end_date:
+        conditions.append("day <= ?")
+        params.append(to_day(end_date))
+
+    yield from _iter_pages(
+        "SELECT id, day, type, category, amount_minor, description FROM transactions",
+        conditions, params, ("day", "id"), lambda row: (row[1], row[0]), chunk_size)
+
+def iter_report_rows(user_id, chunk_size=CHUNK_SIZE):
+    """Yield lists of monthly rollup rows (month, type, category, total, count)"""
+    yield from _iter_pages(
+        "SELECT month, type, category, total, count FROM monthly_rollups",
+        ["user_id=?"], [user_id], ("month", "type", "category"), lambda row: row[:3], chunk_size)
+
+def _transaction_record(row):
+    t_id, day, t_type, category, amount_minor, description = row
+    return [t_id, from_day(day), t_type, category, format_minor(amount_minor), description]
+
+def _report_record(row):
+    month, t_type, category, total, count = row
+    return [from_month_key(month), t_type, category, format_minor(total), count]
+
+def _source(what, user_id, start_date=None, end_date=None):
+    """Return (columns, chunk iterator, row formatter) for an export kind"""
+    if what == "transactions":
+        return TRANSACTION_COLUMNS, iter_transactions(user_id, start_date, end_date), _transaction_record
+    if what == "reports":
+        return REPORT_COLUMNS, iter_report_rows(user_id), _report_record
+    raise ValueError(f"Unknown export: {what}")
+
+def stream_csv(what, user_id, start_date=None, end_date=None):
+    """Yield CSV text, one chunk of rows at a time"""
+    columns, chunks, record = _source(what, user_id, start_date, end_date)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for rows in chunks:
+        writer.writerows(record(row) for row in rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def stream_jsonl(what, user_id, start_date=None, end_date=None):
+    """Yield JSON lines text, one chunk of rows at a time"""
+    columns, chunks, record = _source(what, user_id, start_date, end_date)
+    for rows in chunks:
+        yield "".join(json.dumps(dict(zip(columns, record(row))), ensure_ascii=False) + "\n"
+                      for row in rows)
+
+def write_parquet(what, user_id, target, start_date=None, end_date=None):
+    """Write a Parquet file (path or binary file object), one row group per chunk"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet export requires pyarrow (pip install pyarrow)")
+
+    columns, chunks, record = _source(what, user_id, start_date, end_date)
+    if what == "transactions":
+        schema = pa.schema([
+            ("id", pa.int64()), ("date", pa.string()), ("type", pa.string()),
+            ("category", pa.string()), ("amount", pa.decimal128(18, 2)),
+            ("description", pa.string()),
+        ])
+    else:
+        schema = pa.schema([
+            ("month", pa.string()), ("type", pa.string()), ("category", pa.string()),
+            ("total", pa.decimal128(18, 2)), ("count", pa.int64()),
+        ])
+    amount_column = "amount" if what == "transactions" else "total"
+
+    with pq.ParquetWriter(target, schema) as writer:
+        for rows in chunks:
+            records = [record(row) for row in rows]
+            data = {name: [r[i] for r in records] for i, name in enumerate(columns)}
+            data[amount_column] = [Decimal(value) for value in data[amount_column]]
+            writer.write_table(pa.Table.from_pydict(data, schema=schema))
+
+STREAMERS = {
+    "csv": stream_csv,
+    "jsonl": stream_jsonl,
+}
+
+CONTENT_TYPES = {
+    "csv": "text/csv",
+    "jsonl": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+def main():
+    parser = argparse.ArgumentParser(description="Export transactions or monthly totals")
+    parser.add_argument("user_id", type=int)
+    parser.add_argument("--what", choices=["transactions", "reports"], default="transactions")
+    parser.add_argument("--format", choices=sorted(CONTENT_TYPES), default="csv")
+    parser.add_argument("--start", help="first date to include (YYYY-MM-DD)")
+    parser.add_argument("--end", help="last date to include (YYYY-MM-DD)")
+    parser.add_argument("-o", "--output", help="output file (defaults to stdout for csv/jsonl)")
+    parser.add_argument("--db", help="database file (defaults to FINANCE_DB or finance.db)")
+    args = parser.parse_args()
+
+    if args.db:
+        database.configure(args.db)
+    # Keep migration messages out of data written to stdout
+    with contextlib.redirect_stdout(sys.stderr):
+        database.init_db()
+
+    if args.format == "parquet":
+        if not args.output:
+            parser.error("--output is required for parquet")
+        write_parquet(args.what, args.user_id, args.output, args.start, args.end)
+        return 0
+
+    chunks = STREAMERS[args.format](args.what, args.user_id, args.start, args.end)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8", newline="") as out:
+            out.writelines(chunks)
+    else:
+        sys.stdout.writelines(chunks)
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
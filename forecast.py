@@ -0,0 +1,206 @@
+"""
+End-of-month spending forecast per category, and budgets likely to be exceeded.
+
+The forecast only reads monthly_rollups, never individual transactions.
+For every (user, category) series:
+
+1. Expected monthly spend is the exponentially smoothed total of the
+   previous HISTORY_MONTHS months (recent months weigh most).
+2. The daily burn rate blends that history with this month's pace so
+   far, trusting the current pace more as the month goes on.
+3. Projected spend = spent so far + burn rate x days left.
+
+All series are computed together as NumPy arrays, so the nightly batch
+for every user is a single query plus a few array operations.
+
+Usage:
+    python forecast.py [--month YYYY-MM] [--as-of YYYY-MM-DD] [--db finance.db]
+"""
+import argparse
+import calendar
+import time
+from datetime import date, datetime
+import numpy as np
+import database
+from database import get_connection
+from utils import month_key, from_minor
+
+# Months of history used for the expected monthly spend, and smoothing weight
+HISTORY_MONTHS = 12
+ALPHA = 0.5
+
+# Average month length for turning a monthly total into a daily rate
+DAYS_PER_MONTH = 365.25 / 12
+
+
+def _shift_month(key, months):
+    """Move a YYYYMM key by a number of months"""
+    index = (key // 100) * 12 + key % 100 - 1 + months
+    return (index // 12) * 100 + index % 12 + 1
+
+
+def smooth(history, alpha=ALPHA):
+    """Exponentially smooth each row of a (series x months) array, oldest month first"""
+    history = np.asarray(history, dtype=np.float64)
+    if history.shape[1] == 0:
+        return np.zeros(history.shape[0])
+    level = history.mean(axis=1)
+    for column in range(history.shape[1]):
+        level = alpha * history[:, column] + (1 - alpha) * level
+    return level
+
+
+def project(spent, expected, elapsed_days, month_days):
+    """Projected end-of-month spend from spend so far and expected monthly spend"""
+    spent = np.asarray(spent, dtype=np.float64)
+    if elapsed_days >= month_days:
+        return spent
+    weight = elapsed_days / month_days
+    current_rate = spent / max(elapsed_days, 1)
+    historical_rate = np.asarray(expected, dtype=np.float64) / DAYS_PER_MONTH
+    rate = weight * current_rate + (1 - weight) * historical_rate
+    return spent + rate * (month_days - elapsed_days)
+
+
+def compute_forecasts(month=None, as_of=None, user_id=None):
+    """Forecast every (user, category) with spending history or a budget
+
+    Returns a list of (user_id, category, spent, projected, limit or None,
+    projected_exceeded) with amounts in paise, for one user or all users.
+    """
+    as_of = as_of or date.today()
+    month = month or as_of.strftime("%Y-%m")
+    key = month_key(month)
+    first_key = _shift_month(key, -HISTORY_MONTHS)
+    year, mon = key // 100, key % 100
+    month_days = calendar.monthrange(year, mon)[1]
+    if (as_of.year, as_of.month) < (year, mon):
+        elapsed_days = 0
+    elif (as_of.year, as_of.month) > (year, mon):
+        elapsed_days = month_days
+    else:
+        elapsed_days = as_of.day
+
+    user_filter = "AND user_id = ?" if user_id is not None else ""
+    user_params = (user_id,) if user_id is not None else ()
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            SELECT user_id, category, month, total
+            FROM monthly_rollups
+            WHERE type = 'expense' AND month >= ? AND month <= ? {user_filter}
+        """, (first_key, key) + user_params)
+        rollups = cursor.fetchall()
+        cursor.execute(f"""
+            SELECT user_id, category, limit_minor
+            FROM budgets
+            WHERE month = ? {user_filter}
+        """, (month,) + user_params)
+        budgets = cursor.fetchall()
+
+    series = {}
+    for user, category, _, _ in rollups:
+        series.setdefault((user, category), len(series))
+    for user, category, _ in budgets:
+        series.setdefault((user, category), len(series))
+    if not series:
+        return []
+
+    # Column HISTORY_MONTHS is the forecast month itself
+    totals = np.zeros((len(series), HISTORY_MONTHS + 1))
+    if rollups:
+        users, categories, months, amounts = zip(*rollups)
+        rows = np.array([series[(u, c)] for u, c in zip(users, categories)])
+        months = np.array(months)
+        columns = (months // 100 - first_key // 100) * 12 + months % 100 - first_key % 100
+        totals[rows, columns] = amounts
+
+    limits = np.full(len(series), np.nan)
+    for user, category, limit in budgets:
+        limits[series[(user, category)]] = limit
+
+    spent = totals[:, HISTORY_MONTHS]
+    expected = smooth(totals[:, :HISTORY_MONTHS])
+    projected = np.rint(project(spent, expected, elapsed_days, month_days))
+    exceeded = projected > np.where(np.isnan(limits), np.inf, limits)
+
+    return [(user, category, int(spent[i]), int(projected[i]),
+             None if np.isnan(limits[i]) else int(limits[i]), bool(exceeded[i]))
+            for (user, category), i in series.items()]
+
+
+def get_budget_forecast(user_id, month=None, as_of=None):
+    """Forecast for one user's categories, keyed by category, for web display"""
+    forecast = {}
+    for _, category, spent, projected, limit, exceeded in compute_forecasts(month, as_of, user_id):
+        forecast[category] = {
+            'spent': from_minor(spent),
+            'projected': from_minor(projected),
+            'limit': from_minor(limit) if limit is not None else None,
+            'projected_exceeded': exceeded,
+        }
+    return forecast
+
+
+def run_nightly(month=None, as_of=None):
+    """Forecast every user's month and store the results in budget_forecasts"""
+    as_of = as_of or date.today()
+    month = month or as_of.strftime("%Y-%m")
+    start = time.perf_counter()
+    rows = compute_forecasts(month, as_of)
+    computed_at = datetime.now().isoformat(timespec="seconds")
+
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM budget_forecasts WHERE month=?", (month,))
+        cursor.executemany("""
+            INSERT INTO budget_forecasts
+            (user_id, month, category, spent_minor, projected_minor, limit_minor,
+             projected_exceeded, computed_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, [(user, month, category, spent, projected, limit, int(exceeded), computed_at)
+              for user, category, spent, projected, limit, exceeded in rows])
+        conn.commit()
+
+    seconds = time.perf_counter() - start
+    users = len({row[0] for row in rows})
+    flagged = sum(1 for row in rows if row[5])
+    print(f"✅ Forecast {len(rows)} categories for {users} users in {seconds:.2f}s; "
+          f"{flagged} budgets projected to be exceeded")
+    return {'categories': len(rows), 'users': users, 'flagged': flagged, 'seconds': seconds}
+
+
+def get_flagged_budgets(month=None):
+    """Stored forecasts projected to exceed their budget, worst overrun first"""
+    month = month or date.today().strftime("%Y-%m")
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT user_id, category, spent_minor, projected_minor, limit_minor
+            FROM budget_forecasts
+            WHERE month=? AND projected_exceeded=1
+            ORDER BY projected_minor - limit_minor DESC
+        """, (month,))
+        rows = cursor.fetchall()
+    return [(user, category, from_minor(spent), from_minor(projected), from_minor(limit))
+            for user, category, spent, projected, limit in rows]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Forecast end-of-month spending for all users")
+    parser.add_argument("--month", help="month to forecast (YYYY-MM, default: current)")
+    parser.add_argument("--as-of", help="date the forecast is made (YYYY-MM-DD, default: today)")
+    parser.add_argument("--db", help="database file (defaults to FINANCE_DB or finance.db)")
+    args = parser.parse_args()
+
+    if args.db:
+        database.configure(args.db)
+    database.init_db()
+
+    as_of = datetime.strptime(args.as_of, "%Y-%m-%d").date() if args.as_of else None
+    run_nightly(args.month, as_of)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,254 @@
+"""
+Bulk import of bank statements from CSV or JSONL.
+
+Rows are streamed through a generator pipeline (read -> normalize -> batch)
+and inserted with executemany, one transaction per batch, so files larger
+than memory load with a handful of commits instead of one per row.
+
+Columns: date (YYYY-MM-DD), amount, and optionally type, category and
+description. Without a type column, negative amounts are expenses and
+positive amounts are income.
+
+Every imported row stores a fingerprint of (user, date, type, amount,
+normalized description), backed by a unique index, so importing an
+overlapping statement again skips the rows already present. Identical
+rows on the same day within one file are told apart by their position,
+which assumes statements list each day's rows together (banks do).
+Editing an imported transaction keeps its original fingerprint.
+
+Usage:
+    python importer.py USER_ID statement.csv [--format csv|jsonl] [--batch-size 5000]
+"""
+import argparse
+import csv
+import hashlib
+import io
+import json
+import re
+import time
+import database
+from database import get_connection
+from cashflow import deferred_cashflow
+from cache import invalidate_days
+from utils import to_minor, to_day, from_minor, from_day, day_to_date
+
+BATCH_SIZE = 5000
+
+# Rejected rows kept in the result for display; the rest are only counted
+MAX_REJECTED_SAMPLES = 20
+
+def read_csv(stream):
+    """Yield (line_number, row dict) from a CSV text stream"""
+    reader = csv.DictReader(stream)
+    for row in reader:
+        if None in row:
+            yield reader.line_num, ValueError("more values than columns")
+            continue
+        yield reader.line_num, {k.strip().lower(): v for k, v in row.items()}
+
+def read_jsonl(stream):
+    """Yield (line_number, row dict) from a JSON-lines text stream"""
+    for line_number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        if not isinstance(row, dict):
+            yield line_number, ValueError("line is not a JSON object")
+            continue
+        yield line_number, {str(k).strip().lower(): v for k, v in row.items()}
+
+READERS = {
+    "csv": read_csv,
+    "jsonl": read_jsonl,
+}
+
+def normalize_row(row):
+    """Validate a raw row and return (type, category, amount_minor, day, description)"""
+    if isinstance(row, Exception):
+        raise row
+
+    raw_date = str(row.get("date") or "").strip()
+    if not raw_date:
+        raise ValueError("missing date")
+    try:
+        day = to_day(raw_date)
+    except ValueError:
+        raise ValueError(f"invalid date {raw_date!r}")
+
+    raw_amount = str(row.get("amount") or "").strip().replace(",", "")
+    if not raw_amount:
+        raise ValueError("missing amount")
+    try:
+        # Also refuses amounts too large to store, which would fail the whole batch
+        amount_minor = to_minor(raw_amount)
+    except ValueError:
+        raise ValueError(f"invalid amount {raw_amount!r}")
+
+    t_type = str(row.get("type") or "").strip().lower()
+    if not t_type:
+        t_type = "expense" if amount_minor < 0 else "income"
+    if t_type not in ("income", "expense"):
+        raise ValueError(f"invalid type {t_type!r}")
+
+    category = str(row.get("category") or "").strip() or "Uncategorized"
+    description = str(row.get("description") or "").strip()
+    return t_type, category, abs(amount_minor), day, description
+
+def normalize_description(description):
+    """Lowercase and collapse punctuation/whitespace for duplicate matching"""
+    return " ".join(re.sub(r"[^\w]+", " ", (description or "").lower()).split())
+
+def fingerprint(user_id, t_type, amount_minor, day, description, occurrence=0):
+    """16-byte content hash identifying an imported transaction"""
+    content = f"{user_id}|{day}|{t_type}|{amount_minor}|{normalize_description(description)}|{occurrence}"
+    return hashlib.blake2b(content.encode(), digest_size=16).digest()
+
+def fingerprinted(user_id, rows):
+    """Append a fingerprint to each normalized row"""
+    current_day = None
+    seen = {}
+    for t_type, category, amount_minor, day, description in rows:
+        if day != current_day:
+            current_day = day
+            seen = {}
+        key = (t_type, amount_minor, normalize_description(description))
+        occurrence = seen.get(key, 0)
+        seen[key] = occurrence + 1
+        yield (user_id, t_type, category, amount_minor, day, description,
+               fingerprint(user_id, t_type, amount_minor, day, description, occurrence))
+
+def batched(items, size):
+    """Yield lists of up to size items"""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def import_transactions(user_id, stream, fmt="csv", batch_size=BATCH_SIZE):
+    """Import transactions for a user from a text stream and return statistics"""
+    if fmt not in READERS:
+        raise ValueError(f"Unsupported import format: {fmt}")
+
+    result = {
+        'imported': 0,
+        'duplicates': 0,
+        'rejected': 0,
+        'rejected_rows': [],
+        'batches': 0,
+    }
+
+    def valid_rows():
+        for line_number, row in READERS[fmt](stream):
+            try:
+                yield normalize_row(row)
+            except ValueError as e:
+                result['rejected'] += 1
+                if len(result['rejected_rows']) < MAX_REJECTED_SAMPLES:
+                    result['rejected_rows'].append((line_number, str(e)))
+
+    start = time.perf_counter()
+    for batch in batched(fingerprinted(user_id, valid_rows()), batch_size):
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            # Statements are often newest-first; recompute the balance
+            # timeline once per batch instead of once per row
+            with deferred_cashflow(cursor, user_id) as days:
+                cursor.executemany("""
+                    INSERT INTO transactions
+                    (user_id, type, category, amount_minor, day, description, fingerprint)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (user_id, fingerprint) WHERE fingerprint IS NOT NULL DO NOTHING
+                """, batch)
+                inserted = cursor.rowcount
+                days.append(min(row[4] for row in batch))
+        # One day per month is enough to drop that month's and year's reports
+        invalidate_days(user_id, *{row[4] // 100 * 100 + 1 for row in batch})
+        result['imported'] += inserted
+        result['duplicates'] += len(batch) - inserted
+        result['batches'] += 1
+
+    seconds = time.perf_counter() - start
+    result['seconds'] = seconds
+    processed = result['imported'] + result['duplicates']
+    result['rows_per_sec'] = processed / seconds if seconds > 0 else 0.0
+    return result
+
+def find_likely_duplicates(user_id, window_days=3):
+    """Group transactions with the same type, amount and description within a few days
+
+    One pass over the user's history in date order; each group is a list of
+    (id, type, category, amount, date, description) tuples, oldest first.
+    """
+    groups = []
+    open_groups = {}
+
+    with get_connection() as conn:
+        cursor = conn.execute("""
+            SELECT id, type, category, amount_minor, day, description
+            FROM transactions
+            WHERE user_id=?
+            ORDER BY day, id
+        """, (user_id,))
+        for t_id, t_type, category, amount_minor, day, description in cursor:
+            ordinal = day_to_date(day).toordinal()
+            key = (t_type, amount_minor, normalize_description(description))
+            row = (t_id, t_type, category, from_minor(amount_minor), from_day(day), description)
+
+            group = open_groups.get(key)
+            if group and ordinal - group[0] <= window_days:
+                group[0] = ordinal
+                group[1].append(row)
+                continue
+            if group and len(group[1]) > 1:
+                groups.append(group[1])
+            open_groups[key] = [ordinal, [row]]
+
+    groups.extend(rows for _, rows in open_groups.values() if len(rows) > 1)
+    groups.sort(key=lambda rows: (rows[0][4], rows[0][0]))
+    return groups
+
+def guess_format(filename):
+    """Pick the import format from a file name"""
+    name = (filename or "").lower()
+    if name.endswith((".jsonl", ".ndjson", ".json")):
+        return "jsonl"
+    return "csv"
+
+def open_text(binary_stream):
+    """Wrap an uploaded binary stream for line-by-line text reading"""
+    return io.TextIOWrapper(binary_stream, encoding="utf-8-sig", newline="")
+
+def main():
+    parser = argparse.ArgumentParser(description="Import transactions from CSV or JSONL")
+    parser.add_argument("user_id", type=int)
+    parser.add_argument("file")
+    parser.add_argument("--format", choices=sorted(READERS), help="defaults to the file extension")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--db", help="database file (defaults to FINANCE_DB or finance.db)")
+    args = parser.parse_args()
+
+    if args.db:
+        database.configure(args.db)
+    database.init_db()
+
+    fmt = args.format or guess_format(args.file)
+    with open(args.file, encoding="utf-8-sig", newline="") as stream:
+        result = import_transactions(args.user_id, stream, fmt, args.batch_size)
+
+    for line_number, error in result['rejected_rows']:
+        print(f"line {line_number}: {error}")
+    print(f"✅ Imported {result['imported']} rows in {result['batches']} batches "
+          f"({result['rows_per_sec']:.0f} rows/sec), skipped {result['duplicates']} duplicates, "
+          f"rejected {result['rejected']}")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,18 +1,73 @@
 # Personal Finance Management Application
 # Simple version for beginners
 
-from flask import Flask, render_template, request, redirect, session
+from flask import Flask, Blueprint, render_template, request, redirect, session, jsonify, Response, stream_with_context, make_response
+from werkzeug.http import is_resource_modified
+import os
 import sqlite3
+import tempfile
+import time
+from urllib.parse import urlencode
 import hashlib
 import re
-from datetime import date
+from datetime import date, datetime, timezone
+import database
+from database import get_connection, get_pool_stats, migrate
+from transactions import (add_transaction, delete_transaction, update_transaction,
+                          get_transaction_by_id, get_user_transactions, get_user_summary)
+from reports import get_monthly_report_data, get_yearly_report_data
+from budget import set_budget, get_budget_status
+from cashflow import get_recent_cashflow, get_month_cashflow
+from forecast import get_budget_forecast
+from cache import cached, get_cache_stats, get_data_version
+from search import search_transactions
+from importer import import_transactions, guess_format, open_text, find_likely_duplicates
+from utils import to_day, to_minor
+import export
+import analytics
+import writer
+import api
+import metrics
 
-app = Flask(__name__)
-app.secret_key = "secret123"
+# The web pages; create_app() puts them together with the API
+bp = Blueprint("web", __name__)
 
-# Create database tables
+# Session key of the development server only; anyone can sign cookies with it
+DEV_SECRET_KEY = "secret123"
+
+def create_app(db_path=None, debug=False):
+    """Build the Flask app, with its tables created and migrated
+
+    Each server process calls this once (see wsgi.py); the migrations run
+    under a file lock, so workers starting together apply them only once.
+    Sessions are signed with FINANCE_SECRET_KEY, which must be set unless
+    debug is on (debug=True, or flask run --debug).
+    """
+    secret_key = os.environ.get("FINANCE_SECRET_KEY")
+    if not secret_key:
+        if not (debug or os.environ.get("FLASK_DEBUG") == "1"):
+            raise RuntimeError("FINANCE_SECRET_KEY is not set; set it to a long random value "
+                               "shared by every worker")
+        secret_key = DEV_SECRET_KEY
+    if db_path:
+        database.configure(db_path)
+    app = Flask(__name__)
+    # Every worker must sign sessions with the same key
+    app.secret_key = secret_key
+    app.register_blueprint(bp)
+    # JSON API for the mobile client and scripts
+    app.register_blueprint(api.bp)
+    # Request and query metrics at /metrics when FINANCE_METRICS=1
+    metrics.init_app(app)
+    create_tables()
+    return app
+
+# Create database tables, one process at a time
 def create_tables():
-    conn = sqlite3.connect("finance.db")
+    with database.schema_lock(), get_connection() as conn:
+        _create_tables(conn)
+
+def _create_tables(conn):
     cursor = conn.cursor()
     
     # Check if users table exists
@@ -27,6 +82,9 @@ def create_tables():
         # If table has 'username' but not 'email', migrate it
         if 'username' in columns and 'email' not in columns:
             try:
+                # All of it or none of it: a crash halfway must not lose the users
+                conn.commit()
+                cursor.execute("BEGIN")
                 # Create new table with email column
                 cursor.execute("""
                     CREATE TABLE users_new (
@@ -80,22 +138,29 @@ def create_tables():
     """)
     
     conn.commit()
-    conn.close()
+    
+    # Apply indexes and other schema migrations
+    migrate(conn)
 
 # Password hashing
 def hash_password(password):
     return hashlib.sha256(password.encode()).hexdigest()
 
-# Initialize database
-create_tables()
-
 # Email validation
 def is_valid_email(email):
     pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
     return re.match(pattern, email) is not None
 
+# Amount validation, before a write is queued
+def is_valid_amount(amount):
+    try:
+        to_minor(amount)
+    except ValueError:
+        return False
+    return True
+
 # Home page - Login
-@app.route("/", methods=["GET", "POST"])
+@bp.route("/", methods=["GET", "POST"])
 def login():
     error = None
     success = None
@@ -117,12 +182,10 @@ def login():
             error = "Please enter your password"
         else:
             # Check if email exists
-            conn = sqlite3.connect("finance.db")
-            cursor = conn.cursor()
-            
-            # First check if email exists
-            cursor.execute("SELECT id, password FROM users WHERE email=?", (email,))
-            user = cursor.fetchone()
+            with get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT id, password FROM users WHERE email=?", (email,))
+                user = cursor.fetchone()
             
             if not user:
                 error = "Email address not found. Please register first."
@@ -130,17 +193,14 @@ def login():
                 # Check password
                 if user[1] == hash_password(password):
                     session["user_id"] = user[0]
-                    conn.close()
                     return redirect("/dashboard")
                 else:
                     error = "Incorrect password. Please try again."
-            
-            conn.close()
     
     return render_template("login.html", error=error, success=success)
 
 # Forgot Password page
-@app.route("/forgot_password", methods=["GET", "POST"])
+@bp.route("/forgot_password", methods=["GET", "POST"])
 def forgot_password():
     error = None
     success = None
@@ -155,14 +215,13 @@ def forgot_password():
             error = "Please enter a valid email address"
         else:
             # Check if email exists
-            conn = sqlite3.connect("finance.db")
-            cursor = conn.cursor()
-            cursor.execute("SELECT id FROM users WHERE email=?", (email,))
-            user = cursor.fetchone()
+            with get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT id FROM users WHERE email=?", (email,))
+                user = cursor.fetchone()
             
             if not user:
                 error = "Email address not found in our system"
-                conn.close()
             else:
                 # Check if this is password reset request
                 if "new_password" in request.form:
@@ -177,17 +236,15 @@ def forgot_password():
                         error = "Passwords do not match"
                     else:
                         # Update password
-                        cursor.execute(
-                            "UPDATE users SET password=? WHERE email=?",
-                            (hash_password(new_password), email)
-                        )
-                        conn.commit()
-                        conn.close()
+                        with get_connection() as conn:
+                            conn.execute(
+                                "UPDATE users SET password=? WHERE email=?",
+                                (hash_password(new_password), email)
+                            )
                         success = "Password reset successfully! You can now login with your new password."
                         email = None  # Clear email after successful reset
                 else:
                     # Email exists, show reset form
-                    conn.close()
                     return render_template("forgot_password.html", 
                                          error=error, 
                                          success=success, 
@@ -201,7 +258,7 @@ def forgot_password():
                          show_reset_form=False)
 
 # Register page
-@app.route("/register", methods=["GET", "POST"])
+@bp.route("/register", methods=["GET", "POST"])
 def register():
     error = None
     if request.method == "POST":
@@ -224,80 +281,157 @@ def register():
             error = "Passwords do not match. Please try again."
         else:
             # Check if email already exists
-            conn = sqlite3.connect("finance.db")
-            cursor = conn.cursor()
-            
-            cursor.execute("SELECT id FROM users WHERE email=?", (email,))
-            existing_user = cursor.fetchone()
+            with get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT id FROM users WHERE email=?", (email,))
+                existing_user = cursor.fetchone()
             
             if existing_user:
                 error = "This email address is already registered. Please login instead."
-                conn.close()
             else:
                 # Create new account
                 try:
-                    cursor.execute(
-                        "INSERT INTO users (email, password) VALUES (?, ?)",
-                        (email, hash_password(password))
-                    )
-                    conn.commit()
-                    conn.close()
+                    with get_connection() as conn:
+                        conn.execute(
+                            "INSERT INTO users (email, password) VALUES (?, ?)",
+                            (email, hash_password(password))
+                        )
                     # Redirect to login with success message
                     return redirect("/?registered=1")
                 except Exception as e:
                     error = "Registration failed. Please try again."
-                    conn.close()
     
     return render_template("register.html", error=error)
 
+# Latest change to this file or a template; pages rendered by older code are not reused
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates")
+BUILD_TIME = max(os.path.getmtime(path) for path in
+                 [__file__] + [os.path.join(TEMPLATE_DIR, name) for name in os.listdir(TEMPLATE_DIR)])
+
+def render_conditional(user_id, render):
+    """Render a user's page, or answer 304 if the browser's copy is still current
+
+    The ETag covers the user's data version, the URL, today's date (pages
+    default to the current month) and the build, so a revalidation costs one
+    primary-key lookup instead of the page's queries and template. render()
+    must not return data older than that version; cached() ensures it
+    for its memory entries and for the rows it writes to the shared table.
+    """
+    version, updated_at = get_data_version(user_id)
+    today = date.today()
+    etag = hashlib.sha1(f"{user_id}:{version}:{updated_at}:{request.full_path}:"
+                        f"{today}:{BUILD_TIME}".encode()).hexdigest()
+    midnight = datetime.combine(today, datetime.min.time()).timestamp()
+    changed = max(updated_at or 0, midnight, BUILD_TIME)
+    # HTTP dates have whole seconds; a second that is not over yet may still change
+    last_modified = None
+    if time.time() - changed >= 1:
+        last_modified = datetime.fromtimestamp(int(changed) + 1, timezone.utc)
+    
+    if is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        response = make_response(render())
+    else:
+        response = Response(status=304)
+    response.set_etag(etag, weak=True)
+    if last_modified:
+        response.last_modified = last_modified
+    # Browsers must revalidate before showing a stored copy
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
+
+def parse_period(value, fmt="%Y-%m"):
+    """A month 'YYYY-MM' (or a year with fmt '%Y'), zero-padded, or None if value is not one"""
+    try:
+        return datetime.strptime(value, fmt).strftime(fmt)
+    except (ValueError, TypeError):
+        return None
+
 # Dashboard
-@app.route("/dashboard")
+@bp.route("/dashboard")
 def dashboard():
     if "user_id" not in session:
         return redirect("/")
     
     user_id = session["user_id"]
-    conn = sqlite3.connect("finance.db")
-    cursor = conn.cursor()
     
-    # Get current month summary
-    current_month = date.today().strftime("%Y-%m")
-    cursor.execute("""
-        SELECT type, SUM(amount) FROM transactions
-        WHERE user_id=? AND date LIKE ?
-        GROUP BY type
-    """, (user_id, f"{current_month}%"))
-    
-    results = cursor.fetchall()
-    income = 0
-    expense = 0
-    for row in results:
-        if row[0] == "income":
-            income = row[1] or 0
-        elif row[0] == "expense":
-            expense = row[1] or 0
-    
-    savings = income - expense
-    
-    # Get recent transactions
-    cursor.execute("""
-        SELECT id, type, category, amount, date, description
-        FROM transactions
-        WHERE user_id=?
-        ORDER BY date DESC
-        LIMIT 10
-    """, (user_id,))
-    transactions = cursor.fetchall()
-    conn.close()
-    
-    return render_template("dashboard.html", 
-                         income=income, 
-                         expense=expense, 
-                         savings=savings,
-                         transactions=transactions)
+    def render():
+        # Get current month summary
+        summary = get_user_summary(user_id)
+        
+        # Get recent transactions
+        transactions = get_user_transactions(user_id, limit=10)
+        
+        # Running balance and the latest days of cash flow
+        cashflow = get_recent_cashflow(user_id, days=14)
+        
+        return render_template("dashboard.html", 
+                             income=summary["income"], 
+                             expense=summary["expense"], 
+                             savings=summary["savings"],
+                             balance=cashflow[0][4] if cashflow else 0.0,
+                             cashflow=cashflow,
+                             transactions=transactions)
+    
+    return render_conditional(user_id, render)
+
+# Transaction list filters and page size taken from the query string
+# All transactions, one page at a time
+@bp.route("/transactions")
+def transactions_list():
+    if "user_id" not in session:
+        return redirect("/")
+    
+    filters, page_size, cursor = api.page_args()
+    try:
+        transactions, next_cursor = api.fetch_page(session["user_id"], filters, page_size, cursor)
+    except ValueError:
+        return redirect("/transactions")
+    
+    query = {key: value for key, value in filters.items() if value}
+    if page_size != 50:
+        query["page_size"] = page_size
+    next_page_query = urlencode({**query, "cursor": next_cursor}) if next_cursor else None
+    
+    return render_template("transactions.html",
+                         transactions=transactions,
+                         filters=filters,
+                         cursor=cursor,
+                         first_page_query=urlencode(query),
+                         next_page_query=next_page_query)
+
+# Transactions as JSON: moved to the versioned API, same parameters and response
+@bp.route("/api/transactions")
+def api_transactions():
+    query = request.query_string.decode()
+    return redirect("/api/v1/transactions" + (f"?{query}" if query else ""), 308)
+
+# Full-text search over descriptions and categories
+@bp.route("/search")
+def search():
+    if "user_id" not in session:
+        return redirect("/")
+    
+    filters = {key: request.args.get(key) or None for key in ("q", "type", "start", "end")}
+    min_amount = request.args.get("min") or None
+    max_amount = request.args.get("max") or None
+    order = request.args.get("order", "rank")
+    
+    error = None
+    results = []
+    if filters["q"]:
+        try:
+            results = search_transactions(session["user_id"], filters["q"], filters["type"],
+                                          min_amount, max_amount, filters["start"], filters["end"],
+                                          order)
+        except ValueError:
+            error = "Please check the amounts, dates and sort order"
+    
+    return render_template("search.html", results=results, filters=filters, order=order,
+                           min_amount=min_amount, max_amount=max_amount,
+                           error=error), 400 if error else 200
 
 # Add transaction
-@app.route("/add", methods=["GET", "POST"])
+@bp.route("/add", methods=["GET", "POST"])
 def add():
     if "user_id" not in session:
         return redirect("/")
@@ -306,51 +440,47 @@ def add():
         user_id = session["user_id"]
         t_type = request.form["type"]
         category = request.form["category"]
-        amount = float(request.form["amount"])
+        amount = request.form["amount"]
         description = request.form.get("description", "")
+        if not is_valid_amount(amount):
+            return "Invalid amount", 400
         
-        conn = sqlite3.connect("finance.db")
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO transactions (user_id, type, category, amount, date, description)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, (user_id, t_type, category, amount, str(date.today()), description))
-        conn.commit()
-        conn.close()
+        if writer.WRITE_MODE == "direct":
+            add_transaction(user_id, t_type, category, amount, description)
+        else:
+            future = writer.submit_add(user_id, t_type, category, amount, description)
+            # In async mode the redirect does not wait for the commit
+            if writer.WRITE_MODE == "group":
+                future.result()
         
         return redirect("/dashboard")
     
     return render_template("add_transaction.html")
 
 # Edit transaction
-@app.route("/edit/<int:transaction_id>", methods=["GET", "POST"])
+@bp.route("/edit/<int:transaction_id>", methods=["GET", "POST"])
 def edit(transaction_id):
     if "user_id" not in session:
         return redirect("/")
     
     user_id = session["user_id"]
-    conn = sqlite3.connect("finance.db")
-    cursor = conn.cursor()
     
     if request.method == "POST":
-        cursor.execute("""
-            UPDATE transactions
-            SET type=?, category=?, amount=?, description=?
-            WHERE id=? AND user_id=?
-        """, (request.form["type"], request.form["category"], 
-              float(request.form["amount"]), request.form.get("description", ""),
-              transaction_id, user_id))
-        conn.commit()
-        conn.close()
+        if not is_valid_amount(request.form["amount"]):
+            return "Invalid amount", 400
+        if writer.WRITE_MODE == "direct":
+            update_transaction(transaction_id, user_id,
+                               request.form["type"], request.form["category"],
+                               request.form["amount"], request.form.get("description", ""))
+        else:
+            future = writer.submit_update(transaction_id, user_id,
+                                          request.form["type"], request.form["category"],
+                                          request.form["amount"], request.form.get("description", ""))
+            if writer.WRITE_MODE == "group":
+                future.result()
         return redirect("/dashboard")
     
-    cursor.execute("""
-        SELECT id, type, category, amount, date, description
-        FROM transactions
-        WHERE id=? AND user_id=?
-    """, (transaction_id, user_id))
-    transaction = cursor.fetchone()
-    conn.close()
+    transaction = get_transaction_by_id(transaction_id, user_id)
     
     if not transaction:
         return redirect("/dashboard")
@@ -358,165 +488,262 @@ def edit(transaction_id):
     return render_template("edit_transaction.html", transaction=transaction)
 
 # Delete transaction
-@app.route("/delete/<int:transaction_id>")
+@bp.route("/delete/<int:transaction_id>")
 def delete(transaction_id):
     if "user_id" not in session:
         return redirect("/")
     
     user_id = session["user_id"]
-    conn = sqlite3.connect("finance.db")
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM transactions WHERE id=? AND user_id=?", 
-                  (transaction_id, user_id))
-    conn.commit()
-    conn.close()
+    delete_transaction(transaction_id, user_id)
     
     return redirect("/dashboard")
 
 # Reports
-@app.route("/reports")
+@bp.route("/reports")
 def reports():
     if "user_id" not in session:
         return redirect("/")
     
     user_id = session["user_id"]
-    month = request.args.get("month", date.today().strftime("%Y-%m"))
-    year = request.args.get("year", date.today().strftime("%Y"))
+    month = parse_period(request.args.get("month", date.today().strftime("%Y-%m")))
+    year = parse_period(request.args.get("year", date.today().strftime("%Y")), "%Y")
+    if month is None or year is None:
+        return "Invalid month or year", 400
+    
+    def render():
+        # Monthly report (cached, or precomputed by the nightly batch)
+        monthly = cached("monthly", user_id, month, get_monthly_report_data)
+        
+        # Daily cash flow for the month
+        cashflow = get_month_cashflow(user_id, month)
+        
+        # Yearly report
+        yearly = cached("yearly", user_id, year, get_yearly_report_data)
+        
+        return render_template("reports.html",
+                             month=month,
+                             year=year,
+                             monthly_income=monthly["income"],
+                             monthly_expense=monthly["expense"],
+                             monthly_savings=monthly["savings"],
+                             cashflow=cashflow,
+                             yearly_income=yearly["income"],
+                             yearly_expense=yearly["expense"],
+                             yearly_savings=yearly["savings"])
+    
+    return render_conditional(user_id, render)
+
+def get_analytics_args():
+    """Date range and rolling window from the query string"""
+    start = request.args.get("start") or None
+    end = request.args.get("end") or None
+    window = request.args.get("window", type=int) or analytics.ROLLING_WINDOW
+    return start, end, max(1, min(window, 365))
+
+# Analytics over the whole history (or a date range)
+@bp.route("/reports/analytics")
+def analytics_report():
+    if "user_id" not in session:
+        return redirect("/")
     
-    conn = sqlite3.connect("finance.db")
-    cursor = conn.cursor()
+    start, end, window = get_analytics_args()
+    try:
+        data = analytics.get_analytics(session["user_id"], start, end, window)
+    except ValueError:
+        return "Invalid date", 400
     
-    # Monthly report
-    cursor.execute("""
-        SELECT type, SUM(amount) FROM transactions
-        WHERE user_id=? AND date LIKE ?
-        GROUP BY type
-    """, (user_id, f"{month}%"))
-    
-    monthly_results = cursor.fetchall()
-    monthly_income = 0
-    monthly_expense = 0
-    for row in monthly_results:
-        if row[0] == "income":
-            monthly_income = row[1] or 0
-        elif row[0] == "expense":
-            monthly_expense = row[1] or 0
-    
-    # Yearly report
-    cursor.execute("""
-        SELECT type, SUM(amount) FROM transactions
-        WHERE user_id=? AND date LIKE ?
-        GROUP BY type
-    """, (user_id, f"{year}%"))
-    
-    yearly_results = cursor.fetchall()
-    yearly_income = 0
-    yearly_expense = 0
-    for row in yearly_results:
-        if row[0] == "income":
-            yearly_income = row[1] or 0
-        elif row[0] == "expense":
-            yearly_expense = row[1] or 0
-    
-    conn.close()
-    
-    return render_template("reports.html",
-                         month=month,
-                         year=year,
-                         monthly_income=monthly_income,
-                         monthly_expense=monthly_expense,
-                         monthly_savings=monthly_income - monthly_expense,
-                         yearly_income=yearly_income,
-                         yearly_expense=yearly_expense,
-                         yearly_savings=yearly_income - yearly_expense)
+    # Show the latest days first
+    recent = range(len(data["dates"]) - 1, max(len(data["dates"]) - 32, -1), -1)
+    return render_template("analytics.html", data=data, recent=recent,
+                           start=start or "", end=end or "")
+
+@bp.route("/reports/analytics.json")
+def analytics_json():
+    if "user_id" not in session:
+        return jsonify({"error": "login required"}), 401
+    
+    start, end, window = get_analytics_args()
+    try:
+        return jsonify(analytics.get_analytics(session["user_id"], start, end, window))
+    except ValueError:
+        return jsonify({"error": "invalid date"}), 400
 
 # Budget
-@app.route("/budget", methods=["GET", "POST"])
+@bp.route("/budget", methods=["GET", "POST"])
 def budget():
     if "user_id" not in session:
         return redirect("/")
     
     user_id = session["user_id"]
-    month = request.args.get("month", date.today().strftime("%Y-%m"))
-    
-    conn = sqlite3.connect("finance.db")
-    cursor = conn.cursor()
+    month = parse_period(request.args.get("month", date.today().strftime("%Y-%m")))
     
     if request.method == "POST":
         category = request.form["category"]
-        limit = float(request.form["limit"])
-        month = request.form["month"]
+        limit = request.form["limit"]
+        month = parse_period(request.form["month"])
+        if month is None:
+            return "Invalid month", 400
+        if not is_valid_amount(limit):
+            return "Invalid limit", 400
         
-        # Check if budget exists
-        cursor.execute("""
-            SELECT id FROM budgets
-            WHERE user_id=? AND category=? AND month=?
-        """, (user_id, category, month))
+        set_budget(user_id, category, limit, month)
         
-        if cursor.fetchone():
-            cursor.execute("""
-                UPDATE budgets SET monthly_limit=?
-                WHERE user_id=? AND category=? AND month=?
-            """, (limit, user_id, category, month))
-        else:
-            cursor.execute("""
-                INSERT INTO budgets (user_id, category, monthly_limit, month)
-                VALUES (?, ?, ?, ?)
-            """, (user_id, category, limit, month))
-        
-        conn.commit()
-        conn.close()
         return redirect(f"/budget?month={month}")
     
-    # Get budgets for the month
-    cursor.execute("""
-        SELECT category, monthly_limit FROM budgets
-        WHERE user_id=? AND month=?
-    """, (user_id, month))
-    budgets = cursor.fetchall()
+    if month is None:
+        return "Invalid month", 400
     
     # Get budget status
-    budget_list = []
-    for category, limit in budgets:
-        cursor.execute("""
-            SELECT COALESCE(SUM(amount), 0) FROM transactions
-            WHERE user_id=? AND category=? AND type='expense' AND date LIKE ?
-        """, (user_id, category, f"{month}%"))
-        spent = cursor.fetchone()[0] or 0
-        budget_list.append({
-            "category": category,
-            "limit": limit,
-            "spent": spent,
-            "remaining": limit - spent
-        })
-    
-    conn.close()
-    
-    return render_template("budget.html", budgets=budget_list, month=month)
+    budget_list = cached("budget", user_id, month, get_budget_status)
+    
+    # End-of-month projection per category
+    forecast = get_budget_forecast(user_id, month)
+    
+    return render_template("budget.html", budgets=budget_list, month=month, forecast=forecast)
+
+# Bulk import of bank statements
+@bp.route("/import", methods=["GET", "POST"])
+def import_statement():
+    if "user_id" not in session:
+        return redirect("/")
+    
+    error = None
+    result = None
+    if request.method == "POST":
+        upload = request.files.get("file")
+        if not upload or not upload.filename:
+            error = "Please choose a CSV or JSONL file"
+        else:
+            try:
+                result = import_transactions(session["user_id"], open_text(upload.stream),
+                                             guess_format(upload.filename))
+            except UnicodeDecodeError:
+                error = "The file must be UTF-8 encoded text"
+    
+    return render_template("import.html", error=error, result=result)
+
+# Likely duplicate transactions
+@bp.route("/duplicates")
+def duplicates():
+    if "user_id" not in session:
+        return redirect("/")
+    
+    window_days = min(max(request.args.get("days", 3, type=int), 0), 31)
+    groups = find_likely_duplicates(session["user_id"], window_days)
+    
+    return render_template("duplicates.html", groups=groups, days=window_days)
+
+# Streaming export of transactions or monthly report totals
+@bp.route("/export/<what>.<fmt>")
+def export_data(what, fmt):
+    if "user_id" not in session:
+        return redirect("/")
+    if what not in ("transactions", "reports") or fmt not in export.CONTENT_TYPES:
+        return "Unknown export", 404
+    
+    user_id = session["user_id"]
+    start = request.args.get("start") or None
+    end = request.args.get("end") or None
+    # Checked before streaming: once the headers are sent an error cannot become a 400
+    try:
+        for value in (start, end):
+            if value:
+                to_day(value)
+    except ValueError:
+        return "Invalid date", 400
+    headers = {"Content-Disposition": f"attachment; filename={what}.{fmt}"}
+    
+    if fmt == "parquet":
+        # Parquet writes its footer last, so spool to disk before sending
+        spool = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+        try:
+            export.write_parquet(what, user_id, spool, start, end)
+        except RuntimeError as e:
+            spool.close()
+            return str(e), 501
+        spool.seek(0)
+        
+        def read_spool():
+            with spool:
+                while True:
+                    chunk = spool.read(64 * 1024)
+                    if not chunk:
+                        break
+                    yield chunk
+        
+        return Response(read_spool(), mimetype=export.CONTENT_TYPES[fmt], headers=headers)
+    
+    chunks = export.STREAMERS[fmt](what, user_id, start, end)
+    return Response(stream_with_context(chunks), mimetype=export.CONTENT_TYPES[fmt], headers=headers)
 
 # Backup
-@app.route("/backup", methods=["GET", "POST"])
+@bp.route("/backup", methods=["GET", "POST"])
 def backup():
     if "user_id" not in session:
         return redirect("/")
     
+    import backup as backups
+    
     message = None
     if request.method == "POST":
-        import shutil
         if request.form["action"] == "backup":
-            shutil.copy("finance.db", "finance_backup.db")
-            message = "Backup created!"
+            if backups.start_backup():
+                message = "Backup started!"
+            else:
+                message = "A backup is already running."
         elif request.form["action"] == "restore":
-            shutil.copy("finance_backup.db", "finance.db")
-            message = "Backup restored!"
+            # Only files listed in the backup directory may be restored
+            known = [path for path, _, _ in backups.list_backups()]
+            path = request.form.get("path") or (known[0] if known else None)
+            if path not in known:
+                message = "Backup not found."
+            elif backups.restore_db(path):
+                message = "Backup restored!"
+            else:
+                message = "Restore failed: the backup did not pass the integrity check."
     
-    return render_template("backup.html", message=message)
+    return render_template("backup.html", message=message,
+                           status=backups.get_backup_status(),
+                           backups=backups.list_backups())
+
+# Progress of the background backup
+@bp.route("/backup/status")
+def backup_status():
+    if "user_id" not in session:
+        return jsonify({"error": "login required"}), 401
+    
+    from backup import get_backup_status
+    return jsonify(get_backup_status())
+
+# Connection pool statistics for monitoring
+@bp.route("/pool_stats")
+def pool_stats():
+    return jsonify(get_pool_stats())
+
+# Group-commit writer statistics for monitoring
+@bp.route("/writer_stats")
+def writer_stats():
+    return jsonify(writer.get_writer_stats())
+
+# Report cache statistics
+@bp.route("/cache_stats")
+def cache_stats():
+    return jsonify(get_cache_stats())
+
+# The database stayed locked past its busy timeout, or no pooled connection
+# came free in time: the instance is saturated, not broken, so answer 503
+@bp.app_errorhandler(sqlite3.OperationalError)
+@bp.app_errorhandler(TimeoutError)
+def database_busy(error):
+    if isinstance(error, sqlite3.OperationalError) and "locked" not in str(error):
+        raise error
+    return "Server busy, please try again", 503, {"Retry-After": "1"}
 
 # Logout
-@app.route("/logout")
+@bp.route("/logout")
 def logout():
     session.clear()
     return redirect("/")
 
 if __name__ == "__main__":
-    app.run(debug=True)
+    create_app(debug=True).run(debug=True)
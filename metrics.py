@@ -0,0 +1,336 @@
+"""
+Request and query metrics, exposed in the Prometheus text format.
+
+Off unless FINANCE_METRICS=1. When off, init_app() registers nothing and
+pooled connections stay plain sqlite3 connections, so there is no cost.
+When on:
+
+- Every request's latency is recorded per route (a histogram), with
+  request counts by status and the number and time of its queries.
+- Pooled connections are opened as TracingConnection. Their cursors
+  record each statement under a fingerprint (the SQL with literals
+  replaced by ? and whitespace collapsed): executions, total time
+  including fetching, and rows returned (or changed, for writes).
+- A statement taking longer than FINANCE_SLOW_QUERY_MS (default 100)
+  is printed and kept in a list of recent slow queries.
+
+GET /metrics serves everything for a Prometheus scraper, and
+/slow_queries lists the recent slow queries as JSON.
+
+A request's latency is measured until its response is returned, so for
+streamed responses (exports) it does not include sending the body.
+"""
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from flask import Response, g, jsonify, request
+import database
+
+ENABLED = os.environ.get("FINANCE_METRICS", "0") == "1"
+
+# Statements slower than this (milliseconds) are logged
+SLOW_QUERY_MS = float(os.environ.get("FINANCE_SLOW_QUERY_MS", "100"))
+
+# Recent slow queries kept for /slow_queries
+SLOW_QUERY_LOG_SIZE = 100
+
+# Upper bounds (seconds) of the request latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+_lock = threading.Lock()
+_queries = {}       # fingerprint -> [count, seconds, rows, max seconds]
+_requests = {}      # (route, method) -> [bucket counts..., seconds, count]
+_statuses = {}      # (route, method, status) -> count
+_request_db = {}    # route -> [queries, seconds]
+_slow = deque(maxlen=SLOW_QUERY_LOG_SIZE)
+
+# Queries and query time of the request being handled on this thread
+_current = threading.local()
+
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_VALUE_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE = re.compile(r"\s+")
+_fingerprints = {}
+
+
+def fingerprint(sql):
+    """The statement with literals as ? and lists of values as (...), on one line"""
+    result = _fingerprints.get(sql)
+    if result is None:
+        result = _SPACE.sub(" ", _VALUE_LIST.sub("(...)", _LITERAL.sub("?", sql))).strip()
+        if len(_fingerprints) > 2000:
+            _fingerprints.clear()
+        _fingerprints[sql] = result
+    return result
+
+
+def record_query(sql, seconds, rows):
+    """Add one execution of a statement (including fetching its rows) to its totals"""
+    key = fingerprint(sql)
+    with _lock:
+        stats = _queries.get(key)
+        if stats is None:
+            stats = _queries[key] = [0, 0.0, 0, 0.0]
+        stats[0] += 1
+        stats[1] += seconds
+        stats[2] += rows
+        stats[3] = max(stats[3], seconds)
+    if seconds * 1000 >= SLOW_QUERY_MS:
+        log_slow_query(sql, seconds, rows)
+    if getattr(_current, "active", False):
+        _current.queries += 1
+        _current.seconds += seconds
+
+
+class TracingCursor(sqlite3.Cursor):
+    """Cursor that times its statements and counts the rows they return
+
+    Time and rows add up on the cursor while a statement runs and are
+    recorded once it is done: fully fetched, replaced by the next
+    statement, or the cursor closed or dropped.
+    """
+
+    _sql = None
+    _elapsed = 0.0
+    _rows = 0
+
+    def _begin(self, sql):
+        self._finish()
+        self._sql = sql
+        self._elapsed = 0.0
+        self._rows = 0
+
+    def _add(self, seconds, rows):
+        self._elapsed += seconds
+        self._rows += rows
+
+    def _finish(self):
+        if self._sql is not None:
+            record_query(self._sql, self._elapsed, self._rows)
+            self._sql = None
+
+    def execute(self, sql, parameters=()):
+        self._begin(sql)
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._add(time.perf_counter() - start, self._changed())
+
+    def executemany(self, sql, seq_of_parameters):
+        self._begin(sql)
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._add(time.perf_counter() - start, self._changed())
+
+    def _changed(self):
+        # Rows written by INSERT/UPDATE/DELETE; queries count rows as they are fetched
+        return self.rowcount if self.description is None and self.rowcount > 0 else 0
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        self._add(time.perf_counter() - start, row is not None)
+        if row is None:
+            self._finish()
+        return row
+
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._add(time.perf_counter() - start, len(rows))
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self._add(time.perf_counter() - start, len(rows))
+        self._finish()
+        return rows
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._add(time.perf_counter() - start, 0)
+            self._finish()
+            raise
+        self._add(time.perf_counter() - start, 1)
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        # Statements read with a single fetchone() end here
+        self._finish()
+
+
+class TracingConnection(sqlite3.Connection):
+    """Connection whose cursors, including those of conn.execute(), are TracingCursors"""
+
+    def cursor(self, factory=TracingCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def log_slow_query(sql, seconds, rows):
+    entry = {"statement": fingerprint(sql), "ms": round(seconds * 1000, 2), "rows": rows,
+             "at": time.time()}
+    with _lock:
+        _slow.append(entry)
+    print(f"⚠️ Slow query ({entry['ms']} ms, {rows} rows): {entry['statement']}")
+
+
+def get_slow_queries():
+    """Recent slow queries, newest first"""
+    with _lock:
+        return list(reversed(_slow))
+
+
+def _start_request():
+    g.metrics_start = time.perf_counter()
+    _current.active = True
+    _current.queries = 0
+    _current.seconds = 0.0
+
+
+def _record_request(status):
+    if "metrics_start" not in g:
+        return
+    seconds = time.perf_counter() - g.pop("metrics_start")
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    key = (route, request.method)
+    with _lock:
+        histogram = _requests.get(key)
+        if histogram is None:
+            histogram = _requests[key] = [0] * len(LATENCY_BUCKETS) + [0.0, 0]
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                histogram[i] += 1
+        histogram[-2] += seconds
+        histogram[-1] += 1
+        status_key = key + (status,)
+        _statuses[status_key] = _statuses.get(status_key, 0) + 1
+        db = _request_db.setdefault(route, [0, 0.0])
+        db[0] += _current.queries
+        db[1] += _current.seconds
+    _current.active = False
+
+
+def _after_request(response):
+    _record_request(response.status_code)
+    return response
+
+
+def _teardown_request(error):
+    # An exception that propagates (as in testing) skips after_request
+    if error is not None:
+        _record_request(500)
+    _current.active = False
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render_metrics():
+    """Every metric in the Prometheus text exposition format"""
+    with _lock:
+        requests = {key: list(value) for key, value in _requests.items()}
+        statuses = dict(_statuses)
+        request_db = {key: list(value) for key, value in _request_db.items()}
+        queries = {key: list(value) for key, value in _queries.items()}
+        slow = len(_slow)
+
+    lines = [
+        "# HELP finance_request_duration_seconds Time to handle a request, by route",
+        "# TYPE finance_request_duration_seconds histogram",
+    ]
+    for (route, method), histogram in sorted(requests.items()):
+        labels = f'route="{_label(route)}",method="{method}"'
+        for bound, count in zip(LATENCY_BUCKETS, histogram):
+            lines.append(f'finance_request_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+        lines.append(f'finance_request_duration_seconds_bucket{{{labels},le="+Inf"}} {histogram[-1]}')
+        lines.append(f"finance_request_duration_seconds_sum{{{labels}}} {histogram[-2]:.6f}")
+        lines.append(f"finance_request_duration_seconds_count{{{labels}}} {histogram[-1]}")
+
+    lines += ["# HELP finance_requests_total Requests handled, by route and status",
+              "# TYPE finance_requests_total counter"]
+    for (route, method, status), count in sorted(statuses.items()):
+        lines.append(f'finance_requests_total{{route="{_label(route)}",method="{method}",'
+                     f'status="{status}"}} {count}')
+
+    lines += ["# HELP finance_request_queries_total Queries run while handling requests, by route",
+              "# TYPE finance_request_queries_total counter"]
+    lines += [f'finance_request_queries_total{{route="{_label(route)}"}} {db[0]}'
+              for route, db in sorted(request_db.items())]
+    lines += ["# HELP finance_request_query_seconds_total Query time while handling requests, by route",
+              "# TYPE finance_request_query_seconds_total counter"]
+    lines += [f'finance_request_query_seconds_total{{route="{_label(route)}"}} {db[1]:.6f}'
+              for route, db in sorted(request_db.items())]
+
+    for name, index, kind, help_text, fmt in (
+            ("finance_query_executions_total", 0, "counter", "Executions of each statement", "{}"),
+            ("finance_query_seconds_total", 1, "counter", "Time spent executing and fetching each statement", "{:.6f}"),
+            ("finance_query_rows_total", 2, "counter", "Rows returned (or changed) by each statement", "{}"),
+            ("finance_query_max_seconds", 3, "gauge", "Slowest execution of each statement", "{:.6f}")):
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+        lines += [f'{name}{{statement="{_label(statement)}"}} {fmt.format(stats[index])}'
+                  for statement, stats in sorted(queries.items())]
+
+    lines += ["# HELP finance_slow_queries Slow queries in the recent log",
+              "# TYPE finance_slow_queries gauge",
+              f"finance_slow_queries {slow}"]
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    """Forget everything recorded so far"""
+    with _lock:
+        _queries.clear()
+        _requests.clear()
+        _statuses.clear()
+        _request_db.clear()
+        _slow.clear()
+
+
+def enable():
+    """Trace queries on every connection the pool opens from now on"""
+    database.set_connection_factory(TracingConnection)
+
+
+def disable():
+    database.set_connection_factory(sqlite3.Connection)
+
+
+def init_app(app, enabled=None):
+    """Install the request hooks and the /metrics endpoints when metrics are enabled"""
+    if not (ENABLED if enabled is None else enabled):
+        return False
+    enable()
+    app.before_request(_start_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+
+    @app.route("/metrics")
+    def metrics():
+        return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
+
+    @app.route("/slow_queries")
+    def slow_queries():
+        return jsonify(get_slow_queries())
+
+    return True
@@ -1,134 +1,122 @@
-import sqlite3
 from datetime import datetime
+from database import get_connection
+from utils import month_key, year_month_range, from_minor, from_month_key
+
+# Totals are read from monthly_rollups, which triggers keep in sync with
+# transactions, so report cost depends on categories x months, not rows.
 
 def monthly_report(user_id, month):
     """Generate monthly report (console output)"""
-    conn = sqlite3.connect("finance.db")
-    cursor = conn.cursor()
+    with get_connection() as conn:
+        cursor = conn.cursor()
 
-    cursor.execute("""
-        SELECT type, SUM(amount)
-        FROM transactions
-        WHERE user_id=? AND date LIKE ?
-        GROUP BY type
-    """, (user_id, f"{month}%"))
+        cursor.execute("""
+            SELECT type, SUM(total)
+            FROM monthly_rollups
+            WHERE user_id=? AND month=?
+            GROUP BY type
+        """, (user_id, month_key(month)))
 
-    data = cursor.fetchall()
-    conn.close()
+        data = cursor.fetchall()
 
     income = sum(a for t, a in data if t == 'income')
     expense = sum(a for t, a in data if t == 'expense')
 
     print(f"\n📊 Monthly Report ({month})")
-    print(f"Income  : ₹{income}")
-    print(f"Expense : ₹{expense}")
-    print(f"Savings : ₹{income - expense}")
+    print(f"Income  : ₹{from_minor(income)}")
+    print(f"Expense : ₹{from_minor(expense)}")
+    print(f"Savings : ₹{from_minor(income - expense)}")
 
 def get_monthly_report_data(user_id, month):
     """Get monthly report data for web display"""
-    conn = sqlite3.connect("finance.db")
-    cursor = conn.cursor()
-
-    # Get income and expense totals
-    cursor.execute("""
-        SELECT type, SUM(amount) as total
-        FROM transactions
-        WHERE user_id=? AND date LIKE ?
-        GROUP BY type
-    """, (user_id, f"{month}%"))
-
-    results = cursor.fetchall()
-    
+    with get_connection() as conn:
+        cursor = conn.cursor()
+
+        # Get totals by category; income and expense are summed from them
+        cursor.execute("""
+            SELECT category, type, SUM(total) as total
+            FROM monthly_rollups
+            WHERE user_id=? AND month=?
+            GROUP BY category, type
+            ORDER BY total DESC
+        """, (user_id, month_key(month)))
+
+        rows = cursor.fetchall()
+
     income = 0
     expense = 0
-    for t_type, total in results:
+    for category, t_type, total in rows:
         if t_type == 'income':
-            income = total or 0
+            income += total
         elif t_type == 'expense':
-            expense = total or 0
-    
-    # Get transactions by category
-    cursor.execute("""
-        SELECT category, type, SUM(amount) as total
-        FROM transactions
-        WHERE user_id=? AND date LIKE ?
-        GROUP BY category, type
-        ORDER BY total DESC
-    """, (user_id, f"{month}%"))
-    
-    category_data = cursor.fetchall()
-    
-    conn.close()
-    
+            expense += total
+
+    category_data = [(category, t_type, from_minor(total))
+                     for category, t_type, total in rows]
+
     return {
-        'income': income,
-        'expense': expense,
-        'savings': income - expense,
+        'income': from_minor(income),
+        'expense': from_minor(expense),
+        'savings': from_minor(income - expense),
         'category_data': category_data
     }
 
 def yearly_report(user_id, year):
     """Generate yearly report (console output)"""
-    conn = sqlite3.connect("finance.db")
-    cursor = conn.cursor()
+    start, end = year_month_range(year)
+
+    with get_connection() as conn:
+        cursor = conn.cursor()
 
-    cursor.execute("""
-        SELECT type, SUM(amount)
-        FROM transactions
-        WHERE user_id=? AND date LIKE ?
-        GROUP BY type
-    """, (user_id, f"{year}%"))
+        cursor.execute("""
+            SELECT type, SUM(total)
+            FROM monthly_rollups
+            WHERE user_id=? AND month >= ? AND month < ?
+            GROUP BY type
+        """, (user_id, start, end))
 
-    data = cursor.fetchall()
-    conn.close()
+        data = cursor.fetchall()
 
     income = sum(a for t, a in data if t == 'income')
     expense = sum(a for t, a in data if t == 'expense')
 
     print(f"\n📊 Yearly Report ({year})")
-    print(f"Income  : ₹{income}")
-    print(f"Expense : ₹{expense}")
-    print(f"Savings : ₹{income - expense}")
+    print(f"Income  : ₹{from_minor(income)}")
+    print(f"Expense : ₹{from_minor(expense)}")
+    print(f"Savings : ₹{from_minor(income - expense)}")
 
 def get_yearly_report_data(user_id, year):
     """Get yearly report data for web display"""
-    conn = sqlite3.connect("finance.db")
-    cursor = conn.cursor()
-
-    # Get income and expense totals
-    cursor.execute("""
-        SELECT type, SUM(amount) as total
-        FROM transactions
-        WHERE user_id=? AND date LIKE ?
-        GROUP BY type
-    """, (user_id, f"{year}%"))
-
-    results = cursor.fetchall()
-    
+    start, end = year_month_range(year)
+
+    with get_connection() as conn:
+        cursor = conn.cursor()
+
+        # Get monthly breakdown; yearly totals are summed from it
+        cursor.execute("""
+            SELECT month, type, SUM(total) as total
+            FROM monthly_rollups
+            WHERE user_id=? AND month >= ? AND month < ?
+            GROUP BY month, type
+            ORDER BY month
+        """, (user_id, start, end))
+
+        rows = cursor.fetchall()
+
     income = 0
     expense = 0
-    for t_type, total in results:
+    for month, t_type, total in rows:
         if t_type == 'income':
-            income = total or 0
+            income += total
         elif t_type == 'expense':
-            expense = total or 0
-    
-    # Get monthly breakdown
-    cursor.execute("""
-        SELECT strftime('%Y-%m', date) as month, type, SUM(amount) as total
-        FROM transactions
-        WHERE user_id=? AND date LIKE ?
-        GROUP BY month, type
-        ORDER BY month
-    """, (user_id, f"{year}%"))
-    
-    monthly_data = cursor.fetchall()
-    
-    conn.close()
-    
+            expense += total
+
+    monthly_data = [(from_month_key(month), t_type, from_minor(total))
+                    for month, t_type, total in rows]
+
     return {
-        'income': income,
-        'expense': expense,
-        'savings': income - expense,
+        'income': from_minor(income),
+        'expense': from_minor(expense),
+        'savings': from_minor(income - expense),
         'monthly_data': monthly_data
     }
@@ -0,0 +1,138 @@
+"""
+Maintenance for the monthly_rollups and daily_cashflow tables.
+
+Triggers keep both tables in sync on every insert, update and delete,
+so this is only needed after manual edits or to audit the totals.
+
+Usage:
+    python rollups.py rebuild [--db finance.db]
+    python rollups.py verify [--db finance.db]
+"""
+import argparse
+import database
+from database import get_connection
+
+# Rollup rows recomputed straight from transactions
+ROLLUP_QUERY = """
+    SELECT user_id, day / 100, COALESCE(type, ''), COALESCE(category, ''),
+           SUM(amount_minor), COUNT(*)
+    FROM transactions
+    GROUP BY user_id, day / 100, COALESCE(type, ''), COALESCE(category, '')
+"""
+
+# Daily cash-flow rows (with running balance) recomputed straight from transactions
+CASHFLOW_QUERY = """
+    SELECT user_id, day, income, expense, count,
+           SUM(income - expense) OVER (PARTITION BY user_id ORDER BY day)
+    FROM (
+        SELECT user_id, day,
+               SUM(CASE WHEN type = 'income' THEN amount_minor ELSE 0 END) AS income,
+               SUM(CASE WHEN type = 'expense' THEN amount_minor ELSE 0 END) AS expense,
+               COUNT(*) AS count
+        FROM transactions
+        GROUP BY user_id, day
+    )
+"""
+
+def verify_rollups():
+    """Return rows where monthly_rollups differs from the transactions table"""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            SELECT 'missing', * FROM ({ROLLUP_QUERY}
+                EXCEPT
+                SELECT user_id, month, type, category, total, count FROM monthly_rollups)
+            UNION ALL
+            SELECT 'stale', * FROM (
+                SELECT user_id, month, type, category, total, count FROM monthly_rollups
+                EXCEPT {ROLLUP_QUERY})
+        """)
+        mismatches = cursor.fetchall()
+    return mismatches
+
+def rebuild_rollups():
+    """Recompute monthly_rollups from scratch and verify the result"""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM monthly_rollups")
+        cursor.execute(f"""
+            INSERT INTO monthly_rollups (user_id, month, type, category, total, count)
+            {ROLLUP_QUERY}
+        """)
+        rows = cursor.rowcount
+        conn.commit()
+
+    mismatches = verify_rollups()
+    if mismatches:
+        print(f"❌ Rollups still differ in {len(mismatches)} rows after rebuild")
+    else:
+        print(f"✅ Rebuilt {rows} rollup rows")
+    return rows
+
+def verify_cashflow():
+    """Return rows where daily_cashflow differs from the transactions table"""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            SELECT 'missing', * FROM ({CASHFLOW_QUERY}
+                EXCEPT
+                SELECT user_id, day, income, expense, count, balance FROM daily_cashflow)
+            UNION ALL
+            SELECT 'stale', * FROM (
+                SELECT user_id, day, income, expense, count, balance FROM daily_cashflow
+                EXCEPT {CASHFLOW_QUERY})
+        """)
+        mismatches = cursor.fetchall()
+    return mismatches
+
+def rebuild_cashflow():
+    """Recompute daily_cashflow from scratch and verify the result"""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM daily_cashflow")
+        cursor.execute(f"""
+            INSERT INTO daily_cashflow (user_id, day, income, expense, count, balance)
+            {CASHFLOW_QUERY}
+        """)
+        rows = cursor.rowcount
+        conn.commit()
+
+    mismatches = verify_cashflow()
+    if mismatches:
+        print(f"❌ Daily cash flow still differs in {len(mismatches)} rows after rebuild")
+    else:
+        print(f"✅ Rebuilt {rows} daily cash-flow rows")
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild or verify monthly rollups and daily cash flow")
+    parser.add_argument("command", choices=["rebuild", "verify"])
+    parser.add_argument("--db", help="database file (defaults to FINANCE_DB or finance.db)")
+    args = parser.parse_args()
+
+    if args.db:
+        database.configure(args.db)
+    database.init_db()
+
+    if args.command == "rebuild":
+        rebuild_rollups()
+        rebuild_cashflow()
+        return 0
+
+    mismatches = verify_rollups()
+    for kind, user_id, month, t_type, category, total, count in mismatches:
+        print(f"{kind}: user={user_id} month={month} type={t_type} "
+              f"category={category} total={total} count={count}")
+    cashflow_mismatches = verify_cashflow()
+    for kind, user_id, day, income, expense, count, balance in cashflow_mismatches:
+        print(f"{kind}: user={user_id} day={day} income={income} "
+              f"expense={expense} count={count} balance={balance}")
+    if mismatches or cashflow_mismatches:
+        print(f"❌ {len(mismatches) + len(cashflow_mismatches)} rows out of sync; "
+              f"run 'python rollups.py rebuild'")
+        return 1
+    print("✅ Rollups and daily cash flow match transactions")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
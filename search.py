@@ -0,0 +1,148 @@
+"""
+Full-text search over transaction descriptions and categories.
+
+transactions_fts (migration 12) is an FTS5 index that triggers keep in
+sync with transactions. Every word of a query has to match, as a prefix
+("star" finds "Starbucks"), in the description or category. Results are
+ranked by BM25 with description matches counting double, and can be
+narrowed by type, amount and date.
+
+Unlike LIKE '%term%', which reads every one of the user's rows, a search
+only touches the index entries of its words.
+
+Usage:
+    python search.py search USER_ID "coffee star" [--db finance.db]
+    python search.py rebuild [--db finance.db]
+    python search.py check [--db finance.db]
+"""
+import argparse
+import re
+import sqlite3
+import time
+import database
+from database import get_connection
+from utils import to_minor, from_minor, to_day, from_day
+
+# Results returned when no limit is given, and the most allowed
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+
+ORDERS = ("rank", "date")
+
+_WORD = re.compile(r"\w+")
+
+
+def match_terms(query):
+    """FTS5 terms matching every word of a search box entry as a prefix, or None"""
+    words = _WORD.findall(query or "")
+    if not words:
+        return None
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def search_transactions(user_id, query, t_type=None, min_amount=None, max_amount=None,
+                        start_date=None, end_date=None, order="rank", limit=DEFAULT_LIMIT):
+    """Transactions matching every word of query, best match (or newest) first
+
+    Returns (id, type, category, amount, date, description) tuples. Amount
+    bounds are in rupees and dates are inclusive 'YYYY-MM-DD'.
+    """
+    if order not in ORDERS:
+        raise ValueError(f"order must be one of {', '.join(ORDERS)}")
+    terms = match_terms(query)
+    if terms is None:
+        return []
+
+    conditions = ["transactions_fts MATCH ?", "t.user_id = ?"]
+    params = [f"owner:u{int(user_id)} AND {{description category}}: ({terms})", user_id]
+    if t_type:
+        conditions.append("t.type = ?")
+        params.append(t_type)
+    for name, value, operator in (("min", min_amount, ">="), ("max", max_amount, "<=")):
+        if value is not None:
+            try:
+                bound = to_minor(value)
+            except ValueError:
+                raise ValueError(f"{name} must be an amount") from None
+            conditions.append(f"t.amount_minor {operator} ?")
+            params.append(bound)
+    if start_date:
+        conditions.append("t.day >= ?")
+        params.append(to_day(start_date))
+    if end_date:
+        conditions.append("t.day <= ?")
+        params.append(to_day(end_date))
+
+    order_by = "transactions_fts.rank" if order == "rank" else "t.day DESC, t.id DESC"
+
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            SELECT t.id, t.type, t.category, t.amount_minor, t.day, t.description
+            FROM transactions_fts
+            JOIN transactions t ON t.id = transactions_fts.rowid
+            WHERE {" AND ".join(conditions)}
+            ORDER BY {order_by}
+            LIMIT ?
+        """, params + [max(1, min(limit, MAX_LIMIT))])
+        rows = cursor.fetchall()
+
+    return [(t_id, t_type, category, from_minor(amount), from_day(day), description)
+            for t_id, t_type, category, amount, day, description in rows]
+
+
+def rebuild_index():
+    """Rebuild the search index from transactions and merge it into one segment"""
+    start = time.perf_counter()
+    with get_connection() as conn:
+        conn.execute("INSERT INTO transactions_fts (transactions_fts) VALUES ('rebuild')")
+        conn.execute("INSERT INTO transactions_fts (transactions_fts) VALUES ('optimize')")
+        count = conn.execute("SELECT COUNT(*) FROM transactions").fetchone()[0]
+    seconds = time.perf_counter() - start
+    print(f"✅ Search index rebuilt for {count} transactions in {seconds:.2f}s")
+    return count
+
+
+def check_index():
+    """Return True if the search index matches the transactions table"""
+    try:
+        with get_connection() as conn:
+            conn.execute("""
+                INSERT INTO transactions_fts (transactions_fts, rank) VALUES ('integrity-check', 1)
+            """)
+    except sqlite3.DatabaseError as e:
+        print(f"❌ Search index is out of date ({e}); run python search.py rebuild")
+        return False
+    print("✅ Search index matches transactions")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Search transactions or maintain the search index")
+    parser.add_argument("command", choices=["search", "rebuild", "check"])
+    parser.add_argument("user_id", nargs="?", type=int)
+    parser.add_argument("query", nargs="?")
+    parser.add_argument("--order", choices=ORDERS, default="rank")
+    parser.add_argument("--limit", type=int, default=DEFAULT_LIMIT)
+    parser.add_argument("--db", help="database file (defaults to FINANCE_DB or finance.db)")
+    args = parser.parse_args()
+
+    if args.db:
+        database.configure(args.db)
+    database.init_db()
+
+    if args.command == "rebuild":
+        rebuild_index()
+        return 0
+    if args.command == "check":
+        return 0 if check_index() else 1
+    if args.user_id is None or not args.query:
+        parser.error("search needs USER_ID and QUERY")
+    for t_id, t_type, category, amount, t_date, description in search_transactions(
+            args.user_id, args.query, order=args.order, limit=args.limit):
+        print(f"{t_date}  {t_type:<7}  {category:<15}  {amount:>12,.2f}  {description or ''}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
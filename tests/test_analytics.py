@@ -0,0 +1,88 @@
+"""
+Test cases for analytics module
+Tests the vectorized series against hand-computed values
+"""
+import unittest
+import os
+import numpy as np
+import database
+from analytics import (load_frame, epoch_days, daily_totals, cumulative_balance,
+                       rolling_average, category_share_by_month, expense_percentiles,
+                       get_analytics)
+from transactions import add_transaction
+
+class TestAnalytics(unittest.TestCase):
+    """Test cases for analytics functions"""
+    
+    def setUp(self):
+        """Set up test data"""
+        self.test_db = "test_finance.db"
+        if os.path.exists(self.test_db):
+            os.remove(self.test_db)
+        self.original_db = database.DB_PATH
+        database.configure(self.test_db)
+        database.init_db()
+        
+        from auth import register_user, login_user
+        register_user("test_analytics_user", "testpass")
+        self.user_id = login_user("test_analytics_user", "testpass")
+        
+        add_transaction(self.user_id, "income", "Salary", 1000.0, "Pay", "2024-01-30")
+        add_transaction(self.user_id, "expense", "Food", 100.0, "Lunch", "2024-01-30")
+        add_transaction(self.user_id, "expense", "Rent", 300.0, "Flat", "2024-02-01")
+        add_transaction(self.user_id, "expense", "Food", 100.0, "Dinner", "2024-02-01")
+    
+    def tearDown(self):
+        """Clean up test database"""
+        database.configure(self.original_db)
+        if os.path.exists(self.test_db):
+            os.remove(self.test_db)
+    
+    def test_epoch_days(self):
+        """Test YYYYMMDD to day-number conversion across month and leap boundaries"""
+        days = epoch_days([19700101, 20240228, 20240229, 20240301])
+        self.assertEqual(days.tolist(), [0, 19781, 19782, 19783])
+    
+    def test_daily_totals_and_balance(self):
+        """Test the continuous daily axis, including days without transactions"""
+        frame = load_frame(self.user_id)
+        first, income, expense = daily_totals(frame)
+        
+        self.assertEqual(first, epoch_days([20240130])[0])
+        self.assertEqual(income.tolist(), [100000, 0, 0])
+        self.assertEqual(expense.tolist(), [10000, 0, 40000])
+        self.assertEqual(cumulative_balance(income, expense).tolist(), [90000, 90000, 50000])
+    
+    def test_rolling_average(self):
+        """Test the trailing mean with a short first window"""
+        self.assertEqual(rolling_average([2, 4, 6, 8], window=2).tolist(), [2, 3, 5, 7])
+        self.assertEqual(len(rolling_average([])), 0)
+    
+    def test_category_share(self):
+        """Test each category's share of a month's spending"""
+        months, categories, shares = category_share_by_month(load_frame(self.user_id))
+        
+        self.assertEqual(months, ["2024-01", "2024-02"])
+        self.assertEqual(categories, ["Food", "Rent", "Salary"])
+        np.testing.assert_allclose(shares, [[1.0, 0.0, 0.0], [0.25, 0.75, 0.0]])
+    
+    def test_percentiles(self):
+        """Test expense percentiles match numpy on the raw amounts"""
+        result = expense_percentiles(load_frame(self.user_id), (50, 90))
+        self.assertEqual(result[50], 10000)
+        self.assertAlmostEqual(result[90], 26000)
+    
+    def test_get_analytics_range_and_empty(self):
+        """Test date filtering and a user without transactions"""
+        data = get_analytics(self.user_id, start_date="2024-02-01")
+        self.assertEqual(data['count'], 2)
+        self.assertEqual(data['dates'], ["2024-02-01"])
+        self.assertEqual(data['balance'], [-400.0])
+        
+        empty = get_analytics(self.user_id + 1)
+        self.assertEqual(empty['count'], 0)
+        self.assertEqual(empty['dates'], [])
+        self.assertEqual(empty['months'], [])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,164 @@
+"""
+Test cases for api module
+Tests login, batch writes, field selection and reports over the JSON API
+"""
+import unittest
+import os
+from flask import Flask
+import database
+import api
+from auth import hash_password
+from database import get_connection
+
+class TestApi(unittest.TestCase):
+    """Test cases for the /api/v1 endpoints"""
+
+    def setUp(self):
+        """Set up test database and a logged-in client"""
+        self.test_db = "test_finance.db"
+        if os.path.exists(self.test_db):
+            os.remove(self.test_db)
+        self.original_db = database.DB_PATH
+        database.configure(self.test_db)
+        with get_connection() as conn:
+            # The web app's users table, keyed by email
+            conn.execute("""
+                CREATE TABLE users (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    email TEXT UNIQUE,
+                    password TEXT
+                )
+            """)
+            conn.execute("INSERT INTO users (email, password) VALUES (?, ?)",
+                         ("api@example.com", hash_password("secret")))
+            conn.execute("INSERT INTO users (email, password) VALUES (?, ?)",
+                         ("other@example.com", hash_password("secret")))
+        database.init_db()
+
+        app = Flask(__name__)
+        app.secret_key = "test"
+        app.register_blueprint(api.bp)
+        self.client = app.test_client()
+        response = self.client.post("/api/v1/login",
+                                    json={"email": "api@example.com", "password": "secret"})
+        self.assertEqual(response.status_code, 200)
+
+    def tearDown(self):
+        """Clean up test database"""
+        database.configure(self.original_db)
+        if os.path.exists(self.test_db):
+            os.remove(self.test_db)
+
+    def create(self, *items):
+        return self.client.post("/api/v1/transactions", json={"transactions": list(items)})
+
+    def test_login_required(self):
+        """Test that requests without a session are refused"""
+        self.client.post("/api/v1/logout")
+        self.assertEqual(self.client.get("/api/v1/transactions").status_code, 401)
+        response = self.client.post("/api/v1/login",
+                                    json={"email": "api@example.com", "password": "wrong"})
+        self.assertEqual(response.status_code, 401)
+
+    def test_batch_create_and_list_fields(self):
+        """Test creating many transactions and reading selected fields"""
+        response = self.create(
+            {"type": "income", "category": "Salary", "amount": 5000, "date": "2024-01-01"},
+            {"type": "expense", "category": "Food", "amount": "120.50", "date": "2024-01-02",
+             "description": "Groceries"},
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.get_json()["ids"]), 2)
+
+        data = self.client.get("/api/v1/transactions?fields=id,amount").get_json()
+        self.assertEqual(data["transactions"][0], {"id": response.get_json()["ids"][1], "amount": 120.5})
+        self.assertIsNone(data["next_cursor"])
+
+    def test_invalid_item_rolls_back_batch(self):
+        """Test that one bad item leaves nothing written"""
+        response = self.create(
+            {"type": "expense", "category": "Food", "amount": 10, "date": "2024-01-02"},
+            {"type": "expense", "category": "Food", "amount": -5, "date": "2024-01-02"},
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("transactions[1]", response.get_json()["error"])
+        for amount in (1e17, "inf", "nan"):
+            response = self.create({"type": "expense", "category": "Food", "amount": amount,
+                                    "date": "2024-01-02"})
+            self.assertEqual(response.status_code, 400, amount)
+
+        response = self.client.post("/api/v1/batch", json={
+            "create": [{"type": "expense", "category": "Food", "amount": 10, "date": "2024-01-02"}],
+            "delete": [999],
+        })
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.client.get("/api/v1/transactions").get_json()["transactions"], [])
+
+    def test_batch_update_and_delete(self):
+        """Test mixed creates, updates and deletes in one request"""
+        ids = self.create(
+            {"type": "expense", "category": "Food", "amount": 10, "date": "2024-01-02"},
+            {"type": "expense", "category": "Food", "amount": 20, "date": "2024-01-03"},
+        ).get_json()["ids"]
+
+        response = self.client.post("/api/v1/batch", json={
+            "create": [{"type": "income", "category": "Gift", "amount": 100, "date": "2024-02-01"}],
+            "update": [{"id": ids[0], "amount": 15, "date": "2024-02-02"}],
+            "delete": [ids[1]],
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()["updated"], 1)
+
+        updated = self.client.get(f"/api/v1/transactions/{ids[0]}").get_json()
+        self.assertEqual((updated["amount"], updated["date"], updated["category"]),
+                         (15.0, "2024-02-02", "Food"))
+        self.assertEqual(self.client.get(f"/api/v1/transactions/{ids[1]}").status_code, 404)
+
+        report = self.client.get("/api/v1/reports/monthly?month=2024-02&fields=income,expense")
+        self.assertEqual(report.get_json(), {"income": 100.0, "expense": 15.0})
+        self.assertEqual(self.client.get("/api/v1/reports/monthly?month=2024-01").get_json()["expense"], 0.0)
+
+    def test_other_users_transactions(self):
+        """Test that another user's transactions cannot be changed"""
+        with get_connection() as conn:
+            conn.execute("""
+                INSERT INTO transactions (id, user_id, type, category, amount_minor, day)
+                VALUES (500, 2, 'expense', 'Food', 1000, 20240101)
+            """)
+        self.assertEqual(self.client.patch("/api/v1/transactions/500", json={"amount": 1}).status_code, 404)
+        self.assertEqual(self.client.delete("/api/v1/transactions/500").status_code, 404)
+
+    def test_budgets(self):
+        """Test setting budgets in bulk and reading their status"""
+        self.create({"type": "expense", "category": "Food", "amount": 300, "date": "2024-01-02"})
+        response = self.client.put("/api/v1/budgets", json={"budgets": [
+            {"category": "Food", "limit": 250, "month": "2024-01"},
+            {"category": "Travel", "limit": 500, "month": "2024-01"},
+        ]})
+        self.assertEqual(response.get_json(), {"saved": 2})
+
+        data = self.client.get("/api/v1/budgets?month=2024-01&fields=category,exceeded").get_json()
+        self.assertEqual(data["budgets"], [{"category": "Food", "exceeded": True},
+                                           {"category": "Travel", "exceeded": False}])
+        self.assertEqual(self.client.put("/api/v1/budgets", json={"category": "Food", "limit": 1,
+                                                                   "month": "Jan"}).status_code, 400)
+        self.assertEqual(self.client.put("/api/v1/budgets", json={"category": "Food", "limit": 1e17,
+                                                                   "month": "2024-01"}).status_code, 400)
+
+    def test_search(self):
+        """Test full-text search with filters and field selection"""
+        self.create(
+            {"type": "expense", "category": "Food", "amount": 250, "date": "2024-01-05",
+             "description": "Coffee at Starbucks"},
+            {"type": "expense", "category": "Food", "amount": 900, "date": "2024-02-10",
+             "description": "Coffee beans"},
+        )
+        data = self.client.get("/api/v1/search?q=coff&min=500&fields=description").get_json()
+        self.assertEqual(data["transactions"], [{"description": "Coffee beans"}])
+        self.assertEqual(self.client.get("/api/v1/search?q=").status_code, 400)
+        self.assertEqual(self.client.get("/api/v1/search?q=x&start=bad").status_code, 400)
+        for bound in ("min=inf", "max=nan", "min=abc"):
+            self.assertEqual(self.client.get(f"/api/v1/search?q=coffee&{bound}").status_code, 400, bound)
+
+if __name__ == '__main__':
+    unittest.main()
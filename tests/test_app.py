@@ -0,0 +1,212 @@
+"""
+Test cases for the application factory
+Tests create_app, the users table migration, migrations from several processes and forked workers
+"""
+import unittest
+import os
+import subprocess
+import sys
+from unittest import mock
+import database
+import writer
+import cache
+import main
+from transactions import add_transaction
+from database import get_connection, get_schema_version
+from main import create_app
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+class TestApp(unittest.TestCase):
+    """Test cases for create_app and the production entry point"""
+
+    def setUp(self):
+        """Set up an empty test database"""
+        self.test_db = "test_finance.db"
+        if os.path.exists(self.test_db):
+            os.remove(self.test_db)
+        self.original_db = database.DB_PATH
+
+    def tearDown(self):
+        """Clean up test database"""
+        database.configure(self.original_db)
+        if os.path.exists(self.test_db):
+            os.remove(self.test_db)
+
+    def logged_in_client(self):
+        client = create_app(self.test_db, debug=True).test_client()
+        client.post("/register", data={"email": "app@example.com", "password": "secret1",
+                                       "confirm_password": "secret1"})
+        response = client.post("/", data={"email": "app@example.com", "password": "secret1"})
+        self.assertEqual(response.status_code, 302)
+        return client
+
+    def test_register_and_login(self):
+        """Test that an app from the factory serves a session end to end"""
+        client = self.logged_in_client()
+        self.assertEqual(client.get("/dashboard").status_code, 200)
+        self.assertEqual(client.get("/api/v1/transactions").status_code, 200)
+        # The unversioned listing moved to the versioned API
+        response = client.get("/api/transactions?page_size=5&type=income")
+        self.assertEqual(response.status_code, 308)
+        self.assertEqual(response.headers["Location"], "/api/v1/transactions?page_size=5&type=income")
+        self.assertEqual(client.get("/api/transactions", follow_redirects=True).get_json(),
+                         {"transactions": [], "next_cursor": None})
+
+    def test_secret_key_required(self):
+        """Test that outside debug the app refuses to start with the public development key"""
+        environ = {key: value for key, value in os.environ.items()
+                   if key not in ("FINANCE_SECRET_KEY", "FLASK_DEBUG")}
+        with mock.patch.dict(os.environ, environ, clear=True):
+            with self.assertRaises(RuntimeError):
+                create_app(self.test_db)
+            self.assertEqual(create_app(self.test_db, debug=True).secret_key, main.DEV_SECRET_KEY)
+        with mock.patch.dict(os.environ, {"FINANCE_SECRET_KEY": "k" * 32}):
+            self.assertEqual(create_app(self.test_db).secret_key, "k" * 32)
+
+    def test_etag_follows_writes_from_other_workers(self):
+        """Test that a page is neither stale nor revalidated after another process's write"""
+        client = self.logged_in_client()
+        with get_connection() as conn:
+            user_id = conn.execute("SELECT id FROM users").fetchone()[0]
+        add_transaction(user_id, "expense", "Food", 100.0, "", "2024-03-05")
+
+        path = "/reports?month=2024-03&year=2024"
+        first = client.get(path)
+        self.assertIn("₹100.00", first.get_data(as_text=True))
+        # A write from another worker: nothing in this process is invalidated
+        with get_connection() as conn:
+            conn.execute("UPDATE transactions SET amount_minor = 15000 WHERE user_id = ?", (user_id,))
+
+        second = client.get(path, headers={"If-None-Match": first.headers["ETag"]})
+        self.assertEqual(second.status_code, 200)
+        self.assertNotIn("₹100.00", second.get_data(as_text=True))
+        self.assertIn("₹150.00", second.get_data(as_text=True))
+        third = client.get(path, headers={"If-None-Match": second.headers["ETag"]})
+        self.assertEqual(third.status_code, 304)
+
+    def test_etag_with_write_during_render(self):
+        """Test that another process's write while a page renders is not hidden behind a 304"""
+        client = self.logged_in_client()
+        with get_connection() as conn:
+            user_id = conn.execute("SELECT id FROM users").fetchone()[0]
+        add_transaction(user_id, "expense", "Food", 100.0, "", "2024-03-05")
+        write = ("import sqlite3, sys; conn = sqlite3.connect(sys.argv[1]); "
+                 "conn.execute('UPDATE transactions SET amount_minor = 15000'); conn.commit()")
+        compute = main.get_monthly_report_data
+
+        def compute_then_write(*args):
+            report = compute(*args)
+            subprocess.run([sys.executable, "-c", write, os.path.abspath(self.test_db)], check=True)
+            return report
+
+        path = "/reports?month=2024-03&year=2024"
+        with mock.patch.object(main, "get_monthly_report_data", compute_then_write):
+            first = client.get(path)
+        self.assertIn("₹100.00", first.get_data(as_text=True))
+
+        # Another worker, with nothing in memory, sees the write
+        cache.clear_cache()
+        second = client.get(path, headers={"If-None-Match": first.headers["ETag"]})
+        self.assertEqual(second.status_code, 200)
+        self.assertNotIn("₹100.00", second.get_data(as_text=True))
+        self.assertIn("₹150.00", second.get_data(as_text=True))
+        self.assertEqual(client.get(path, headers={"If-None-Match": second.headers["ETag"]}).status_code,
+                         304)
+
+    def test_malformed_period(self):
+        """Test that a bad month or year is refused and an unpadded one accepted"""
+        client = self.logged_in_client()
+        for path in ("/reports?month=bogus", "/reports?year=20x4", "/budget?month=bogus",
+                     "/budget?month=2024-13"):
+            self.assertEqual(client.get(path).status_code, 400, path)
+        response = client.post("/budget", data={"category": "Food", "limit": "10", "month": "May"})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(client.get("/reports?month=2024-3&year=2024").status_code, 200)
+        self.assertEqual(client.get("/budget?month=2024-3").status_code, 200)
+
+    def test_invalid_amounts(self):
+        """Test that forms with an amount that is not a storable number are refused"""
+        client = self.logged_in_client()
+        for amount in ("abc", "", "inf", "nan", "1e17"):
+            response = client.post("/add", data={"type": "expense", "category": "Food", "amount": amount})
+            self.assertEqual(response.status_code, 400, amount)
+        response = client.post("/budget", data={"category": "Food", "limit": "", "month": "2024-03"})
+        self.assertEqual(response.status_code, 400)
+
+        client.post("/add", data={"type": "expense", "category": "Food", "amount": "12.50"})
+        with get_connection() as conn:
+            transaction_id, amount = conn.execute("SELECT id, amount_minor FROM transactions").fetchone()
+        self.assertEqual(amount, 1250)
+        response = client.post(f"/edit/{transaction_id}",
+                               data={"type": "expense", "category": "Food", "amount": "x"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_search_rejects_bad_amounts(self):
+        """Test that the search page answers 400 for a min or max that is not an amount"""
+        client = self.logged_in_client()
+        self.assertEqual(client.get("/search?q=coffee&min=10&max=20").status_code, 200)
+        for bound in ("min=inf", "max=nan", "min=abc"):
+            response = client.get(f"/search?q=coffee&{bound}")
+            self.assertEqual(response.status_code, 400, bound)
+            self.assertIn("Please check the amounts", response.get_data(as_text=True))
+
+    def test_export_rejects_bad_dates(self):
+        """Test that a bad export date is refused before any of the body is sent"""
+        client = self.logged_in_client()
+        for fmt in ("csv", "jsonl"):
+            response = client.get(f"/export/transactions.{fmt}?start=bad")
+            self.assertEqual(response.status_code, 400)
+        self.assertEqual(client.get("/export/transactions.csv?end=2024-02-30").status_code, 400)
+        response = client.get("/export/transactions.csv?start=2024-01-01&end=2024-12-31")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.get_data(as_text=True).startswith("id,"))
+
+    def test_username_table_migrated(self):
+        """Test that an old users table keyed by username keeps its users"""
+        database.configure(self.test_db)
+        with get_connection() as conn:
+            conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, username TEXT, password TEXT)")
+            conn.execute("INSERT INTO users VALUES (7, 'old@example.com', 'hash')")
+        create_app(self.test_db, debug=True)
+        with get_connection() as conn:
+            self.assertEqual(conn.execute("SELECT id, email, password FROM users").fetchall(),
+                             [(7, "old@example.com", "hash")])
+
+    def test_workers_starting_together(self):
+        """Test that processes creating the app at once migrate the database exactly once"""
+        code = "import sys; from main import create_app; create_app(sys.argv[1], debug=True)"
+        path = os.path.abspath(self.test_db)
+        workers = [subprocess.Popen([sys.executable, "-c", code, path], cwd=ROOT,
+                                    stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+                   for _ in range(4)]
+        outputs = [worker.communicate(timeout=60) for worker in workers]
+        self.assertEqual([worker.returncode for worker in workers], [0] * 4, outputs)
+        # Each migration is announced by whichever worker applied it, once
+        announced = "".join(out for out, _ in outputs).count("Database migrated to version")
+        self.assertEqual(announced, len(database.MIGRATIONS))
+        database.configure(self.test_db)
+        with get_connection() as conn:
+            self.assertEqual(get_schema_version(conn), database.MIGRATIONS[-1][0])
+
+    @unittest.skipUnless(hasattr(os, "fork"), "needs os.fork")
+    def test_fork_gets_own_pool(self):
+        """Test that a forked worker opens its own connections and writer"""
+        database.configure(self.test_db)
+        database.init_db()
+        parent_pool = database.get_pool()
+        writer.get_writer()
+        pid = os.fork()
+        if pid == 0:
+            ok = database.get_pool() is not parent_pool and writer._writer is None
+            with get_connection() as conn:
+                ok = ok and conn.execute("SELECT COUNT(*) FROM users").fetchone() == (0,)
+            os._exit(0 if ok else 1)
+        _, status = os.waitpid(pid, 0)
+        writer.stop_writer()
+        self.assertEqual(os.waitstatus_to_exitcode(status), 0)
+        with get_connection() as conn:
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM users").fetchone(), (0,))
+
+if __name__ == '__main__':
+    unittest.main()
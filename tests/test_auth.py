@@ -5,6 +5,7 @@ Tests user registration and login functionality
 import unittest
 import sqlite3
 import os
+import database
 from auth import hash_password, register_user, login_user
 
 class TestAuth(unittest.TestCase):
@@ -29,9 +30,14 @@ class TestAuth(unittest.TestCase):
         """)
         conn.commit()
         conn.close()
+        
+        # Point the data layer at the test database
+        self.original_db = database.DB_PATH
+        database.configure(self.test_db)
     
     def tearDown(self):
         """Clean up test database"""
+        database.configure(self.original_db)
         if os.path.exists(self.test_db):
             os.remove(self.test_db)
     
@@ -51,8 +57,6 @@ class TestAuth(unittest.TestCase):
     
     def test_register_user_success(self):
         """Test successful user registration"""
-        # Note: This test uses the actual database
-        # In a real scenario, you'd mock the database connection
         result = register_user("testuser", "testpass")
         self.assertTrue(result)
     
@@ -0,0 +1,144 @@
+"""
+Test cases for backup module
+Tests online backups, rotation and restore
+"""
+import unittest
+import contextlib
+import io
+import os
+import threading
+import shutil
+import tempfile
+import database
+import backup
+from transactions import add_transaction, get_user_transactions
+
+class TestBackup(unittest.TestCase):
+    """Test cases for backup functions"""
+    
+    def setUp(self):
+        """Set up test database and backup directory"""
+        self.test_db = "test_finance.db"
+        if os.path.exists(self.test_db):
+            os.remove(self.test_db)
+        self.original_db = database.DB_PATH
+        database.configure(self.test_db)
+        database.init_db()
+        
+        self.original_backup_dir = backup.BACKUP_DIR
+        backup.BACKUP_DIR = tempfile.mkdtemp()
+        
+        from auth import register_user, login_user
+        register_user("test_backup_user", "testpass")
+        self.user_id = login_user("test_backup_user", "testpass")
+        add_transaction(self.user_id, "income", "Salary", 5000.0, "Pay", "2024-01-01")
+    
+    def tearDown(self):
+        """Clean up test database and backups"""
+        shutil.rmtree(backup.BACKUP_DIR)
+        backup.BACKUP_DIR = self.original_backup_dir
+        database.configure(self.original_db)
+        if os.path.exists(self.test_db):
+            os.remove(self.test_db)
+    
+    def test_backup_is_consistent_copy(self):
+        """Test that a backup passes the integrity check and has the data"""
+        path = backup.backup_db(pages=1, pause=0)
+        self.assertTrue(os.path.exists(path))
+        self.assertTrue(backup.check_integrity(path))
+        self.assertEqual([p for p, _, _ in backup.list_backups()], [path])
+        self.assertEqual(backup.get_backup_status()['percent'], 100.0)
+    
+    def test_backup_finishes_under_steady_writes(self):
+        """Test that a stepped backup restarted by writes falls back to one step"""
+        original_profile = database.STORAGE_PROFILE
+        self.addCleanup(database.configure, self.test_db, profile=original_profile)
+        database.configure(self.test_db, profile="journal")
+        for i in range(300):
+            add_transaction(self.user_id, "expense", "Food", 1.0, "x" * 200, "2024-01-02")
+        stop = threading.Event()
+        
+        def write():
+            while not stop.is_set():
+                add_transaction(self.user_id, "expense", "Food", 1.0, "Snack", "2024-01-03")
+        
+        original_restarts = backup.MAX_RESTARTS
+        backup.MAX_RESTARTS = 2
+        writer = threading.Thread(target=write)
+        writer.start()
+        output = io.StringIO()
+        try:
+            with contextlib.redirect_stdout(output):
+                path = backup.backup_db(pages=1, pause=0.002)
+        finally:
+            stop.set()
+            writer.join()
+            backup.MAX_RESTARTS = original_restarts
+        self.assertIn("restarted 3 times", output.getvalue())
+        self.assertTrue(backup.check_integrity(path))
+    
+    def test_background_backup(self):
+        """Test backup on the worker thread"""
+        self.assertTrue(backup.start_backup())
+        status = backup.wait_for_backup(timeout=30)
+        self.assertEqual(status['state'], 'done')
+        self.assertTrue(backup.check_integrity(status['path']))
+    
+    def test_backup_in_another_process(self):
+        """Test that a backup held by another worker blocks a second one and shows as running"""
+        # The lock another worker process would hold while backing up
+        with database.file_lock("backup") as acquired:
+            self.assertTrue(acquired)
+            self.assertFalse(backup.start_backup())
+            self.assertEqual(backup.get_backup_status()['state'], 'running')
+        self.assertTrue(backup.start_backup())
+        self.assertEqual(backup.wait_for_backup(timeout=30)['state'], 'done')
+        self.assertNotEqual(backup.get_backup_status()['state'], 'running')
+    
+    def test_rotation(self):
+        """Test that only the newest backups are kept"""
+        paths = [backup.backup_db(pause=0) for _ in range(4)]
+        removed = backup.rotate_backups(keep=2)
+        self.assertEqual(sorted(removed), sorted(paths[:2]))
+        self.assertEqual([p for p, _, _ in backup.list_backups()], paths[:1:-1])
+    
+    def test_restore(self):
+        """Test restoring while pooled connections are open"""
+        path = backup.backup_db(pause=0)
+        add_transaction(self.user_id, "expense", "Food", 100.0, "Lunch", "2024-01-02")
+        self.assertEqual(len(get_user_transactions(self.user_id)), 2)
+        
+        self.assertTrue(backup.restore_db(path))
+        self.assertEqual(len(get_user_transactions(self.user_id)), 1)
+        # The data replaced by the restore was backed up first
+        self.assertTrue(any("pre-restore" in p for p, _, _ in backup.list_backups()))
+    
+    def test_restore_oldest_at_keep_limit(self):
+        """Test that the pre-restore backup does not rotate out the backup being restored"""
+        original_keep = backup.KEEP_BACKUPS
+        backup.KEEP_BACKUPS = 3
+        try:
+            oldest = backup.backup_db(pause=0)
+            add_transaction(self.user_id, "expense", "Food", 100.0, "Lunch", "2024-01-02")
+            backup.backup_db(pause=0)
+            backup.backup_db(pause=0)
+            
+            self.assertTrue(backup.restore_db(oldest))
+            self.assertEqual(len(get_user_transactions(self.user_id)), 1)
+            paths = [p for p, _, _ in backup.list_backups()]
+            self.assertIn(oldest, paths)
+            self.assertTrue(any("pre-restore" in p for p in paths))
+        finally:
+            backup.KEEP_BACKUPS = original_keep
+    
+    def test_restore_rejects_damaged_backup(self):
+        """Test that a corrupt backup is not restored"""
+        damaged = os.path.join(backup.BACKUP_DIR, "finance-damaged.db")
+        with open(damaged, "wb") as f:
+            f.write(b"not a database" * 100)
+        
+        self.assertFalse(backup.restore_db(damaged))
+        self.assertEqual(len(get_user_transactions(self.user_id)), 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,159 @@
+"""
+Test cases for backup_chain module
+Tests base snapshots, deltas and replaying a chain
+"""
+import unittest
+import os
+import shutil
+import tempfile
+import database
+import backup
+import backup_chain
+from budget import set_budget, get_user_budgets
+from transactions import add_transaction, delete_transaction, update_transaction, get_user_transactions
+from rollups import verify_rollups
+from importer import import_transactions
+import io
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+class TestBackupChain(unittest.TestCase):
+    """Test cases for incremental backups"""
+    
+    def setUp(self):
+        """Set up test database and backup directory"""
+        self.test_db = "test_finance.db"
+        if os.path.exists(self.test_db):
+            os.remove(self.test_db)
+        self.original_db = database.DB_PATH
+        database.configure(self.test_db)
+        database.init_db()
+        
+        self.original_backup_dir = backup.BACKUP_DIR
+        backup.BACKUP_DIR = tempfile.mkdtemp()
+        
+        from auth import register_user, login_user
+        register_user("test_chain_user", "testpass")
+        self.user_id = login_user("test_chain_user", "testpass")
+        add_transaction(self.user_id, "income", "Salary", 5000.0, "Pay", "2024-01-01")
+        add_transaction(self.user_id, "expense", "Food", 100.0, "Lunch", "2024-01-02")
+    
+    def tearDown(self):
+        """Clean up test database and backups"""
+        shutil.rmtree(backup.BACKUP_DIR)
+        backup.BACKUP_DIR = self.original_backup_dir
+        database.configure(self.original_db)
+        if os.path.exists(self.test_db):
+            os.remove(self.test_db)
+    
+    def _change_log_size(self):
+        with database.get_connection() as conn:
+            return conn.execute("SELECT COUNT(*) FROM change_log").fetchone()[0]
+    
+    def test_no_logging_without_chain(self):
+        """Test that changes are not logged until a chain starts"""
+        add_transaction(self.user_id, "expense", "Food", 10.0, "Snack", "2024-01-03")
+        self.assertEqual(self._change_log_size(), 0)
+    
+    def test_first_backup_takes_base(self):
+        """Test that the first incremental backup is a compressed base"""
+        entry = backup_chain.backup_incremental()
+        self.assertTrue(entry['file'].startswith("base-"))
+        self.assertTrue(entry['file'].endswith(".db.gz"))
+        self.assertIsNone(backup_chain.backup_incremental())
+    
+    def test_delta_holds_only_changed_rows(self):
+        """Test that a delta records inserted, updated and deleted rows"""
+        backup_chain.backup_incremental()
+        rows = get_user_transactions(self.user_id)
+        add_transaction(self.user_id, "expense", "Rent", 900.0, "Flat", "2024-01-05")
+        update_transaction(rows[0][0], self.user_id, "expense", "Food", 120.0, "Dinner", "2024-01-02")
+        delete_transaction(rows[1][0], self.user_id)
+        
+        entry = backup_chain.backup_incremental()
+        self.assertTrue(entry['file'].startswith("delta-"))
+        self.assertEqual(entry['rows'], 3)
+        self.assertEqual(self._change_log_size(), 0)
+    
+    def test_restore_replays_deltas(self):
+        """Test that restoring base + deltas reproduces the data"""
+        backup_chain.backup_incremental()
+        add_transaction(self.user_id, "expense", "Rent", 900.0, "Flat", "2024-01-05")
+        set_budget(self.user_id, "Food", 500.0, "2024-01")
+        backup_chain.backup_incremental()
+        first = get_user_transactions(self.user_id)
+        delete_transaction(first[0][0], self.user_id)
+        backup_chain.backup_incremental()
+        expected = get_user_transactions(self.user_id)
+        
+        add_transaction(self.user_id, "expense", "Lost", 1.0, "Not backed up", "2024-01-06")
+        self.assertTrue(backup_chain.restore_chain())
+        self.assertEqual(get_user_transactions(self.user_id), expected)
+        self.assertEqual(len(get_user_budgets(self.user_id)), 1)
+        self.assertEqual(verify_rollups(), [])
+        
+        # Replaying only the first delta gives the earlier state
+        self.assertTrue(backup_chain.restore_chain(upto=1))
+        self.assertEqual(get_user_transactions(self.user_id), first)
+    
+    def test_restore_replays_reimport(self):
+        """Test that a row replacing a deleted one under a unique key replays"""
+        statement = "date,type,category,amount,description\n2024-01-09,expense,Food,42,Cafe\n"
+        import_transactions(self.user_id, io.StringIO(statement))
+        set_budget(self.user_id, "Food", 500.0, "2024-01")
+        backup_chain.backup_incremental()
+        
+        imported = [t for t in get_user_transactions(self.user_id) if t[5] == "Cafe"][0]
+        delete_transaction(imported[0], self.user_id)
+        self.assertEqual(import_transactions(self.user_id, io.StringIO(statement))['imported'], 1)
+        with database.get_connection() as conn:
+            conn.execute("DELETE FROM budgets WHERE user_id=?", (self.user_id,))
+        set_budget(self.user_id, "Food", 600.0, "2024-01")
+        backup_chain.backup_incremental()
+        expected = get_user_transactions(self.user_id)
+        
+        self.assertTrue(backup_chain.restore_chain())
+        self.assertEqual(get_user_transactions(self.user_id), expected)
+        self.assertEqual([b[2] for b in get_user_budgets(self.user_id)], [600.0])
+        self.assertEqual(verify_rollups(), [])
+    
+    def test_restore_starts_new_chain(self):
+        """Test that the backup after a restore is a new base"""
+        backup_chain.backup_incremental()
+        add_transaction(self.user_id, "expense", "Rent", 900.0, "Flat", "2024-01-05")
+        backup_chain.backup_incremental()
+        backup_chain.restore_chain()
+        add_transaction(self.user_id, "expense", "Food", 5.0, "Tea", "2024-01-06")
+        
+        entry = backup_chain.backup_incremental()
+        self.assertTrue(entry['file'].startswith("base-"))
+        self.assertEqual(len(backup_chain.load_manifest()['chains']), 2)
+    
+    @unittest.skipIf(zstandard is None, "zstandard is not installed")
+    def test_zstd_chain(self):
+        """Test a chain compressed with zstd"""
+        self.assertTrue(backup_chain.backup_incremental(compression="zstd")['file'].endswith(".zst"))
+        add_transaction(self.user_id, "expense", "Rent", 900.0, "Flat", "2024-01-05")
+        self.assertTrue(backup_chain.backup_incremental()['file'].endswith(".jsonl.zst"))
+        expected = get_user_transactions(self.user_id)
+        
+        self.assertTrue(backup_chain.restore_chain())
+        self.assertEqual(get_user_transactions(self.user_id), expected)
+    
+    def test_corrupt_artifact_is_rejected(self):
+        """Test that a checksum mismatch stops the restore"""
+        backup_chain.backup_incremental()
+        add_transaction(self.user_id, "expense", "Rent", 900.0, "Flat", "2024-01-05")
+        entry = backup_chain.backup_incremental()
+        with open(os.path.join(backup_chain.chain_dir(), entry['file']), "ab") as f:
+            f.write(b"garbage")
+        
+        with self.assertRaises(ValueError):
+            backup_chain.restore_chain()
+        self.assertEqual(len(get_user_transactions(self.user_id)), 3)
+
+if __name__ == "__main__":
+    unittest.main()
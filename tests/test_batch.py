@@ -0,0 +1,116 @@
+"""
+Test cases for batch module
+Tests report precomputation, cache invalidation and resuming a run
+"""
+import unittest
+import argparse
+import os
+import database
+from database import get_connection
+from batch import precompute_reports, get_cached_report, _start_run, month_arg
+from budget import set_budget
+from reports import get_monthly_report_data, get_yearly_report_data
+from transactions import add_transaction
+
+class TestBatch(unittest.TestCase):
+    """Test cases for precomputed reports"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.test_db = "test_finance.db"
+        if os.path.exists(self.test_db):
+            os.remove(self.test_db)
+        self.original_db = database.DB_PATH
+        database.configure(self.test_db)
+        database.init_db()
+
+        from auth import register_user, login_user
+        self.user_ids = []
+        for i in range(5):
+            register_user(f"test_batch_user{i}", "testpass")
+            user_id = login_user(f"test_batch_user{i}", "testpass")
+            add_transaction(user_id, "income", "Salary", 1000.0 * (i + 1), "", "2024-01-01")
+            add_transaction(user_id, "expense", "Food", 100.0, "", "2024-01-10")
+            set_budget(user_id, "Food", 50.0, "2024-01")
+            self.user_ids.append(user_id)
+
+    def tearDown(self):
+        """Clean up test database"""
+        database.configure(self.original_db)
+        if os.path.exists(self.test_db):
+            os.remove(self.test_db)
+
+    def test_precompute_matches_live_reports(self):
+        """Test that cached reports equal freshly computed ones"""
+        result = precompute_reports("2024-01", workers=0, chunk_size=2, quiet=True)
+        self.assertEqual(result['stored'], 5)
+
+        user_id = self.user_ids[2]
+        monthly = get_cached_report(user_id, "monthly", "2024-01")
+        self.assertEqual(monthly['income'], 3000.0)
+        self.assertEqual(monthly['savings'], get_monthly_report_data(user_id, "2024-01")['savings'])
+        self.assertEqual(get_cached_report(user_id, "yearly", "2024")['expense'],
+                         get_yearly_report_data(user_id, "2024")['expense'])
+        budget = get_cached_report(user_id, "budget", "2024-01")
+        self.assertTrue(budget[0]['exceeded'])
+
+    def test_process_pool(self):
+        """Test that worker processes compute every user's reports"""
+        result = precompute_reports("2024-01", workers=2, chunk_size=2, quiet=True)
+        self.assertEqual(result['users'], 5)
+        for user_id in self.user_ids:
+            self.assertIsNotNone(get_cached_report(user_id, "monthly", "2024-01"))
+
+    def test_changes_invalidate_cache(self):
+        """Test that new transactions and budgets drop stale reports"""
+        precompute_reports("2024-01", workers=0, quiet=True)
+        user_id = self.user_ids[0]
+
+        set_budget(user_id, "Food", 500.0, "2024-01")
+        self.assertIsNone(get_cached_report(user_id, "budget", "2024-01"))
+        self.assertIsNotNone(get_cached_report(user_id, "monthly", "2024-01"))
+
+        add_transaction(user_id, "expense", "Food", 10.0, "", "2024-01-11")
+        self.assertIsNone(get_cached_report(user_id, "monthly", "2024-01"))
+        self.assertIsNotNone(get_cached_report(self.user_ids[1], "monthly", "2024-01"))
+
+    def test_resume(self):
+        """Test that resuming only computes users the interrupted run left"""
+        # An interrupted run that claimed every user and then stopped
+        run_id, users = _start_run("2024-01", "2024", resume=False)
+        self.assertEqual(len(users), 5)
+        with get_connection() as conn:
+            conn.execute("DELETE FROM report_cache WHERE kind='claim' AND user_id IN (?, ?)",
+                         (self.user_ids[0], self.user_ids[1]))
+
+        result = precompute_reports("2024-01", workers=0, resume=True, quiet=True)
+        self.assertEqual(result['run_id'], run_id)
+        self.assertEqual(result['users'], 3)
+        self.assertIsNone(get_cached_report(self.user_ids[0], "monthly", "2024-01"))
+        self.assertIsNotNone(get_cached_report(self.user_ids[4], "monthly", "2024-01"))
+
+        # The run is finished, so the next resume starts over
+        self.assertEqual(precompute_reports("2024-01", workers=0, resume=True, quiet=True)['users'], 5)
+
+    def test_change_during_run_is_not_overwritten(self):
+        """Test that a report computed before a change is not stored"""
+        run_id, users = _start_run("2024-01", "2024", resume=False)
+        add_transaction(self.user_ids[3], "expense", "Food", 10.0, "", "2024-01-12")
+
+        result = precompute_reports("2024-01", workers=0, resume=True, quiet=True)
+        self.assertEqual(result['users'], 4)
+        self.assertIsNone(get_cached_report(self.user_ids[3], "monthly", "2024-01"))
+
+    def test_unpadded_month(self):
+        """Test that a month given as '2024-1' is stored under the period the app reads"""
+        precompute_reports("2024-1", 2024, workers=0, quiet=True)
+        self.assertIsNotNone(get_cached_report(self.user_ids[0], "monthly", "2024-01"))
+        self.assertIsNotNone(get_cached_report(self.user_ids[0], "budget", "2024-01"))
+        self.assertIsNotNone(get_cached_report(self.user_ids[0], "yearly", "2024"))
+        self.assertEqual(month_arg("2024-3"), "2024-03")
+        for value in ("2024-13", "March", "2024"):
+            with self.assertRaises(argparse.ArgumentTypeError):
+                month_arg(value)
+
+if __name__ == '__main__':
+    unittest.main()
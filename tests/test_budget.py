@@ -3,14 +3,24 @@ Test cases for budget module
 Tests budget setting and checking functionality
 """
 import unittest
+import os
 from datetime import date
-from budget import set_budget, get_user_budgets, get_budget_status
+import database
+from budget import set_budget, get_user_budgets, get_budget_status, get_yearly_budget_status
 
 class TestBudget(unittest.TestCase):
     """Test cases for budget functions"""
     
     def setUp(self):
         """Set up test data"""
+        # Use a throwaway database instead of finance.db
+        self.test_db = "test_finance.db"
+        if os.path.exists(self.test_db):
+            os.remove(self.test_db)
+        self.original_db = database.DB_PATH
+        database.configure(self.test_db)
+        database.init_db()
+        
         # Create a test user first
         from auth import register_user
         register_user("test_budget_user", "testpass")
@@ -22,6 +32,12 @@ class TestBudget(unittest.TestCase):
         current_month = date.today().strftime("%Y-%m")
         add_transaction(self.user_id, "expense", "Food", 1500.0, "Test expense")
     
+    def tearDown(self):
+        """Clean up test database"""
+        database.configure(self.original_db)
+        if os.path.exists(self.test_db):
+            os.remove(self.test_db)
+    
     def test_set_budget(self):
         """Test setting a budget"""
         current_month = date.today().strftime("%Y-%m")
@@ -57,6 +73,36 @@ class TestBudget(unittest.TestCase):
             self.assertIn('percentage', budget)
             self.assertIn('exceeded', budget)
 
+    def test_budget_status_values(self):
+        """Test spent, remaining and exceeded for several categories"""
+        current_month = date.today().strftime("%Y-%m")
+        set_budget(self.user_id, "Food", 1000.0, current_month)
+        set_budget(self.user_id, "Rent", 5000.0, current_month)
+        status = get_budget_status(self.user_id, current_month)
+        
+        self.assertEqual([b['category'] for b in status], ["Food", "Rent"])
+        food, rent = status
+        self.assertEqual(food['spent'], 1500.0)
+        self.assertEqual(food['remaining'], -500.0)
+        self.assertTrue(food['exceeded'])
+        self.assertEqual(food['percentage'], 150.0)
+        self.assertEqual(rent['spent'], 0)
+        self.assertFalse(rent['exceeded'])
+    
+    def test_get_yearly_budget_status(self):
+        """Test budget status for a whole year in one call"""
+        current_month = date.today().strftime("%Y-%m")
+        year = date.today().year
+        set_budget(self.user_id, "Food", 2000.0, current_month)
+        set_budget(self.user_id, "Food", 300.0, f"{year}-01")
+        set_budget(self.user_id, "Food", 300.0, f"{year - 1}-12")
+        status = get_yearly_budget_status(self.user_id, year)
+        
+        self.assertNotIn(f"{year - 1}-12", status)
+        self.assertEqual(status[current_month], get_budget_status(self.user_id, current_month))
+        if current_month != f"{year}-01":
+            self.assertEqual(status[f"{year}-01"][0]['spent'], 0)
+
 if __name__ == "__main__":
     unittest.main()
 
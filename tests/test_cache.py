@@ -0,0 +1,213 @@
+"""
+Test cases for cache module
+Tests LRU and TTL behaviour, write invalidation and the shared table
+"""
+import unittest
+import os
+import time
+import io
+import database
+from cache import ReportCache, cached, get_cache_stats, get_data_version
+from budget import set_budget, get_budget_status
+from reports import get_monthly_report_data, get_yearly_report_data
+from transactions import add_transaction, update_transaction, delete_transaction, get_user_transactions
+from importer import import_transactions
+
+class TestReportCache(unittest.TestCase):
+    """Test cases for the in-memory LRU"""
+
+    def setUp(self):
+        """Set up test database"""
+        self.test_db = "test_finance.db"
+        if os.path.exists(self.test_db):
+            os.remove(self.test_db)
+        self.original_db = database.DB_PATH
+        database.configure(self.test_db)
+        database.init_db()
+
+    def tearDown(self):
+        """Clean up test database"""
+        database.configure(self.original_db)
+        if os.path.exists(self.test_db):
+            os.remove(self.test_db)
+
+    def test_lru_eviction(self):
+        """Test that the least recently used entry is evicted"""
+        lru = ReportCache(maxsize=2, ttl=60, shared=False)
+        lru.get_or_compute((1, "monthly", "2024-01"), lambda: "a")
+        lru.get_or_compute((1, "monthly", "2024-02"), lambda: "b")
+        lru.get_or_compute((1, "monthly", "2024-01"), lambda: "x")
+        lru.get_or_compute((1, "monthly", "2024-03"), lambda: "c")
+
+        self.assertEqual(lru.get_or_compute((1, "monthly", "2024-01"), lambda: "x"), "a")
+        self.assertEqual(lru.get_or_compute((1, "monthly", "2024-02"), lambda: "new"), "new")
+        stats = lru.stats()
+        self.assertEqual(stats['hits'], 2)
+        self.assertEqual(stats['misses'], 4)
+        self.assertEqual(stats['evictions'], 2)
+
+    def test_ttl(self):
+        """Test that expired entries are recomputed"""
+        lru = ReportCache(maxsize=10, ttl=0.05, shared=False)
+        lru.get_or_compute((1, "yearly", "2024"), lambda: "old")
+        time.sleep(0.1)
+        self.assertEqual(lru.get_or_compute((1, "yearly", "2024"), lambda: "new"), "new")
+
+    def test_invalidation_during_compute_is_not_cached(self):
+        """Test that a value computed across an invalidation is not kept"""
+        lru = ReportCache(maxsize=10, ttl=60, shared=False)
+        key = (1, "monthly", "2024-01")
+
+        def compute():
+            lru.invalidate([key])
+            return "stale"
+
+        self.assertEqual(lru.get_or_compute(key, compute), "stale")
+        self.assertEqual(lru.get_or_compute(key, lambda: "fresh"), "fresh")
+
+class TestReportInvalidation(unittest.TestCase):
+    """Test cases for invalidation by writes"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.test_db = "test_finance.db"
+        if os.path.exists(self.test_db):
+            os.remove(self.test_db)
+        self.original_db = database.DB_PATH
+        database.configure(self.test_db)
+        database.init_db()
+
+        from auth import register_user, login_user
+        register_user("test_cache_user", "testpass")
+        self.user_id = login_user("test_cache_user", "testpass")
+        add_transaction(self.user_id, "expense", "Food", 100.0, "", "2024-01-10")
+        add_transaction(self.user_id, "expense", "Food", 200.0, "", "2024-02-10")
+
+    def tearDown(self):
+        """Clean up test database"""
+        database.configure(self.original_db)
+        if os.path.exists(self.test_db):
+            os.remove(self.test_db)
+
+    def monthly(self, month):
+        return cached("monthly", self.user_id, month, get_monthly_report_data)['expense']
+
+    def test_add_invalidates_only_its_period(self):
+        """Test that a new transaction drops its month's report but not others"""
+        self.assertEqual(self.monthly("2024-01"), 100.0)
+        self.assertEqual(self.monthly("2024-02"), 200.0)
+        misses = get_cache_stats()['misses']
+
+        add_transaction(self.user_id, "expense", "Food", 50.0, "", "2024-01-15")
+        self.assertEqual(self.monthly("2024-01"), 150.0)
+        self.assertEqual(self.monthly("2024-02"), 200.0)
+        # Only January is recomputed; February comes from the shared table
+        self.assertEqual(get_cache_stats()['misses'], misses + 1)
+        self.assertEqual(cached("yearly", self.user_id, "2024", get_yearly_report_data)['expense'], 350.0)
+
+    def test_unpadded_period_is_invalidated(self):
+        """Test that periods written differently share the key that writes drop"""
+        self.assertEqual(self.monthly("2024-1"), 100.0)
+        hits = get_cache_stats()['hits']
+        self.assertEqual(self.monthly("2024-01-31"), 100.0)
+        self.assertEqual(get_cache_stats()['hits'], hits + 1)
+
+        add_transaction(self.user_id, "expense", "Food", 50.0, "", "2024-01-15")
+        self.assertEqual(self.monthly("2024-1"), 150.0)
+        self.assertEqual(cached("yearly", self.user_id, 2024, get_yearly_report_data)['expense'], 350.0)
+
+    def test_update_and_delete_invalidate(self):
+        """Test that moving and deleting a transaction refresh both months"""
+        self.assertEqual(self.monthly("2024-01"), 100.0)
+        self.assertEqual(self.monthly("2024-02"), 200.0)
+
+        january = [t for t in get_user_transactions(self.user_id) if t[4] == "2024-01-10"][0]
+        update_transaction(january[0], self.user_id, "expense", "Food", 100.0, "", "2024-02-11")
+        self.assertEqual(self.monthly("2024-01"), 0.0)
+        self.assertEqual(self.monthly("2024-02"), 300.0)
+
+        delete_transaction(january[0], self.user_id)
+        self.assertEqual(self.monthly("2024-02"), 200.0)
+
+    def test_budget_and_import_invalidate(self):
+        """Test that budgets and imports refresh the budget status"""
+        status = cached("budget", self.user_id, "2024-01", get_budget_status)
+        self.assertEqual(status, [])
+
+        set_budget(self.user_id, "Food", 50.0, "2024-01")
+        status = cached("budget", self.user_id, "2024-01", get_budget_status)
+        self.assertEqual(status[0]['spent'], 100.0)
+
+        import_transactions(self.user_id, io.StringIO(
+            "date,type,category,amount,description\n2024-01-20,expense,Food,25,Lunch\n"))
+        status = cached("budget", self.user_id, "2024-01", get_budget_status)
+        self.assertEqual(status[0]['spent'], 125.0)
+
+    def test_shared_table(self):
+        """Test that another process's cache finds reports in the table"""
+        self.assertEqual(self.monthly("2024-01"), 100.0)
+
+        # A fresh in-memory cache, as in another worker process
+        other = ReportCache(maxsize=10, ttl=60, shared=True)
+        value = other.get_or_compute((self.user_id, "monthly", "2024-01"), lambda: None)
+        self.assertEqual(value['expense'], 100.0)
+        self.assertEqual(other.stats()['shared_hits'], 1)
+
+        # The trigger drops the shared row when the data changes
+        add_transaction(self.user_id, "expense", "Food", 1.0, "", "2024-01-11")
+        other = ReportCache(maxsize=10, ttl=60, shared=True)
+        self.assertIsNone(other.get_or_compute((self.user_id, "monthly", "2024-01"), lambda: None))
+
+    def test_write_from_another_process(self):
+        """Test that a memory entry is not served after another process changes the data"""
+        self.assertEqual(self.monthly("2024-01"), 100.0)
+        # A write this process's invalidation never hears about
+        with database.get_connection() as conn:
+            conn.execute("UPDATE transactions SET amount_minor = 15000 WHERE user_id = ? AND day = 20240110",
+                         (self.user_id,))
+        self.assertEqual(self.monthly("2024-01"), 150.0)
+
+    def test_write_during_compute_is_not_shared(self):
+        """Test that a report overtaken by another process's write is not written to the table"""
+        def compute():
+            report = get_monthly_report_data(self.user_id, "2024-01")
+            # Another worker commits a change while this one computes
+            with database.get_connection() as conn:
+                conn.execute("UPDATE transactions SET amount_minor = 15000 "
+                             "WHERE user_id = ? AND day = 20240110", (self.user_id,))
+            return report
+
+        worker = ReportCache(maxsize=10, ttl=60, shared=True)
+        self.assertEqual(worker.get_or_compute((self.user_id, "monthly", "2024-01"), compute)['expense'],
+                         100.0)
+        fresh = ReportCache(maxsize=10, ttl=60, shared=True)
+        value = fresh.get_or_compute((self.user_id, "monthly", "2024-01"),
+                                     lambda: get_monthly_report_data(self.user_id, "2024-01"))
+        self.assertEqual(value['expense'], 150.0)
+        self.assertEqual(worker.get_or_compute((self.user_id, "monthly", "2024-01"), lambda: None)['expense'],
+                         150.0)
+
+    def test_configure_clears_cache(self):
+        """Test that pointing at another database forgets cached reports"""
+        self.assertEqual(self.monthly("2024-01"), 100.0)
+        hits = get_cache_stats()['hits']
+        database.configure(self.test_db)
+        # Served from the database's table, not from memory
+        self.assertEqual(self.monthly("2024-01"), 100.0)
+        self.assertEqual(get_cache_stats()['hits'], hits)
+
+    def test_data_version(self):
+        """Test that every transaction or budget change bumps the user's version"""
+        version, updated_at = get_data_version(self.user_id)
+        self.assertEqual(version, 2)
+
+        set_budget(self.user_id, "Food", 50.0, "2024-01")
+        january = [t for t in get_user_transactions(self.user_id) if t[4] == "2024-01-10"][0]
+        update_transaction(january[0], self.user_id, "expense", "Food", 90.0, "", "2024-01-10")
+        delete_transaction(january[0], self.user_id)
+        self.assertEqual(get_data_version(self.user_id)[0], 5)
+        self.assertGreaterEqual(get_data_version(self.user_id)[1], updated_at)
+        self.assertEqual(get_data_version(self.user_id + 1), (0, None))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+"""
+Test cases for cashflow module
+Tests that the daily cash-flow timeline follows every write
+"""
+import unittest
+import os
+import database
+from cashflow import get_cashflow, get_recent_cashflow, get_balance, get_month_cashflow
+from rollups import verify_cashflow, rebuild_cashflow
+from transactions import add_transaction, update_transaction, delete_transaction, get_user_transactions
+
+class TestCashflow(unittest.TestCase):
+    """Test cases for the daily cash-flow timeline"""
+    
+    def setUp(self):
+        """Set up test data"""
+        self.test_db = "test_finance.db"
+        if os.path.exists(self.test_db):
+            os.remove(self.test_db)
+        self.original_db = database.DB_PATH
+        database.configure(self.test_db)
+        database.init_db()
+        
+        from auth import register_user, login_user
+        register_user("test_cashflow_user", "testpass")
+        self.user_id = login_user("test_cashflow_user", "testpass")
+        
+        add_transaction(self.user_id, "income", "Salary", 1000.0, "Pay", "2024-01-01")
+        add_transaction(self.user_id, "expense", "Food", 100.0, "Lunch", "2024-01-05")
+        add_transaction(self.user_id, "expense", "Rent", 500.0, "Flat", "2024-02-01")
+    
+    def tearDown(self):
+        """Clean up test database"""
+        database.configure(self.original_db)
+        if os.path.exists(self.test_db):
+            os.remove(self.test_db)
+    
+    def test_running_balance(self):
+        """Test daily totals and the running balance"""
+        self.assertEqual(get_cashflow(self.user_id), [
+            ("2024-01-01", 1000.0, 0.0, 1000.0, 1000.0),
+            ("2024-01-05", 0.0, 100.0, -100.0, 900.0),
+            ("2024-02-01", 0.0, 500.0, -500.0, 400.0),
+        ])
+        self.assertEqual(get_balance(self.user_id), 400.0)
+        self.assertEqual(get_balance(self.user_id, "2024-01-31"), 900.0)
+        self.assertEqual(get_recent_cashflow(self.user_id, days=1)[0][0], "2024-02-01")
+    
+    def test_backdated_insert_moves_later_balances(self):
+        """Test that an earlier transaction shifts every later balance"""
+        add_transaction(self.user_id, "expense", "Gift", 50.0, "", "2024-01-03")
+        self.assertEqual([row[4] for row in get_cashflow(self.user_id)],
+                         [1000.0, 950.0, 850.0, 350.0])
+        self.assertEqual(verify_cashflow(), [])
+    
+    def test_update_and_delete(self):
+        """Test that moving and deleting transactions keep the timeline exact"""
+        lunch = [t for t in get_user_transactions(self.user_id) if t[5] == "Lunch"][0]
+        update_transaction(lunch[0], self.user_id, "expense", "Food", 150.0, "Lunch", "2024-02-10")
+        self.assertEqual([(row[0], row[4]) for row in get_cashflow(self.user_id)], [
+            ("2024-01-01", 1000.0),
+            ("2024-02-01", 500.0),
+            ("2024-02-10", 350.0),
+        ])
+        
+        delete_transaction(lunch[0], self.user_id)
+        self.assertEqual([(row[0], row[4]) for row in get_cashflow(self.user_id)], [
+            ("2024-01-01", 1000.0),
+            ("2024-02-01", 500.0),
+        ])
+        self.assertEqual(verify_cashflow(), [])
+    
+    def test_month_cashflow(self):
+        """Test opening and closing balances for a month"""
+        february = get_month_cashflow(self.user_id, "2024-02")
+        self.assertEqual(february['opening'], 900.0)
+        self.assertEqual(february['closing'], 400.0)
+        self.assertEqual(len(february['days']), 1)
+        
+        march = get_month_cashflow(self.user_id, "2024-03")
+        self.assertEqual((march['opening'], march['closing'], march['days']), (400.0, 400.0, []))
+    
+    def test_import_newest_first(self):
+        """Test that a bulk import recomputes the timeline once and exactly"""
+        import io
+        from importer import import_transactions
+        statement = io.StringIO("date,amount,category\n"
+                                "2024-01-20,-30.00,Food\n"
+                                "2024-01-04,-20.00,Food\n"
+                                "2023-12-31,200.00,Gift\n")
+        import_transactions(self.user_id, statement, batch_size=2)
+        
+        self.assertEqual(verify_cashflow(), [])
+        self.assertEqual(get_balance(self.user_id), 550.0)
+        with database.get_connection() as conn:
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM cashflow_deferred").fetchone()[0], 0)
+    
+    def test_rebuild_repairs_drift(self):
+        """Test that rebuild recomputes a tampered timeline"""
+        with database.get_connection() as conn:
+            conn.execute("UPDATE daily_cashflow SET balance = 0")
+        self.assertEqual(len(verify_cashflow()), 6)
+        
+        rebuild_cashflow()
+        self.assertEqual(verify_cashflow(), [])
+
+if __name__ == "__main__":
+    unittest.main()
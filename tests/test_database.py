@@ -0,0 +1,219 @@
+"""
+Test cases for database module
+Tests the pooled connection layer, migrations and query plans
+"""
+import unittest
+import os
+import threading
+import database
+from utils import month_range, year_range
+
+class TestConnectionPool(unittest.TestCase):
+    """Test cases for the connection pool"""
+    
+    def setUp(self):
+        """Set up test database"""
+        self.test_db = "test_finance.db"
+        if os.path.exists(self.test_db):
+            os.remove(self.test_db)
+        self.original_db = database.DB_PATH
+        database.configure(self.test_db, pool_size=2)
+        database.init_db()
+    
+    def tearDown(self):
+        """Clean up test database"""
+        database.configure(self.original_db, pool_size=5)
+        if os.path.exists(self.test_db):
+            os.remove(self.test_db)
+    
+    def test_connection_is_reused(self):
+        """Test that a released connection is handed out again"""
+        with database.get_connection() as conn:
+            first = conn
+        with database.get_connection() as conn:
+            second = conn
+        self.assertIs(first, second)
+        self.assertEqual(database.get_pool_stats()['open_connections'], 1)
+    
+    def test_commit_and_rollback(self):
+        """Test that the context manager commits or rolls back"""
+        with database.get_connection() as conn:
+            conn.execute("INSERT INTO budgets (user_id, category, limit_minor, month) VALUES (1, 'Food', 10, '2024-01')")
+        try:
+            with database.get_connection() as conn:
+                conn.execute("INSERT INTO budgets (user_id, category, limit_minor, month) VALUES (1, 'Rent', 10, '2024-01')")
+                raise ValueError("boom")
+        except ValueError:
+            pass
+        with database.get_connection() as conn:
+            count = conn.execute("SELECT COUNT(*) FROM budgets").fetchone()[0]
+        self.assertEqual(count, 1)
+    
+    def test_pool_is_bounded(self):
+        """Test that concurrent threads never open more than the pool size"""
+        def worker():
+            for _ in range(20):
+                with database.get_connection() as conn:
+                    conn.execute("SELECT COUNT(*) FROM transactions").fetchone()
+        
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        
+        stats = database.get_pool_stats()
+        self.assertLessEqual(stats['open_connections'], 2)
+        self.assertEqual(stats['in_use'], 0)
+        self.assertGreaterEqual(stats['checkouts'], 160)
+
+    def test_storage_profiles(self):
+        """Test that profile PRAGMAs are applied to new connections"""
+        with database.get_connection() as conn:
+            self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+            self.assertEqual(conn.execute("PRAGMA synchronous").fetchone()[0], 2)
+        
+        database.configure(profile="fast")
+        try:
+            with database.get_connection() as conn:
+                self.assertEqual(conn.execute("PRAGMA synchronous").fetchone()[0], 1)
+                self.assertEqual(conn.execute("PRAGMA busy_timeout").fetchone()[0], 30000)
+            self.assertEqual(database.get_pool_stats()['profile'], "fast")
+        finally:
+            database.configure(profile="durable")
+        
+        with self.assertRaises(ValueError):
+            database.configure(profile="reckless")
+
+class TestMigrations(unittest.TestCase):
+    """Test cases for schema migrations and the indexes they create"""
+    
+    def setUp(self):
+        """Set up test database"""
+        self.test_db = "test_finance.db"
+        if os.path.exists(self.test_db):
+            os.remove(self.test_db)
+        self.original_db = database.DB_PATH
+        database.configure(self.test_db, pool_size=1)
+        database.init_db()
+        
+        from auth import register_user, login_user
+        register_user("test_plan_user", "testpass")
+        self.user_id = login_user("test_plan_user", "testpass")
+    
+    def tearDown(self):
+        """Clean up test database"""
+        database.configure(self.original_db, pool_size=5)
+        if os.path.exists(self.test_db):
+            os.remove(self.test_db)
+    
+    def test_schema_version(self):
+        """Test that all migrations are applied once"""
+        with database.get_connection() as conn:
+            version = database.get_schema_version(conn)
+            self.assertEqual(version, database.MIGRATIONS[-1][0])
+            self.assertEqual(database.migrate(conn), version)
+    
+    def test_budget_unique_per_month(self):
+        """Test that setting a budget twice keeps a single row"""
+        from budget import set_budget, get_user_budgets
+        set_budget(self.user_id, "Food", 100.0, "2024-01")
+        set_budget(self.user_id, "Food", 250.0, "2024-01")
+        budgets = get_user_budgets(self.user_id, "2024-01")
+        self.assertEqual(len(budgets), 1)
+        self.assertEqual(budgets[0][2], 250.0)
+    
+    def test_legacy_rows_are_converted(self):
+        """Test that REAL amounts and text dates migrate to integers"""
+        legacy_db = "test_legacy.db"
+        if os.path.exists(legacy_db):
+            os.remove(legacy_db)
+        database.configure(legacy_db)
+        try:
+            with database.get_connection() as conn:
+                conn.execute("CREATE TABLE transactions (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, type TEXT, category TEXT, amount REAL, date TEXT, description TEXT)")
+                conn.execute("CREATE TABLE budgets (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, category TEXT, monthly_limit REAL, month TEXT)")
+                conn.execute("INSERT INTO transactions (user_id, type, category, amount, date, description) VALUES (1, 'expense', 'Food', 19.99, '2024-03-05', 'Lunch')")
+                conn.execute("INSERT INTO budgets (user_id, category, monthly_limit, month) VALUES (1, 'Food', 150.5, '2024-03')")
+            database.init_db()
+            with database.get_connection() as conn:
+                row = conn.execute("SELECT amount_minor, day FROM transactions").fetchone()
+                limit = conn.execute("SELECT limit_minor FROM budgets").fetchone()[0]
+            self.assertEqual(row, (1999, 20240305))
+            self.assertEqual(limit, 15050)
+        finally:
+            database.configure(self.test_db, pool_size=1)
+            if os.path.exists(legacy_db):
+                os.remove(legacy_db)
+    
+    def test_period_ranges(self):
+        """Test month and year range boundaries"""
+        self.assertEqual(month_range("2024-01"), (20240101, 20240201))
+        self.assertEqual(month_range("2024-12"), (20241201, 20250101))
+        self.assertEqual(year_range("2024"), (20240101, 20250101))
+    
+    def test_hot_queries_use_indexes(self):
+        """Test that report, summary and budget queries never scan a whole table"""
+        from transactions import add_transaction, get_user_summary, get_user_transactions
+        from reports import get_monthly_report_data, get_yearly_report_data
+        from budget import set_budget, get_budget_status, get_yearly_budget_status
+        
+        add_transaction(self.user_id, "expense", "Food", 10.0, "Lunch")
+        set_budget(self.user_id, "Food", 100.0, "2024-01")
+        
+        statements = []
+        with database.get_connection() as conn:
+            conn.set_trace_callback(statements.append)
+        try:
+            get_user_summary(self.user_id)
+            get_user_transactions(self.user_id)
+            get_monthly_report_data(self.user_id, "2024-01")
+            get_yearly_report_data(self.user_id, "2024")
+            get_budget_status(self.user_id, "2024-01")
+            get_yearly_budget_status(self.user_id, "2024")
+        finally:
+            with database.get_connection() as conn:
+                conn.set_trace_callback(None)
+        
+        selects = [s for s in statements if s.lstrip().upper().startswith("SELECT")]
+        self.assertGreaterEqual(len(selects), 6)
+        with database.get_connection() as conn:
+            for sql in selects:
+                plan = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql)]
+                for step in plan:
+                    self.assertFalse(
+                        step.startswith(("SCAN transactions", "SCAN budgets", "SCAN monthly_rollups")),
+                        f"Full table scan in plan {plan} for: {sql}"
+                    )
+    
+    def test_transaction_pages_avoid_sorting(self):
+        """Test that every filtered page is read in index order without a sort step"""
+        from transactions import add_transaction, get_transactions_page
+        add_transaction(self.user_id, "expense", "Food", 10.0, "Lunch", "2024-01-05")
+        add_transaction(self.user_id, "expense", "Food", 12.0, "Lunch", "2024-01-06")
+        
+        statements = []
+        with database.get_connection() as conn:
+            conn.set_trace_callback(statements.append)
+        try:
+            for filters in [{}, {"t_type": "expense"}, {"category": "Food"},
+                            {"t_type": "expense", "category": "Food"},
+                            {"start_date": "2024-01-01", "end_date": "2024-01-31"}]:
+                get_transactions_page(self.user_id, page_size=1, cursor="20240106-99", **filters)
+        finally:
+            with database.get_connection() as conn:
+                conn.set_trace_callback(None)
+        
+        selects = [s for s in statements if s.lstrip().upper().startswith("SELECT")]
+        self.assertEqual(len(selects), 5)
+        with database.get_connection() as conn:
+            for sql in selects:
+                plan = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql)]
+                for step in plan:
+                    self.assertFalse(
+                        step.startswith("SCAN") or "TEMP B-TREE" in step,
+                        f"Page query is not an ordered index range in {plan} for: {sql}"
+                    )
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+"""
+Test cases for export module
+Tests streaming CSV, JSONL and Parquet export
+"""
+import unittest
+import csv
+import io
+import json
+import os
+import database
+from export import stream_csv, stream_jsonl, write_parquet, format_minor, iter_transactions, iter_report_rows
+from transactions import add_transaction
+
+try:
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+class TestExport(unittest.TestCase):
+    """Test cases for export functions"""
+    
+    def setUp(self):
+        """Set up test data"""
+        self.test_db = "test_finance.db"
+        if os.path.exists(self.test_db):
+            os.remove(self.test_db)
+        self.original_db = database.DB_PATH
+        database.configure(self.test_db)
+        database.init_db()
+        
+        from auth import register_user, login_user
+        register_user("test_export_user", "testpass")
+        self.user_id = login_user("test_export_user", "testpass")
+        
+        add_transaction(self.user_id, "income", "Salary", 5000.0, "Pay", "2024-01-01")
+        add_transaction(self.user_id, "expense", "Food", 120.5, 'Lunch, with "friends"', "2024-01-02")
+        add_transaction(self.user_id, "expense", "Food", 0.05, "Candy", "2024-02-03")
+    
+    def tearDown(self):
+        """Clean up test database"""
+        database.configure(self.original_db)
+        if os.path.exists(self.test_db):
+            os.remove(self.test_db)
+    
+    def test_format_minor(self):
+        """Test exact amount formatting"""
+        self.assertEqual(format_minor(-1050), "-10.50")
+        self.assertEqual(format_minor(5), "0.05")
+    
+    def test_stream_csv(self):
+        """Test that CSV export round-trips every transaction in date order"""
+        text = "".join(stream_csv("transactions", self.user_id))
+        rows = list(csv.DictReader(io.StringIO(text)))
+        self.assertEqual([r['date'] for r in rows], ["2024-01-01", "2024-01-02", "2024-02-03"])
+        self.assertEqual(rows[1]['description'], 'Lunch, with "friends"')
+        self.assertEqual(rows[2]['amount'], "0.05")
+    
+    def test_stream_jsonl_date_range(self):
+        """Test JSONL export with a date range"""
+        text = "".join(stream_jsonl("transactions", self.user_id, "2024-01-02", "2024-01-31"))
+        records = [json.loads(line) for line in text.splitlines()]
+        self.assertEqual(len(records), 1)
+        self.assertEqual(records[0]['amount'], "120.50")
+    
+    def test_stream_reports(self):
+        """Test export of monthly totals"""
+        text = "".join(stream_csv("reports", self.user_id))
+        rows = list(csv.DictReader(io.StringIO(text)))
+        self.assertEqual([(r['month'], r['type'], r['total']) for r in rows], [
+            ("2024-01", "expense", "120.50"),
+            ("2024-01", "income", "5000.00"),
+            ("2024-02", "expense", "0.05"),
+        ])
+    
+    def test_chunks_release_connection(self):
+        """Test that a suspended export holds no pooled connection between chunks"""
+        add_transaction(self.user_id, "expense", "Food", 1.0, "Same day", "2024-01-02")
+        self.addCleanup(database.configure, pool_size=database.POOL_SIZE)
+        database.configure(pool_size=1)
+        database.get_pool().timeout = 0.5
+
+        chunks = iter_transactions(self.user_id, chunk_size=1)
+        first = next(chunks)
+        self.assertEqual(database.get_pool().stats()['in_use'], 0)
+        # The only connection is free for other requests while the client reads
+        add_transaction(self.user_id, "expense", "Food", 2.0, "Late", "2024-03-01")
+        rows = first + [row for chunk in chunks for row in chunk]
+        self.assertEqual([row[5] for row in rows],
+                         ["Pay", 'Lunch, with "friends"', "Same day", "Candy", "Late"])
+
+        months = [row[0] for chunk in iter_report_rows(self.user_id, chunk_size=1) for row in chunk]
+        self.assertEqual(len(months), 4)
+        self.assertEqual(months, sorted(months))
+
+    @unittest.skipIf(pyarrow is None, "pyarrow is not installed")
+    def test_write_parquet(self):
+        """Test Parquet export"""
+        buffer = io.BytesIO()
+        write_parquet("transactions", self.user_id, buffer)
+        table = pyarrow.parquet.read_table(io.BytesIO(buffer.getvalue()))
+        self.assertEqual(table.num_rows, 3)
+        self.assertEqual(str(table.column("amount")[1].as_py()), "120.50")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+"""
+Test cases for forecast module
+Tests smoothing, projection and the nightly batch
+"""
+import unittest
+import os
+from datetime import date
+import numpy as np
+import database
+from budget import set_budget
+from forecast import smooth, project, compute_forecasts, get_budget_forecast, run_nightly, get_flagged_budgets
+from transactions import add_transaction
+
+class TestForecast(unittest.TestCase):
+    """Test cases for spending forecasts"""
+    
+    def setUp(self):
+        """Set up test data"""
+        self.test_db = "test_finance.db"
+        if os.path.exists(self.test_db):
+            os.remove(self.test_db)
+        self.original_db = database.DB_PATH
+        database.configure(self.test_db)
+        database.init_db()
+        
+        from auth import register_user, login_user
+        register_user("test_forecast_user", "testpass")
+        self.user_id = login_user("test_forecast_user", "testpass")
+        
+        # Steady 3000 a month on food for the last year
+        for month in range(1, 13):
+            add_transaction(self.user_id, "expense", "Food", 3000.0, "", f"2023-{month:02d}-10")
+        add_transaction(self.user_id, "expense", "Food", 1000.0, "", "2024-01-05")
+        set_budget(self.user_id, "Food", 2500.0, "2024-01")
+        set_budget(self.user_id, "Travel", 500.0, "2024-01")
+    
+    def tearDown(self):
+        """Clean up test database"""
+        database.configure(self.original_db)
+        if os.path.exists(self.test_db):
+            os.remove(self.test_db)
+    
+    def test_smooth(self):
+        """Test that smoothing follows recent months"""
+        np.testing.assert_allclose(smooth([[10, 10, 10], [0, 0, 80]]), [10, 43.333333])
+    
+    def test_project(self):
+        """Test projection at the start, middle and end of a month"""
+        np.testing.assert_allclose(project([0], [3044], 0, 30), [3000], rtol=1e-3)
+        np.testing.assert_allclose(project([1500], [0], 15, 30), [2250])
+        np.testing.assert_allclose(project([700], [3000], 31, 31), [700])
+    
+    def test_forecast_flags_budget(self):
+        """Test that steady history projects past a lower budget"""
+        forecast = get_budget_forecast(self.user_id, "2024-01", date(2024, 1, 10))
+        
+        self.assertEqual(forecast['Food']['spent'], 1000.0)
+        self.assertGreater(forecast['Food']['projected'], 2500.0)
+        self.assertTrue(forecast['Food']['projected_exceeded'])
+        # A budget without history projects nothing
+        self.assertEqual(forecast['Travel']['projected'], 0.0)
+        self.assertFalse(forecast['Travel']['projected_exceeded'])
+    
+    def test_finished_month_uses_actual_spend(self):
+        """Test that a past month projects exactly what was spent"""
+        rows = compute_forecasts("2023-06", date(2024, 1, 10), self.user_id)
+        self.assertEqual(rows, [(self.user_id, "Food", 300000, 300000, None, False)])
+    
+    def test_nightly_batch(self):
+        """Test storing forecasts for every user"""
+        result = run_nightly("2024-01", date(2024, 1, 10))
+        self.assertEqual(result['users'], 1)
+        self.assertEqual(result['flagged'], 1)
+        
+        flagged = get_flagged_budgets("2024-01")
+        self.assertEqual([(row[0], row[1]) for row in flagged], [(self.user_id, "Food")])
+        
+        # Re-running replaces the stored month instead of duplicating it
+        run_nightly("2024-01", date(2024, 1, 10))
+        self.assertEqual(len(get_flagged_budgets("2024-01")), 1)
+
+if __name__ == "__main__":
+    unittest.main()
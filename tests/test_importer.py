@@ -0,0 +1,127 @@
+"""
+Test cases for importer module
+Tests streaming CSV/JSONL bulk import
+"""
+import unittest
+import io
+import os
+import database
+from importer import import_transactions, normalize_row, find_likely_duplicates
+from transactions import add_transaction
+from transactions import get_all_user_transactions
+
+class TestImporter(unittest.TestCase):
+    """Test cases for bulk import"""
+    
+    def setUp(self):
+        """Set up test data"""
+        self.test_db = "test_finance.db"
+        if os.path.exists(self.test_db):
+            os.remove(self.test_db)
+        self.original_db = database.DB_PATH
+        database.configure(self.test_db)
+        database.init_db()
+        
+        from auth import register_user, login_user
+        register_user("test_import_user", "testpass")
+        self.user_id = login_user("test_import_user", "testpass")
+    
+    def tearDown(self):
+        """Clean up test database"""
+        database.configure(self.original_db)
+        if os.path.exists(self.test_db):
+            os.remove(self.test_db)
+    
+    def test_import_csv(self):
+        """Test importing CSV rows in several batches with rejected rows"""
+        data = io.StringIO(
+            "Date,Amount,Category,Description\n"
+            "2024-01-01,-120.50,Food,Groceries\n"
+            "2024-01-02,5000,Salary,Pay\n"
+            "not-a-date,10,Food,Bad\n"
+            "2024-01-03,,Food,No amount\n"
+            "2024-01-04,-1,250.00,Rent,Flat\n"
+            "2024-01-05,\"-1,250.00\",Rent,Flat\n"
+        )
+        result = import_transactions(self.user_id, data, "csv", batch_size=2)
+        
+        self.assertEqual(result['imported'], 3)
+        self.assertEqual(result['batches'], 2)
+        self.assertEqual(result['rejected'], 3)
+        self.assertEqual([line for line, _ in result['rejected_rows']], [4, 5, 6])
+        
+        rows = get_all_user_transactions(self.user_id)
+        self.assertEqual([(t[1], t[2], t[3], t[4]) for t in rows], [
+            ("expense", "Rent", 1250.0, "2024-01-05"),
+            ("income", "Salary", 5000.0, "2024-01-02"),
+            ("expense", "Food", 120.5, "2024-01-01"),
+        ])
+    
+    def test_import_jsonl(self):
+        """Test importing JSON lines with explicit types"""
+        data = io.StringIO(
+            '{"date": "2024-02-01", "amount": 99.99, "type": "expense", "category": "Bills"}\n'
+            '\n'
+            '[1, 2]\n'
+            '{"date": "2024-02-02", "amount": 10, "type": "refund"}\n'
+        )
+        result = import_transactions(self.user_id, data, "jsonl")
+        
+        self.assertEqual(result['imported'], 1)
+        self.assertEqual(result['rejected'], 2)
+        self.assertEqual(get_all_user_transactions(self.user_id)[0][3], 99.99)
+    
+    def test_huge_amount_rejected(self):
+        """Test that an amount too large to store rejects its row, not the import"""
+        data = io.StringIO(
+            "date,amount,category\n"
+            "2024-01-01,-10,Food\n"
+            "2024-01-02,1e17,Salary\n"
+            "2024-01-03,-1e400000000,Food\n"
+            "2024-01-04,-20,Food\n"
+        )
+        result = import_transactions(self.user_id, data, "csv")
+        
+        self.assertEqual(result['imported'], 2)
+        self.assertEqual(result['rejected_rows'], [(3, "invalid amount '1e17'"),
+                                                   (4, "invalid amount '-1e400000000'")])
+    
+    def test_normalize_row_defaults(self):
+        """Test default category and type inferred from the sign"""
+        self.assertEqual(normalize_row({"date": "2024-03-01", "amount": "-5"}),
+                         ("expense", "Uncategorized", 500, 20240301, ""))
+
+    def test_reimport_skips_duplicates(self):
+        """Test that overlapping statements only add new rows"""
+        first = ("date,amount,description\n"
+                 "2024-01-01,-10,Coffee\n"
+                 "2024-01-01,-10,Coffee\n"
+                 "2024-01-02,-25,Lunch\n")
+        second = ("date,amount,description\n"
+                  "2024-01-01,-10,COFFEE\n"
+                  "2024-01-01,-10,coffee.\n"
+                  "2024-01-02,-25,Lunch\n"
+                  "2024-01-03,-40,Dinner\n")
+        
+        result = import_transactions(self.user_id, io.StringIO(first))
+        self.assertEqual((result['imported'], result['duplicates']), (3, 0))
+        
+        result = import_transactions(self.user_id, io.StringIO(second))
+        self.assertEqual((result['imported'], result['duplicates']), (1, 3))
+        self.assertEqual(len(get_all_user_transactions(self.user_id)), 4)
+    
+    def test_find_likely_duplicates(self):
+        """Test grouping of same-amount, same-description rows within the window"""
+        add_transaction(self.user_id, "expense", "Food", 10.0, "Coffee", "2024-01-01")
+        add_transaction(self.user_id, "expense", "Food", 10.0, "coffee!", "2024-01-03")
+        add_transaction(self.user_id, "expense", "Food", 10.0, "Coffee", "2024-01-20")
+        add_transaction(self.user_id, "income", "Food", 10.0, "Coffee", "2024-01-02")
+        add_transaction(self.user_id, "expense", "Rent", 900.0, "Flat", "2024-02-01")
+        
+        groups = find_likely_duplicates(self.user_id, window_days=3)
+        self.assertEqual(len(groups), 1)
+        self.assertEqual([t[4] for t in groups[0]], ["2024-01-01", "2024-01-03"])
+        self.assertEqual(find_likely_duplicates(self.user_id, window_days=1), [])
+
+if __name__ == "__main__":
+    unittest.main()
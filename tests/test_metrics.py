@@ -0,0 +1,112 @@
+"""
+Test cases for metrics module
+Tests statement fingerprints, the query tracer, request hooks and the /metrics output
+"""
+import unittest
+import os
+import sqlite3
+from flask import Flask, jsonify
+import database
+import metrics
+from database import get_connection
+from metrics import fingerprint, TracingConnection
+
+class TestMetrics(unittest.TestCase):
+    """Test cases for request and query metrics"""
+
+    def setUp(self):
+        """Set up test database and an app with metrics on"""
+        self.test_db = "test_finance.db"
+        if os.path.exists(self.test_db):
+            os.remove(self.test_db)
+        self.original_db = database.DB_PATH
+        self.original_slow = metrics.SLOW_QUERY_MS
+        database.configure(self.test_db)
+        database.init_db()
+        metrics.reset()
+
+        self.app = Flask(__name__)
+
+        @self.app.route("/count/<int:n>")
+        def count(n):
+            with get_connection() as conn:
+                rows = conn.execute("SELECT * FROM budgets WHERE id > ? OR id = 7", (n,)).fetchall()
+            return jsonify(len(rows))
+
+        self.assertTrue(metrics.init_app(self.app, enabled=True))
+        self.client = self.app.test_client()
+        # Open the traced connection now so its PRAGMAs are not counted below
+        with get_connection():
+            pass
+        metrics.reset()
+
+    def tearDown(self):
+        """Clean up test database"""
+        metrics.SLOW_QUERY_MS = self.original_slow
+        metrics.disable()
+        metrics.reset()
+        database.configure(self.original_db)
+        if os.path.exists(self.test_db):
+            os.remove(self.test_db)
+
+    def test_fingerprint(self):
+        """Test that literals and value lists collapse to placeholders"""
+        self.assertEqual(fingerprint("SELECT *\n  FROM t WHERE id IN (1, 2, 3) AND name = 'it''s'"),
+                         "SELECT * FROM t WHERE id IN (...) AND name = ?")
+        self.assertEqual(fingerprint("SELECT 'u' || user_id FROM t2"), "SELECT ? || user_id FROM t2")
+
+    def test_disabled_adds_nothing(self):
+        """Test that a disabled app gets no hooks and connections stay plain"""
+        metrics.disable()
+        app = Flask("plain")
+        self.assertFalse(metrics.init_app(app, enabled=False))
+        self.assertEqual(app.before_request_funcs, {})
+        with get_connection() as conn:
+            self.assertIs(type(conn), sqlite3.Connection)
+
+    def test_query_tracing(self):
+        """Test executions, rows and slowest time per statement"""
+        with get_connection() as conn:
+            self.assertIsInstance(conn, TracingConnection)
+            conn.executemany("INSERT INTO budgets (user_id, category, limit_minor, month) VALUES (?, ?, ?, ?)",
+                             [(1, "Food", 100, "2024-01"), (1, "Travel", 200, "2024-01")])
+            for user_id in (1, 2):
+                conn.execute("SELECT category FROM budgets WHERE user_id = ?", (user_id,)).fetchall()
+            for row in conn.execute("SELECT id FROM budgets"):
+                pass
+
+        queries = metrics._queries
+        select = queries["SELECT category FROM budgets WHERE user_id = ?"]
+        self.assertEqual((select[0], select[2]), (2, 2))
+        self.assertEqual(queries["SELECT id FROM budgets"][2], 2)
+        insert = queries["INSERT INTO budgets (user_id, category, limit_minor, month) VALUES (...)"]
+        self.assertEqual((insert[0], insert[2]), (1, 2))
+        self.assertGreater(select[3], 0)
+
+    def test_slow_query_log(self):
+        """Test that statements over the threshold are logged once"""
+        metrics.SLOW_QUERY_MS = 0
+        with get_connection() as conn:
+            conn.execute("SELECT COUNT(*) FROM transactions").fetchone()
+        slow = metrics.get_slow_queries()
+        self.assertEqual([entry["statement"] for entry in slow], ["SELECT COUNT(*) FROM transactions"])
+        self.assertEqual(slow[0]["rows"], 1)
+
+    def test_metrics_endpoint(self):
+        """Test request latency, status counts and query time in Prometheus text"""
+        self.assertEqual(self.client.get("/count/0").status_code, 200)
+        self.client.get("/count/5")
+        self.client.get("/missing")
+
+        response = self.client.get("/metrics")
+        self.assertTrue(response.mimetype.startswith("text/plain"))
+        text = response.get_data(as_text=True)
+        self.assertIn('finance_request_duration_seconds_count{route="/count/<int:n>",method="GET"} 2', text)
+        self.assertIn('finance_requests_total{route="unmatched",method="GET",status="404"} 1', text)
+        self.assertIn('finance_request_queries_total{route="/count/<int:n>"} 2', text)
+        self.assertIn('finance_query_executions_total{statement="SELECT * FROM budgets WHERE id > ? OR id = ?"} 2',
+                      text)
+        self.assertEqual(self.client.get("/slow_queries").get_json(), [])
+
+if __name__ == '__main__':
+    unittest.main()
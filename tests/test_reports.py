@@ -3,7 +3,9 @@ Test cases for reports module
 Tests monthly and yearly report generation
 """
 import unittest
+import os
 from datetime import date
+import database
 from reports import get_monthly_report_data, get_yearly_report_data
 
 class TestReports(unittest.TestCase):
@@ -11,6 +13,14 @@ class TestReports(unittest.TestCase):
     
     def setUp(self):
         """Set up test data"""
+        # Use a throwaway database instead of finance.db
+        self.test_db = "test_finance.db"
+        if os.path.exists(self.test_db):
+            os.remove(self.test_db)
+        self.original_db = database.DB_PATH
+        database.configure(self.test_db)
+        database.init_db()
+        
         # Create a test user first
         from auth import register_user
         register_user("test_report_user", "testpass")
@@ -23,6 +33,12 @@ class TestReports(unittest.TestCase):
         add_transaction(self.user_id, "income", "Salary", 10000.0, "Test income")
         add_transaction(self.user_id, "expense", "Food", 2000.0, "Test expense")
     
+    def tearDown(self):
+        """Clean up test database"""
+        database.configure(self.original_db)
+        if os.path.exists(self.test_db):
+            os.remove(self.test_db)
+    
     def test_get_monthly_report_data(self):
         """Test getting monthly report data"""
         current_month = date.today().strftime("%Y-%m")
@@ -0,0 +1,71 @@
+"""
+Test cases for rollups module
+Tests that monthly rollups stay in sync with transactions
+"""
+import unittest
+import os
+from datetime import date
+import database
+from rollups import verify_rollups, rebuild_rollups
+from transactions import add_transaction, update_transaction, delete_transaction, get_user_transactions
+
+class TestRollups(unittest.TestCase):
+    """Test cases for monthly rollup maintenance"""
+    
+    def setUp(self):
+        """Set up test data"""
+        self.test_db = "test_finance.db"
+        if os.path.exists(self.test_db):
+            os.remove(self.test_db)
+        self.original_db = database.DB_PATH
+        database.configure(self.test_db)
+        database.init_db()
+        
+        from auth import register_user, login_user
+        register_user("test_rollup_user", "testpass")
+        self.user_id = login_user("test_rollup_user", "testpass")
+    
+    def tearDown(self):
+        """Clean up test database"""
+        database.configure(self.original_db)
+        if os.path.exists(self.test_db):
+            os.remove(self.test_db)
+    
+    def get_rollups(self):
+        with database.get_connection() as conn:
+            return conn.execute("""
+                SELECT month, type, category, total, count FROM monthly_rollups
+                WHERE user_id=? ORDER BY type, category
+            """, (self.user_id,)).fetchall()
+    
+    def test_rollups_follow_writes(self):
+        """Test that insert, update and delete keep rollups in sync"""
+        month = int(date.today().strftime("%Y%m"))
+        add_transaction(self.user_id, "expense", "Food", 100.0, "Lunch")
+        add_transaction(self.user_id, "expense", "Food", 50.5, "Snack")
+        self.assertEqual(self.get_rollups(), [(month, "expense", "Food", 15050, 2)])
+        
+        transaction_id = get_user_transactions(self.user_id, limit=1)[0][0]
+        update_transaction(transaction_id, self.user_id, "expense", "Travel", 20.0, "Bus", "2024-01-15")
+        self.assertEqual(self.get_rollups(), [
+            (month, "expense", "Food", 10000, 1),
+            (202401, "expense", "Travel", 2000, 1),
+        ])
+        
+        delete_transaction(transaction_id, self.user_id)
+        self.assertEqual(self.get_rollups(), [(month, "expense", "Food", 10000, 1)])
+        self.assertEqual(verify_rollups(), [])
+    
+    def test_rebuild_repairs_drift(self):
+        """Test that rebuild recomputes tampered rollups"""
+        add_transaction(self.user_id, "income", "Salary", 1000.0, "Pay")
+        with database.get_connection() as conn:
+            conn.execute("UPDATE monthly_rollups SET total = 1")
+        self.assertEqual(len(verify_rollups()), 2)
+        
+        rebuild_rollups()
+        self.assertEqual(verify_rollups(), [])
+        self.assertEqual(self.get_rollups()[0][3], 100000)
+
+if __name__ == "__main__":
+    unittest.main()
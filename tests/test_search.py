@@ -0,0 +1,103 @@
+"""
+Test cases for search module
+Tests prefix matching, ranking, filters and keeping the index in sync
+"""
+import unittest
+import os
+import database
+from database import get_connection
+from search import match_terms, search_transactions, rebuild_index, check_index
+from transactions import add_transaction, update_transaction, delete_transaction
+
+class TestSearch(unittest.TestCase):
+    """Test cases for full-text transaction search"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.test_db = "test_finance.db"
+        if os.path.exists(self.test_db):
+            os.remove(self.test_db)
+        self.original_db = database.DB_PATH
+        database.configure(self.test_db)
+        database.init_db()
+
+        from auth import register_user, login_user
+        register_user("test_search_user", "testpass")
+        self.user_id = login_user("test_search_user", "testpass")
+        register_user("test_search_other", "testpass")
+        self.other_id = login_user("test_search_other", "testpass")
+
+        add_transaction(self.user_id, "expense", "Food", 250.0, "Coffee at Starbucks", "2024-01-05")
+        add_transaction(self.user_id, "expense", "Coffee", 900.0, "Beans", "2024-02-10")
+        add_transaction(self.user_id, "expense", "Travel", 1200.0, "Taxi to airport", "2024-02-11")
+        add_transaction(self.user_id, "income", "Salary", 50000.0, "January salary", "2024-01-31")
+        add_transaction(self.other_id, "expense", "Food", 100.0, "Coffee with friends", "2024-01-05")
+
+    def tearDown(self):
+        """Clean up test database"""
+        database.configure(self.original_db)
+        if os.path.exists(self.test_db):
+            os.remove(self.test_db)
+
+    def descriptions(self, *args, **kwargs):
+        return [t[5] for t in search_transactions(self.user_id, *args, **kwargs)]
+
+    def test_match_terms(self):
+        """Test that punctuation cannot break the FTS query"""
+        self.assertEqual(match_terms('star "bucks" OR'), '"star"* "bucks"* "OR"*')
+        self.assertIsNone(match_terms(" -*() "))
+
+    def test_prefix_search_for_one_user(self):
+        """Test prefix matches in description and category, only for the user"""
+        self.assertEqual(self.descriptions("starb"), ["Coffee at Starbucks"])
+        self.assertEqual(sorted(self.descriptions("coff")), ["Beans", "Coffee at Starbucks"])
+        self.assertEqual(self.descriptions("coffee taxi"), [])
+        self.assertEqual(self.descriptions("!!"), [])
+
+    def test_ranking_prefers_description(self):
+        """Test that a description match outranks a category match"""
+        self.assertEqual(self.descriptions("coffee"), ["Coffee at Starbucks", "Beans"])
+        self.assertEqual(self.descriptions("coffee", order="date"), ["Beans", "Coffee at Starbucks"])
+
+    def test_filters(self):
+        """Test amount, date and type filters combined with text"""
+        self.assertEqual(self.descriptions("coffee", min_amount=500), ["Beans"])
+        self.assertEqual(self.descriptions("coffee", max_amount=500), ["Coffee at Starbucks"])
+        self.assertEqual(self.descriptions("coffee", start_date="2024-02-01"), ["Beans"])
+        self.assertEqual(self.descriptions("coffee", end_date="2024-01-31"), ["Coffee at Starbucks"])
+        self.assertEqual(self.descriptions("salary", t_type="expense"), [])
+        with self.assertRaises(ValueError):
+            self.descriptions("coffee", order="amount")
+        self.assertEqual(self.descriptions("coffee", min_amount="500"), ["Beans"])
+        for bad in ("inf", "nan", "abc", 1e17):
+            with self.assertRaises(ValueError):
+                self.descriptions("coffee", min_amount=bad)
+
+    def test_index_follows_changes(self):
+        """Test that updates and deletes keep the index in sync"""
+        t_id = search_transactions(self.user_id, "taxi")[0][0]
+        update_transaction(t_id, self.user_id, "expense", "Travel", 1200.0, "Train to airport")
+        self.assertEqual(self.descriptions("taxi"), [])
+        self.assertEqual(self.descriptions("train"), ["Train to airport"])
+
+        delete_transaction(t_id, self.user_id)
+        self.assertEqual(self.descriptions("airport"), [])
+        self.assertTrue(check_index())
+
+    def test_rebuild(self):
+        """Test that rebuild repairs an index that missed changes"""
+        with get_connection() as conn:
+            conn.execute("DROP TRIGGER trg_search_insert")
+            conn.execute("""
+                INSERT INTO transactions (user_id, type, category, amount_minor, day, description)
+                VALUES (?, 'expense', 'Food', 500, 20240301, 'Bakery')
+            """, (self.user_id,))
+        self.assertEqual(self.descriptions("bakery"), [])
+        self.assertFalse(check_index())
+
+        self.assertEqual(rebuild_index(), 6)
+        self.assertEqual(self.descriptions("bakery"), ["Bakery"])
+        self.assertTrue(check_index())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -6,23 +6,36 @@ import unittest
 import sqlite3
 import os
 from datetime import date
-from transactions import add_transaction, get_user_transactions, get_user_summary, delete_transaction, update_transaction, get_transaction_by_id
+import database
+from transactions import add_transaction, get_user_transactions, get_user_summary, delete_transaction, update_transaction, get_transaction_by_id, get_transactions_page
 
 class TestTransactions(unittest.TestCase):
     """Test cases for transaction functions"""
     
     def setUp(self):
         """Set up test data"""
+        # Use a throwaway database instead of finance.db
+        self.test_db = "test_finance.db"
+        if os.path.exists(self.test_db):
+            os.remove(self.test_db)
+        self.original_db = database.DB_PATH
+        database.configure(self.test_db)
+        database.init_db()
+        
         # Create a test user first
         from auth import register_user
         register_user("test_trans_user", "testpass")
         from auth import login_user
         self.user_id = login_user("test_trans_user", "testpass")
     
+    def tearDown(self):
+        """Clean up test database"""
+        database.configure(self.original_db)
+        if os.path.exists(self.test_db):
+            os.remove(self.test_db)
+    
     def test_add_transaction(self):
         """Test adding a transaction"""
-        # This will add to the actual database
-        # In production, use a test database
         try:
             add_transaction(self.user_id, "income", "Salary", 5000.0, "Monthly salary")
             # If no exception, test passed
@@ -72,6 +85,63 @@ class TestTransactions(unittest.TestCase):
             except Exception as e:
                 self.fail(f"update_transaction raised an exception: {e}")
 
+    def test_amounts_are_exact(self):
+        """Test that amounts are stored in paise and summed without drift"""
+        for _ in range(3):
+            add_transaction(self.user_id, "expense", "Snacks", 0.1, "Candy")
+        summary = get_user_summary(self.user_id)
+        self.assertEqual(summary['expense'], 0.3)
+        transaction = get_user_transactions(self.user_id, limit=1)[0]
+        self.assertEqual(transaction[3], 0.1)
+        self.assertEqual(transaction[4], date.today().isoformat())
+    
+    def test_update_transaction_date(self):
+        """Test that an updated date is stored and returned as YYYY-MM-DD"""
+        add_transaction(self.user_id, "expense", "Food", 100.0, "Dinner")
+        transaction_id = get_user_transactions(self.user_id, limit=1)[0][0]
+        update_transaction(transaction_id, self.user_id, "expense", "Food", 120.5, "Dinner", "2024-02-29")
+        transaction = get_transaction_by_id(transaction_id, self.user_id)
+        self.assertEqual(transaction[3], 120.5)
+        self.assertEqual(transaction[4], "2024-02-29")
+
+    def test_get_transactions_page(self):
+        """Test that keyset pages cover every transaction exactly once"""
+        for i in range(25):
+            add_transaction(self.user_id, "expense" if i % 2 else "income", "Food",
+                            10.0 + i, f"Item {i}", f"2024-01-{i % 5 + 1:02d}")
+        
+        seen = []
+        cursor = None
+        page_sizes = []
+        while True:
+            page, cursor = get_transactions_page(self.user_id, page_size=10, cursor=cursor)
+            page_sizes.append(len(page))
+            seen.extend(page)
+            if cursor is None:
+                break
+        
+        self.assertEqual(page_sizes, [10, 10, 5])
+        self.assertEqual(len({t[0] for t in seen}), 25)
+        keys = [(t[4], t[0]) for t in seen]
+        self.assertEqual(keys, sorted(keys, reverse=True))
+    
+    def test_get_transactions_page_filters(self):
+        """Test type, category and inclusive date range filters"""
+        add_transaction(self.user_id, "expense", "Food", 10.0, "", "2024-01-01")
+        add_transaction(self.user_id, "expense", "Rent", 20.0, "", "2024-01-15")
+        add_transaction(self.user_id, "income", "Salary", 30.0, "", "2024-01-31")
+        add_transaction(self.user_id, "expense", "Food", 40.0, "", "2024-02-01")
+        
+        page, cursor = get_transactions_page(self.user_id, t_type="expense", category="Food")
+        self.assertEqual([t[3] for t in page], [40.0, 10.0])
+        self.assertIsNone(cursor)
+        
+        page, _ = get_transactions_page(self.user_id, start_date="2024-01-01", end_date="2024-01-31")
+        self.assertEqual([t[3] for t in page], [30.0, 20.0, 10.0])
+        
+        with self.assertRaises(ValueError):
+            get_transactions_page(self.user_id, cursor="not-a-cursor")
+
 if __name__ == "__main__":
     unittest.main()
 
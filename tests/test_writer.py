@@ -0,0 +1,83 @@
+"""
+Test cases for writer module
+Tests group commits, per-write failures and statistics
+"""
+import unittest
+import os
+import database
+from writer import GroupCommitWriter
+from transactions import insert_transaction, apply_transaction_update, get_user_transactions
+
+class TestGroupCommitWriter(unittest.TestCase):
+    """Test cases for the group-commit writer"""
+    
+    def setUp(self):
+        """Set up test database"""
+        self.test_db = "test_finance.db"
+        if os.path.exists(self.test_db):
+            os.remove(self.test_db)
+        self.original_db = database.DB_PATH
+        database.configure(self.test_db)
+        database.init_db()
+        
+        from auth import register_user, login_user
+        register_user("test_writer_user", "testpass")
+        self.user_id = login_user("test_writer_user", "testpass")
+        self.writer = GroupCommitWriter(max_batch=50, max_delay=0.05)
+    
+    def tearDown(self):
+        """Clean up test database"""
+        self.writer.stop()
+        database.configure(self.original_db)
+        if os.path.exists(self.test_db):
+            os.remove(self.test_db)
+    
+    def test_writes_are_batched(self):
+        """Test that queued inserts share commits and all get acknowledged"""
+        futures = [self.writer.submit(insert_transaction, self.user_id, "expense", "Food",
+                                      1.0, f"Item {i}", "2024-01-01")
+                   for i in range(120)]
+        ids = [future.result(timeout=10) for future in futures]
+        
+        self.assertEqual(len(set(ids)), 120)
+        self.assertEqual(len(get_user_transactions(self.user_id, limit=200)), 120)
+        stats = self.writer.stats()
+        self.assertEqual(stats['writes'], 120)
+        self.assertLess(stats['batches'], 120)
+        self.assertLessEqual(stats['max_batch_size'], 50)
+    
+    def test_failed_write_does_not_undo_batch(self):
+        """Test that one bad write fails alone"""
+        good = self.writer.submit(insert_transaction, self.user_id, "expense", "Food",
+                                  10.0, "Lunch", "2024-01-01")
+        bad = self.writer.submit(insert_transaction, self.user_id, "expense", "Food",
+                                 "not a number", "Broken", "2024-01-01")
+        
+        self.assertIsInstance(good.result(timeout=10), int)
+        with self.assertRaises(ValueError):
+            bad.result(timeout=10)
+        self.assertEqual(len(get_user_transactions(self.user_id)), 1)
+        self.assertEqual(self.writer.stats()['failed'], 1)
+    
+    def test_update(self):
+        """Test a queued update"""
+        t_id = self.writer.submit(insert_transaction, self.user_id, "expense", "Food",
+                                  10.0, "Lunch", "2024-01-01").result(timeout=10)
+        changed = self.writer.submit(apply_transaction_update, t_id, self.user_id, "expense",
+                                     "Food", 12.5, "Dinner").result(timeout=10)
+        
+        self.assertEqual(changed, 1)
+        self.assertEqual(get_user_transactions(self.user_id)[0][3], 12.5)
+    
+    def test_stop_flushes_queue(self):
+        """Test that stopping commits writes that are still queued"""
+        futures = [self.writer.submit(insert_transaction, self.user_id, "income", "Salary",
+                                      100.0, "", "2024-01-01")
+                   for _ in range(10)]
+        self.writer.stop()
+        
+        self.assertTrue(all(future.done() for future in futures))
+        self.assertEqual(len(get_user_transactions(self.user_id)), 10)
+
+if __name__ == "__main__":
+    unittest.main()
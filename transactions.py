@@ -1,60 +1,74 @@
-import sqlite3
 from datetime import date, datetime
+from database import get_connection
+from cache import invalidate_days
+from utils import month_key, to_minor, from_minor, to_day, from_day
 
-def add_transaction(user_id, t_type, category, amount, description=""):
-    conn = sqlite3.connect("finance.db")
-    cursor = conn.cursor()
+def _to_row(row):
+    """Convert a stored row to (id, type, category, amount, date, description)"""
+    t_id, t_type, category, amount_minor, day, description = row
+    return (t_id, t_type, category, from_minor(amount_minor), from_day(day), description)
+
+def insert_transaction(cursor, user_id, t_type, category, amount, description="", transaction_date=None):
+    """Insert a transaction using an open cursor and return its id"""
     cursor.execute(
-        """INSERT INTO transactions 
-        (user_id, type, category, amount, date, description)
+        """INSERT INTO transactions
+        (user_id, type, category, amount_minor, day, description)
         VALUES (?, ?, ?, ?, ?, ?)""",
-        (user_id, t_type, category, amount, date.today(), description)
+        (user_id, t_type, category, to_minor(amount),
+         to_day(transaction_date or date.today()), description)
     )
-    conn.commit()
-    conn.close()
+    return cursor.lastrowid
+
+def add_transaction(user_id, t_type, category, amount, description="", transaction_date=None):
+    with get_connection() as conn:
+        insert_transaction(conn.cursor(), user_id, t_type, category, amount,
+                           description, transaction_date)
+        conn.commit()
+    invalidate_days(user_id, to_day(transaction_date or date.today()))
     print("✅ Transaction added")
 
 def delete_transaction(transaction_id, user_id=None):
-    conn = sqlite3.connect("finance.db")
-    cursor = conn.cursor()
-    if user_id:
-        cursor.execute("DELETE FROM transactions WHERE id=? AND user_id=?", (transaction_id, user_id))
-    else:
-        cursor.execute("DELETE FROM transactions WHERE id=?", (transaction_id,))
-    conn.commit()
-    conn.close()
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        if user_id:
+            cursor.execute("DELETE FROM transactions WHERE id=? AND user_id=? RETURNING user_id, day",
+                           (transaction_id, user_id))
+        else:
+            cursor.execute("DELETE FROM transactions WHERE id=? RETURNING user_id, day",
+                           (transaction_id,))
+        deleted = cursor.fetchall()
+        conn.commit()
+    for owner, day in deleted:
+        invalidate_days(owner, day)
 
 def get_user_transactions(user_id, limit=10):
     """Get recent transactions for a user"""
-    conn = sqlite3.connect("finance.db")
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT id, type, category, amount, date, description
-        FROM transactions
-        WHERE user_id=?
-        ORDER BY date DESC, id DESC
-        LIMIT ?
-    """, (user_id, limit))
-    transactions = cursor.fetchall()
-    conn.close()
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT id, type, category, amount_minor, day, description
+            FROM transactions
+            WHERE user_id=?
+            ORDER BY day DESC, id DESC
+            LIMIT ?
+        """, (user_id, limit))
+        transactions = [_to_row(row) for row in cursor.fetchall()]
     return transactions
 
 def get_user_summary(user_id):
     """Get income, expense, and savings summary for current month"""
-    conn = sqlite3.connect("finance.db")
-    cursor = conn.cursor()
     current_month = date.today().strftime("%Y-%m")
-    
-    cursor.execute("""
-        SELECT type, SUM(amount) as total
-        FROM transactions
-        WHERE user_id=? AND date LIKE ?
-        GROUP BY type
-    """, (user_id, f"{current_month}%"))
-    
-    results = cursor.fetchall()
-    conn.close()
-    
+
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT type, SUM(total) as total
+            FROM monthly_rollups
+            WHERE user_id=? AND month=?
+            GROUP BY type
+        """, (user_id, month_key(current_month)))
+        results = cursor.fetchall()
+
     income = 0
     expense = 0
     for t_type, total in results:
@@ -62,64 +76,124 @@ def get_user_summary(user_id):
             income = total or 0
         elif t_type == 'expense':
             expense = total or 0
-    
+
     savings = income - expense
     return {
-        'income': income,
-        'expense': expense,
-        'savings': savings
+        'income': from_minor(income),
+        'expense': from_minor(expense),
+        'savings': from_minor(savings)
     }
 
 def get_all_user_transactions(user_id):
     """Get all transactions for a user"""
-    conn = sqlite3.connect("finance.db")
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT id, type, category, amount, date, description
-        FROM transactions
-        WHERE user_id=?
-        ORDER BY date DESC, id DESC
-    """, (user_id,))
-    transactions = cursor.fetchall()
-    conn.close()
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT id, type, category, amount_minor, day, description
+            FROM transactions
+            WHERE user_id=?
+            ORDER BY day DESC, id DESC
+        """, (user_id,))
+        transactions = [_to_row(row) for row in cursor.fetchall()]
     return transactions
 
+def _parse_cursor(cursor_token):
+    """Split a 'DAY-ID' page cursor into its integer parts"""
+    try:
+        day, t_id = (int(part) for part in cursor_token.split("-"))
+    except (AttributeError, ValueError):
+        raise ValueError(f"Invalid page cursor: {cursor_token!r}")
+    return day, t_id
+
+def get_transactions_page(user_id, page_size=50, cursor=None, t_type=None,
+                          category=None, start_date=None, end_date=None):
+    """Get one page of transactions, newest first, and the cursor for the next page
+
+    Pages are keyed on (date, id) rather than OFFSET, so every page is an
+    index range scan no matter how deep. Dates are inclusive 'YYYY-MM-DD'.
+    """
+    conditions = ["user_id=?"]
+    params = [user_id]
+    if t_type:
+        conditions.append("type=?")
+        params.append(t_type)
+    if category:
+        conditions.append("category=?")
+        params.append(category)
+    if start_date:
+        conditions.append("day >= ?")
+        params.append(to_day(start_date))
+    if end_date:
+        conditions.append("day <= ?")
+        params.append(to_day(end_date))
+    if cursor:
+        conditions.append("(day, id) < (?, ?)")
+        params.extend(_parse_cursor(cursor))
+
+    with get_connection() as conn:
+        rows = conn.execute(f"""
+            SELECT id, type, category, amount_minor, day, description
+            FROM transactions
+            WHERE {" AND ".join(conditions)}
+            ORDER BY day DESC, id DESC
+            LIMIT ?
+        """, params + [page_size + 1]).fetchall()
+
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        next_cursor = f"{last[4]}-{last[0]}"
+    return [_to_row(row) for row in rows], next_cursor
+
 def get_transaction_by_id(transaction_id, user_id=None):
     """Get a single transaction by ID"""
-    conn = sqlite3.connect("finance.db")
-    cursor = conn.cursor()
-    if user_id:
-        cursor.execute("""
-            SELECT id, type, category, amount, date, description
-            FROM transactions
-            WHERE id=? AND user_id=?
-        """, (transaction_id, user_id))
-    else:
-        cursor.execute("""
-            SELECT id, type, category, amount, date, description
-            FROM transactions
-            WHERE id=?
-        """, (transaction_id,))
-    transaction = cursor.fetchone()
-    conn.close()
-    return transaction
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        if user_id:
+            cursor.execute("""
+                SELECT id, type, category, amount_minor, day, description
+                FROM transactions
+                WHERE id=? AND user_id=?
+            """, (transaction_id, user_id))
+        else:
+            cursor.execute("""
+                SELECT id, type, category, amount_minor, day, description
+                FROM transactions
+                WHERE id=?
+            """, (transaction_id,))
+        transaction = cursor.fetchone()
+    return _to_row(transaction) if transaction else None
 
-def update_transaction(transaction_id, user_id, t_type, category, amount, description="", transaction_date=None):
-    """Update an existing transaction"""
-    conn = sqlite3.connect("finance.db")
-    cursor = conn.cursor()
+def apply_transaction_update(cursor, transaction_id, user_id, t_type, category, amount,
+                             description="", transaction_date=None):
+    """Update a transaction using an open cursor and return the number of rows changed"""
     if transaction_date:
         cursor.execute("""
             UPDATE transactions
-            SET type=?, category=?, amount=?, date=?, description=?
+            SET type=?, category=?, amount_minor=?, day=?, description=?
             WHERE id=? AND user_id=?
-        """, (t_type, category, amount, transaction_date, description, transaction_id, user_id))
+        """, (t_type, category, to_minor(amount), to_day(transaction_date), description, transaction_id, user_id))
     else:
         cursor.execute("""
             UPDATE transactions
-            SET type=?, category=?, amount=?, description=?
+            SET type=?, category=?, amount_minor=?, description=?
             WHERE id=? AND user_id=?
-        """, (t_type, category, amount, description, transaction_id, user_id))
-    conn.commit()
-    conn.close()
+        """, (t_type, category, to_minor(amount), description, transaction_id, user_id))
+    return cursor.rowcount
+
+def update_transaction(transaction_id, user_id, t_type, category, amount, description="", transaction_date=None):
+    """Update an existing transaction"""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        # Reports for both the old and the new date change
+        cursor.execute("SELECT day FROM transactions WHERE id=? AND user_id=?",
+                       (transaction_id, user_id))
+        days = [day for day, in cursor.fetchall()]
+        apply_transaction_update(cursor, transaction_id, user_id, t_type, category,
+                                 amount, description, transaction_date)
+        conn.commit()
+    if transaction_date:
+        days.append(to_day(transaction_date))
+    invalidate_days(user_id, *days)
     print("✅ Transaction updated")
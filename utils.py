@@ -0,0 +1,72 @@
+from datetime import date, datetime
+from decimal import Decimal, ROUND_HALF_UP
+
+# Amounts are stored as integer minor units (paise); dates as YYYYMMDD integers
+MINOR_UNITS = 100
+
+# Largest amount accepted, in paise: well inside SQLite's 64-bit integers,
+# so that totals over many such amounts cannot overflow either
+MAX_MINOR = 10 ** 15
+
+def to_minor(amount):
+    """Convert a rupee amount (float, str or Decimal) to integer paise
+
+    Raises ValueError for anything that is not a finite number, or whose
+    size is over MAX_MINOR paise.
+    """
+    try:
+        value = Decimal(str(amount)) * MINOR_UNITS
+    except ArithmeticError:
+        raise ValueError(f"invalid amount {amount!r}") from None
+    if not value.is_finite() or abs(value) > MAX_MINOR:
+        raise ValueError(f"invalid amount {amount!r}")
+    return int(value.quantize(Decimal("1"), rounding=ROUND_HALF_UP))
+
+def from_minor(minor):
+    """Convert integer paise back to a rupee float for display"""
+    return (minor or 0) / MINOR_UNITS
+
+def to_day(value):
+    """Convert a date, datetime or 'YYYY-MM-DD' string to a YYYYMMDD integer"""
+    if isinstance(value, datetime):
+        value = value.date()
+    if isinstance(value, date):
+        return value.year * 10000 + value.month * 100 + value.day
+    text = str(value).strip()[:10]
+    return to_day(datetime.strptime(text, "%Y-%m-%d").date())
+
+def from_day(day):
+    """Convert a YYYYMMDD integer to a 'YYYY-MM-DD' string"""
+    return f"{day // 10000:04d}-{day // 100 % 100:02d}-{day % 100:02d}"
+
+def month_key(month):
+    """Convert a 'YYYY-MM' month to a YYYYMM integer"""
+    year, mon = (int(part) for part in month.split("-")[:2])
+    return year * 100 + mon
+
+def day_to_date(day):
+    """Convert a YYYYMMDD integer to a date object"""
+    return date(day // 10000, day // 100 % 100, day % 100)
+
+def from_month_key(key):
+    """Convert a YYYYMM integer to a 'YYYY-MM' month"""
+    return f"{key // 100:04d}-{key % 100:02d}"
+
+def month_range(month):
+    """Return (start, end) days so that start <= day < end covers a 'YYYY-MM' month"""
+    year, mon = (int(part) for part in month.split("-")[:2])
+    if mon == 12:
+        next_year, next_mon = year + 1, 1
+    else:
+        next_year, next_mon = year, mon + 1
+    return year * 10000 + mon * 100 + 1, next_year * 10000 + next_mon * 100 + 1
+
+def year_range(year):
+    """Return (start, end) days so that start <= day < end covers a 'YYYY' year"""
+    year = int(year)
+    return year * 10000 + 101, (year + 1) * 10000 + 101
+
+def year_month_range(year):
+    """Return (start, end) month keys so that start <= month < end covers a year"""
+    year = int(year)
+    return year * 100 + 1, (year + 1) * 100 + 1
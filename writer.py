@@ -0,0 +1,241 @@
+"""
+Group-commit writer for transaction inserts and updates.
+
+Instead of one commit per request, callers hand writes to a background
+thread that drains a queue and commits them together: a batch closes after
+MAX_BATCH writes or MAX_DELAY seconds, whichever comes first. Each write
+runs in its own savepoint, so a bad row fails alone without undoing the
+rest of its batch.
+
+submit() returns a concurrent.futures.Future that resolves only after the
+batch has committed. Durability by write mode (FINANCE_WRITE_MODE):
+
+- "direct" (default): the caller commits on its own connection, as before.
+- "group": the caller waits for the future. When it returns, the write is
+  as durable as the storage profile makes any commit; only latency changes
+  (up to MAX_DELAY extra) while throughput under concurrency goes up.
+- "async": the caller does not wait (write-behind). Writes still queued
+  when the process is killed are lost; a normal exit flushes the queue.
+  A page loaded straight after the write may not show it yet.
+"""
+import atexit
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from database import get_connection
+from datetime import date
+from cache import invalidate_days
+from transactions import insert_transaction, apply_transaction_update, get_transaction_by_id
+from utils import to_day
+
+WRITE_MODES = ("direct", "group", "async")
+
+# How writes from the web app are committed
+WRITE_MODE = os.environ.get("FINANCE_WRITE_MODE", "direct")
+if WRITE_MODE not in WRITE_MODES:
+    raise ValueError(f"FINANCE_WRITE_MODE must be one of {', '.join(WRITE_MODES)}")
+
+# A batch commits after this many writes or this many seconds
+MAX_BATCH = 500
+MAX_DELAY = 0.005
+
+_STOP = object()
+
+
+class GroupCommitWriter:
+    """Background thread committing queued writes in batches"""
+
+    def __init__(self, max_batch=MAX_BATCH, max_delay=MAX_DELAY):
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._batches = 0
+        self._writes = 0
+        self._failed = 0
+        self._largest_batch = 0
+        self._queue_wait = 0.0
+        self._max_queue_wait = 0.0
+        self._commit_time = 0.0
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="group-commit",
+                                                daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        """Commit everything already queued, then stop the thread"""
+        with self._lock:
+            thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        thread.join(timeout)
+
+    def submit(self, func, *args):
+        """Queue func(cursor, *args) and return a Future for its result"""
+        future = Future()
+        self._queue.put((func, args, future, time.perf_counter()))
+        self.start()
+        return future
+
+    def _next_batch(self):
+        """Block for the first write, then gather more until the batch closes"""
+        first = self._queue.get()
+        if first is _STOP:
+            return [], True
+        batch = [first]
+        deadline = time.perf_counter() + self.max_delay
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch, stopping = self._next_batch()
+            if batch:
+                self._commit(batch)
+
+    def _commit(self, batch):
+        started = time.perf_counter()
+        results = []
+        try:
+            with get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("BEGIN")
+                for func, args, future, queued in batch:
+                    cursor.execute("SAVEPOINT write")
+                    try:
+                        results.append((future, func(cursor, *args), None))
+                    except Exception as e:
+                        cursor.execute("ROLLBACK TO write")
+                        results.append((future, None, e))
+                    cursor.execute("RELEASE write")
+        except Exception as e:
+            # Nothing in the batch was committed
+            for func, args, future, queued in batch:
+                future.set_exception(e)
+            with self._lock:
+                self._failed += len(batch)
+            return
+
+        finished = time.perf_counter()
+        waits = [started - queued for _, _, _, queued in batch]
+        with self._lock:
+            self._batches += 1
+            self._writes += len(batch)
+            self._failed += sum(1 for _, _, error in results if error is not None)
+            self._largest_batch = max(self._largest_batch, len(batch))
+            self._queue_wait += sum(waits)
+            self._max_queue_wait = max(self._max_queue_wait, max(waits))
+            self._commit_time += finished - started
+        # Acknowledge only after the commit
+        for future, result, error in results:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def stats(self):
+        """Counters for monitoring"""
+        with self._lock:
+            return {
+                'mode': WRITE_MODE,
+                'running': self._thread is not None and self._thread.is_alive(),
+                'queued': self._queue.qsize(),
+                'batches': self._batches,
+                'writes': self._writes,
+                'failed': self._failed,
+                'avg_batch_size': self._writes / self._batches if self._batches else 0.0,
+                'max_batch_size': self._largest_batch,
+                'avg_queue_wait_seconds': self._queue_wait / self._writes if self._writes else 0.0,
+                'max_queue_wait_seconds': self._max_queue_wait,
+                'avg_commit_seconds': self._commit_time / self._batches if self._batches else 0.0,
+            }
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    """Return the process-wide writer, starting it on first use"""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = GroupCommitWriter().start()
+    return _writer
+
+
+def stop_writer(timeout=None):
+    """Flush and stop the process-wide writer"""
+    global _writer
+    with _writer_lock:
+        writer, _writer = _writer, None
+    if writer is not None:
+        writer.stop(timeout)
+
+
+def get_writer_stats():
+    """Writer statistics (batch sizes, queue wait, failures)"""
+    return get_writer().stats()
+
+
+def _invalidate_when_committed(future, user_id, dates):
+    """Drop the user's cached reports for the dates once the write commits"""
+    def done(future):
+        if future.exception() is None:
+            invalidate_days(user_id, *(to_day(d) for d in dates))
+    future.add_done_callback(done)
+    return future
+
+
+def submit_add(user_id, t_type, category, amount, description="", transaction_date=None):
+    """Queue a new transaction; the Future resolves to its id"""
+    future = get_writer().submit(insert_transaction, user_id, t_type, category, amount,
+                                 description, transaction_date)
+    return _invalidate_when_committed(future, user_id, [transaction_date or date.today()])
+
+
+def submit_update(transaction_id, user_id, t_type, category, amount, description="",
+                  transaction_date=None):
+    """Queue a transaction update; the Future resolves to the number of rows changed"""
+    # Reports for both the old and the new date change
+    current = get_transaction_by_id(transaction_id, user_id)
+    dates = [current[4]] if current else []
+    if transaction_date:
+        dates.append(transaction_date)
+    future = get_writer().submit(apply_transaction_update, transaction_id, user_id, t_type,
+                                 category, amount, description, transaction_date)
+    return _invalidate_when_committed(future, user_id, dates)
+
+
+# Writes still queued at a normal exit are committed, not dropped
+atexit.register(stop_writer)
+
+
+def _reset_after_fork():
+    # The writer thread does not survive a fork; a child starts its own.
+    # Writes queued before the fork belong to the parent, which commits them.
+    global _writer, _writer_lock
+    _writer_lock = threading.Lock()
+    _writer = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
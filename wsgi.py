@@ -0,0 +1,18 @@
+"""
+Production entry point for a WSGI server.
+
+    gunicorn -w $(nproc) -b 0.0.0.0:8000 wsgi:app                (one worker per CPU)
+    waitress-serve --threads 8 --listen=0.0.0.0:8000 wsgi:app    (Windows)
+
+Each worker process builds its own app; the first to start applies any
+pending migrations under a file lock while the others wait, then find
+nothing left to do. --preload is fine too: connection pools and the
+write queue are not shared with the forked workers, each opens its own.
+
+FINANCE_SECRET_KEY must be set (the app refuses to start without it):
+sessions signed by one worker are then accepted by the others and
+survive restarts. FINANCE_DB chooses the database file.
+"""
+from main import create_app
+
+app = create_app()